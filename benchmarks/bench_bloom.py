@@ -0,0 +1,58 @@
+"""
+Lookups of a mix of present and absent keys with and without Bloom filters:
+blocks read per lookup, lookups per second, and the filters' skip ratio and
+observed false positive rate, for find and find_many.
+
+    python -m benchmarks.bench_bloom [--keys 200000] [--lookups 50000] [--absent 0.8]
+                                     [--fp-rate 0.01] [-M 64] [-L 64]
+"""
+
+import argparse
+import random
+import time
+
+from py_btrees.btree import BTree
+from py_btrees.disk import Disk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=50000)
+    parser.add_argument("--absent", type=float, default=0.8, help="fraction of lookups for absent keys")
+    parser.add_argument("--fp-rate", type=float, default=0.01)
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [(2 * i, i) for i in range(args.keys)]
+    probes = [2 * rng.randrange(args.keys) + (rng.random() < args.absent) for _ in range(args.lookups)]
+    print(f"{args.keys} keys, {args.lookups} lookups, {args.absent:.0%} absent, M={args.M}, L={args.L}")
+    print(f"{'filters':<10}{'call':<11}{'reads/key':>10}{'keys/s':>10}{'skipped':>9}{'obs. fp':>9}")
+    for name, fp_rate in (("none", None), (f"fp {args.fp_rate:g}", args.fp_rate)):
+        disk = Disk()
+        tree = BTree.from_sorted(items, args.M, args.L, disk=disk, bloom_fp_rate=fp_rate)
+        tree.find_many(range(0, 2 * args.keys, 2))  # warm up: builds the filters
+        for call in ("find", "find_many"):
+            if tree.bloom is not None:
+                tree.bloom.stats.reset()
+            reads = disk.stats.reads
+            start = time.perf_counter()
+            if call == "find":
+                for key in probes:
+                    tree.find(key)
+            else:
+                for start_idx in range(0, len(probes), 1000):
+                    tree.find_many(probes[start_idx:start_idx + 1000])
+            seconds = time.perf_counter() - start
+            reads = (disk.stats.reads - reads) / len(probes)
+            stats = tree.bloom.stats if tree.bloom is not None else None
+            skipped = f"{stats.skip_ratio():>9.1%}" if stats else f"{'-':>9}"
+            observed = f"{stats.observed_fp_rate():>9.2%}" if stats else f"{'-':>9}"
+            print(f"{name:<10}{call:<11}{reads:>10.2f}{len(probes) / seconds:>10.0f}{skipped}{observed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the binary NodeCodec, with and without prefix compression, with the original pickle block format:
+bytes per node and encode/decode throughput for a few typical node shapes.
+
+    python -m benchmarks.bench_codec [--fanout 64] [--repeat 2000]
+"""
+
+import argparse
+import time
+
+from py_btrees.btree_node import BTreeNode
+from py_btrees.codec import NodeCodec, PickleCodec
+
+
+def make_nodes(fanout: int):
+    int_leaf = BTreeNode(10, 2, 3, True)
+    int_leaf.keys = list(range(1000, 1000 + fanout))
+    int_leaf.data = list(range(fanout))
+    int_leaf.prev_addr, int_leaf.next_addr = 9, 11
+
+    str_leaf = BTreeNode(10, 2, 3, True)
+    str_leaf.keys = [f"user:{i:08d}" for i in range(fanout)]
+    str_leaf.data = [f"value-{i}" for i in range(fanout)]
+
+    bytes_leaf = BTreeNode(10, 2, 3, True)
+    bytes_leaf.keys = [i.to_bytes(16, "big") for i in range(fanout)]
+    bytes_leaf.data = [bytes(32) for _ in range(fanout)]
+
+    internal = BTreeNode(2, 1, 0, False)
+    internal.keys = list(range(0, 1000 * (fanout - 1), 1000))
+    internal.children_addrs = list(range(100000, 100000 + fanout))
+    internal.counts = [fanout * fanout] * fanout
+
+    return {"int leaf": int_leaf, "str leaf": str_leaf, "bytes leaf": bytes_leaf, "internal": internal}
+
+
+def measure(codec, node, repeat: int):
+    block = codec.encode(node)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.encode(node)
+    encode = repeat / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.decode(block)
+    decode = repeat / (time.perf_counter() - start)
+    return len(block), encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fanout", type=int, default=64, help="keys per node")
+    parser.add_argument("--repeat", type=int, default=2000, help="encode/decode calls per measurement")
+    args = parser.parse_args()
+
+    codecs = {"pickle": PickleCodec(), "binary": NodeCodec(), "prefixed": NodeCodec(prefix_compression=True)}
+    print(f"{'node':<12}{'codec':<10}{'bytes':>8}{'encode/s':>12}{'decode/s':>12}")
+    for name, node in make_nodes(args.fanout).items():
+        for codec_name, codec in codecs.items():
+            size, encode, decode = measure(codec, node, args.repeat)
+            print(f"{name:<12}{codec_name:<10}{size:>8}{encode:>12.0f}{decode:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Copying a tree through a dump file: the throughput of BTree.dump() and
+BTree.load() in MB/s and keys/s and their peak Python memory (tracemalloc),
+next to rebuilding the same tree by inserting every key, for a few tree sizes.
+With memory storage the peak of a load includes the new tree itself; use
+`--storage file` to see the memory of the load alone.
+
+    python -m benchmarks.bench_dump [--sizes 10000 100000 1000000] [--storage memory|file]
+                                    [--chunk-keys 4096] [-M 64] [-L 64]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from py_btrees.btree import BTree
+from py_btrees.disk import Disk
+from py_btrees.dump import TransferStats
+from py_btrees.file_disk import FileDisk
+
+
+def new_disk(args, directory: str, name: str):
+    if args.storage == "file":
+        return FileDisk(os.path.join(directory, f"{name}.db"))
+    return Disk()
+
+
+def close(disk) -> None:
+    if hasattr(disk, "close"):
+        disk.close()
+
+
+def peak(fn):
+    """Run fn() and return its result and the peak memory it allocated, in MB."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--storage", choices=["memory", "file"], default="memory")
+    parser.add_argument("--chunk-keys", type=int, default=4096)
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"M={args.M}, L={args.L}, {args.storage} storage, {args.chunk_keys} keys per chunk")
+    print(f"{'keys':>9} {'phase':<8}{'seconds':>9}{'MB/s':>8}{'keys/s':>11}{'peak MB':>9}{'file MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.dump")
+        for size in args.sizes:
+            items = [(i, f"value-{i}") for i in range(size)]
+            disk = new_disk(args, directory, "source")
+            tree = BTree.from_sorted(items, args.M, args.L, disk=disk)
+            del items
+
+            dumped, dump_peak = peak(lambda: tree.dump(path, args.chunk_keys))
+            close(disk)
+            loaded = TransferStats()
+            target = new_disk(args, directory, "target")
+            _, load_peak = peak(lambda: BTree.load(path, disk=target, stats=loaded))
+            close(target)
+            for phase, stats, used in (("dump", dumped, dump_peak), ("load", loaded, load_peak)):
+                print(f"{size:>9} {phase:<8}{stats.seconds:>9.2f}{stats.mb_per_s():>8.1f}"
+                      f"{stats.keys / stats.seconds:>11.0f}{used:>9.2f}{stats.bytes / 1e6:>9.2f}")
+
+            replay = new_disk(args, directory, "replay")
+            start = time.perf_counter()
+            copy = BTree(args.M, args.L, disk=replay)
+            for key, value in BTree.load(path, disk=Disk()).items():
+                copy.insert(key, value)
+            seconds = time.perf_counter() - start
+            close(replay)
+            print(f"{size:>9} {'insert':<8}{seconds:>9.2f}{'':>8}{size / seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Lookups that skip the descent from the root: the finger on the last leaf
+used and, optionally, the value cache (BTree(cache_size=...)). Two workloads:
+
+  append  keys are inserted in ascending order; after each insert a recently
+          inserted key is looked up, and every fourth step one is updated
+  zipf    lookups of a bulk-loaded tree with Zipfian key popularity
+          (theta 0.99), the hot keys scattered over the key space
+
+For each, blocks read per operation (a descent reads `height` of them), the
+share of lookups answered from the finger's leaf or the cache, and lookups
+per second.
+
+    python -m benchmarks.bench_fastpath [--keys 200000] [--lookups 200000] [--cache 1000]
+                                        [--window 16] [-M 64] [-L 64]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.run import ZipfGenerator
+from py_btrees.btree import BTree
+from py_btrees.disk import Disk
+
+
+def height(tree):
+    depth, node = 1, tree.disk.read(tree.root_addr)
+    while not node.is_leaf:
+        depth += 1
+        node = tree.disk.read(node.children_addrs[0])
+    return depth
+
+
+class Phase:
+    """Calls, blocks read, fast path hits and time of one kind of operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.reads = 0
+        self.finger_hits = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+
+    def run(self, tree, fn, *args):
+        stats = tree.fast_stats
+        reads, finger_hits, cache_hits = tree.disk.stats.reads, stats.finger_hits, stats.cache_hits
+        start = time.perf_counter()
+        fn(*args)
+        self.seconds += time.perf_counter() - start
+        self.reads += tree.disk.stats.reads - reads
+        self.finger_hits += stats.finger_hits - finger_hits
+        self.cache_hits += stats.cache_hits - cache_hits
+        self.calls += 1
+
+
+def append(args, cache_size, rng):
+    disk = Disk()
+    tree = BTree(args.M, args.L, disk=disk, cache_size=cache_size)
+    phases = {"insert": Phase(), "find": Phase(), "update": Phase()}
+    for i in range(args.keys):
+        phases["insert"].run(tree, tree.insert, i, i)
+        phases["find"].run(tree, tree.find, max(0, i - rng.randrange(args.window)))
+        if i % 4 == 0:
+            phases["update"].run(tree, tree.insert, max(0, i - rng.randrange(args.window)), -i)
+    return tree, phases
+
+
+def zipf(args, cache_size, rng):
+    disk = Disk()
+    tree = BTree.from_sorted(((i, i) for i in range(args.keys)), args.M, args.L, disk=disk, cache_size=cache_size)
+    ranks = ZipfGenerator(args.keys, rng=rng)
+    scatter = list(range(args.keys))
+    rng.shuffle(scatter)
+    probes = [scatter[ranks.next()] for _ in range(args.lookups)]
+    phase = Phase()
+    for key in probes:
+        phase.run(tree, tree.find, key)
+    return tree, {"find": phase}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=200000, help="finds of the zipf workload")
+    parser.add_argument("--cache", type=int, default=1000, help="cache_size of the runs with a cache")
+    parser.add_argument("--window", type=int, default=16, help="append: how far back the looked up key may be")
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.keys} int keys, M={args.M}, L={args.L}")
+    print(f"{'workload':<9}{'cache':>7} {'op':<8}{'calls':>8}{'height':>7}{'reads/op':>9}"
+          f"{'finger':>8}{'cache':>8}{'avoided':>9}{'ops/s':>9}")
+    for name, workload in (("append", append), ("zipf", zipf)):
+        for cache_size in (None, args.cache):
+            tree, phases = workload(args, cache_size, random.Random(args.seed))
+            for op, phase in phases.items():
+                finger, cache = phase.finger_hits / phase.calls, phase.cache_hits / phase.calls
+                print(f"{name:<9}{cache_size or '-':>7} {op:<8}{phase.calls:>8}{height(tree):>7}"
+                      f"{phase.reads / phase.calls:>9.2f}{finger:>8.1%}{cache:>8.1%}{finger + cache:>9.1%}"
+                      f"{phase.calls / phase.seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
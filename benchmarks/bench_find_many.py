@@ -0,0 +1,78 @@
+"""
+Node reads and wall time of BTree.find_many versus a loop over BTree.find.
+
+    python -m benchmarks.bench_find_many [--keys 100000] [--batch 500] [--batches 20] [-M 64] [-L 64]
+"""
+
+import argparse
+import random
+import time
+
+from py_btrees.btree import BTree
+from py_btrees.disk import Disk
+
+
+class CountingDisk:
+    """Forwards to a disk and counts the nodes read through it."""
+
+    def __init__(self, disk):
+        self.disk = disk
+        self.reads = 0
+
+    def new(self):
+        return self.disk.new()
+
+    def read(self, addr):
+        self.reads += 1
+        return self.disk.read(addr)
+
+    def write(self, addr, node):
+        self.disk.write(addr, node)
+
+    def free(self, addr):
+        self.disk.free(addr)
+
+    def save_meta(self, meta):
+        self.disk.save_meta(meta)
+
+    def load_meta(self):
+        return self.disk.load_meta()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=100000, help="keys in the tree")
+    parser.add_argument("--batch", type=int, default=500, help="keys per find_many call")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    disk = CountingDisk(Disk())
+    btree = BTree.from_sorted(((i, i) for i in range(args.keys)), args.M, args.L, disk=disk)
+    rng = random.Random(args.seed)
+    batches = [[rng.randrange(args.keys * 2) for _ in range(args.batch)] for _ in range(args.batches)]
+
+    disk.reads = 0
+    start = time.perf_counter()
+    for batch in batches:
+        for key in batch:
+            btree.find(key)
+    single_time, single_reads = time.perf_counter() - start, disk.reads
+
+    disk.reads = 0
+    start = time.perf_counter()
+    for batch in batches:
+        btree.find_many(batch)
+    many_time, many_reads = time.perf_counter() - start, disk.reads
+
+    probes = args.batch * args.batches
+    print(f"{'method':<10}{'reads':>10}{'reads/key':>12}{'keys/s':>12}")
+    print(f"{'find':<10}{single_reads:>10}{single_reads / probes:>12.2f}{probes / single_time:>12.0f}")
+    print(f"{'find_many':<10}{many_reads:>10}{many_reads / probes:>12.2f}{probes / many_time:>12.0f}")
+    print(f"node reads saved: {single_reads - many_reads} ({1 - many_reads / single_reads:.1%})")
+
+
+if __name__ == "__main__":
+    main()
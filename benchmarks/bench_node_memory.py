@@ -0,0 +1,101 @@
+"""
+Memory held by decoded nodes and the cost of splitting them, for the three
+ways a node can keep its int keys and child addresses: a plain object with a
+__dict__ and lists (the old layout), __slots__ with lists, and __slots__
+with IntArray.
+
+    python -m benchmarks.bench_node_memory [--keys 1000000] [-M 128] [-L 128] [--splits 20000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, List
+
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode
+from py_btrees.codec import NodeCodec
+from py_btrees.compact import int_array
+from py_btrees.disk import Disk
+
+
+class DictNode:
+    """The fields of a BTreeNode on an object with a __dict__, as nodes were before __slots__."""
+
+    def __init__(self, node: BTreeNode):
+        for name, value in node.__getstate__().items():
+            setattr(self, name, list(value) if name in ("keys", "children_addrs") else value)
+
+
+class NullDisk:
+    """Hands out addresses and drops every write, so splits are timed without encoding."""
+
+    def __init__(self):
+        self.next = 0
+
+    def new(self) -> int:
+        self.next += 1
+        return self.next - 1
+
+    def write(self, addr, node) -> None:
+        pass
+
+    def save_meta(self, meta) -> None:
+        pass
+
+
+def resident_bytes(load: Callable[[], List[object]]) -> int:
+    tracemalloc.start()
+    nodes = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    return size
+
+
+def split_rate(make_keys: Callable[[List[int]], object], L: int, splits: int) -> float:
+    tree = BTree(3, L, disk=NullDisk())
+    template = list(range(L + 1))
+    nodes = []
+    for _ in range(splits):
+        node = BTreeNode(tree.disk.new(), None, None, True)
+        node.keys, node.data = make_keys(template), [None] * (L + 1)
+        nodes.append(node)
+    start = time.perf_counter()
+    for node in nodes:
+        tree.split_node_util(node)
+    return splits / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1000000)
+    parser.add_argument("-M", type=int, default=128)
+    parser.add_argument("-L", type=int, default=128)
+    parser.add_argument("--splits", type=int, default=20000)
+    args = parser.parse_args()
+
+    disk = Disk()
+    tree = BTree.from_sorted(((i, None) for i in range(args.keys)), args.M, args.L, disk=disk)
+    blocks = [block for block in disk.memory if block]
+    lists, arrays = NodeCodec(int_arrays=False), NodeCodec()
+    layouts = {
+        "dict + lists": lambda: [DictNode(lists.decode(block)) for block in blocks],
+        "slots + lists": lambda: [lists.decode(block) for block in blocks],
+        "slots + arrays": lambda: [arrays.decode(block) for block in blocks],
+    }
+    print(f"{args.keys} int keys in {len(blocks)} nodes, M={args.M}, L={args.L}")
+    print(f"{'layout':<16}{'MB':>8}{'bytes/key':>11}{'splits/s':>11}")
+    rates = {
+        "dict + lists": None,
+        "slots + lists": split_rate(list, args.L, args.splits),
+        "slots + arrays": split_rate(int_array, args.L, args.splits),
+    }
+    for name, load in layouts.items():
+        size = resident_bytes(load)
+        rate = f"{rates[name]:>11.0f}" if rates[name] else f"{'-':>11}"
+        print(f"{name:<16}{size / 2 ** 20:>8.1f}{size / args.keys:>11.1f}{rate}")
+
+
+if __name__ == "__main__":
+    main()
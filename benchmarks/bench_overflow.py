@@ -0,0 +1,74 @@
+"""
+Value separation and int key compression in leaves. For a tree where some
+values are large, compares keeping every value inline with moving values
+above a threshold to blocks of their own: mean leaf size, blocks and bytes
+read per lookup, and lookups per second. Then compares the size of leaves
+holding dense int keys with and without delta_keys.
+
+    python -m benchmarks.bench_overflow [--keys 100000] [--large 0.1] [--value-size 2000]
+                                        [--threshold 256] [-M 64] [-L 64] [--finds 20000]
+"""
+
+import argparse
+import random
+import time
+
+from py_btrees.btree import BTree
+from py_btrees.codec import NodeCodec
+from py_btrees.disk import Disk
+
+
+def leaf_bytes(tree: BTree) -> float:
+    sizes, leaf = [], tree.find_edge_leaf()
+    while True:
+        sizes.append(len(tree.disk.memory[leaf.my_addr]))
+        if leaf.next_addr is None:
+            return sum(sizes) / len(sizes)
+        leaf = tree.disk.read(leaf.next_addr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--large", type=float, default=0.1, help="fraction of values that are large")
+    parser.add_argument("--value-size", type=int, default=2000, help="bytes in a large value")
+    parser.add_argument("--threshold", type=int, default=256)
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    parser.add_argument("--finds", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [(i, bytes(args.value_size) if rng.random() < args.large else i) for i in range(args.keys)]
+    probes = [rng.randrange(args.keys) for _ in range(args.finds)]
+    print(f"{args.keys} keys, {args.large:.0%} of values {args.value_size} bytes, M={args.M}, L={args.L}")
+    print(f"{'values':<10}{'leaf B':>9}{'reads/find':>12}{'B/find':>9}{'finds/s':>10}")
+    for name, threshold in (("inline", None), ("separate", args.threshold)):
+        disk = Disk()
+        tree = BTree.from_sorted(items, args.M, args.L, disk=disk, overflow_threshold=threshold)
+        reads, read_bytes = disk.stats.reads, disk.stats.bytes_read
+        start = time.perf_counter()
+        for key in probes:
+            tree.find(key)
+        seconds = time.perf_counter() - start
+        reads, read_bytes = disk.stats.reads - reads, disk.stats.bytes_read - read_bytes
+        print(f"{name:<10}{leaf_bytes(tree):>9.0f}{reads / len(probes):>12.2f}{read_bytes / len(probes):>9.0f}"
+              f"{len(probes) / seconds:>10.0f}")
+
+    print()
+    print(f"{'int keys':<10}{'plain B':>9}{'delta B':>9}")
+    for name, step in (("dense", 1), ("step 100", 100), ("random", None)):
+        if step is None:
+            keys = sorted(rng.sample(range(2 ** 40), args.keys))
+        else:
+            keys = [2 ** 40 + i * step for i in range(args.keys)]
+        sizes = []
+        for codec in (NodeCodec(), NodeCodec(delta_keys=True)):
+            tree = BTree.from_sorted(((key, None) for key in keys), args.M, args.L, disk=Disk(codec))
+            sizes.append(leaf_bytes(tree))
+        print(f"{name:<10}{sizes[0]:>9.0f}{sizes[1]:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
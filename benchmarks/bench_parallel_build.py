@@ -0,0 +1,56 @@
+"""
+Scaling of the process-parallel bulk build: the time to build one tree from
+sorted input with 1..N worker processes, next to the single-process loader.
+
+    python -m benchmarks.bench_parallel_build [--keys 1000000] [--workers 1,2,4,8]
+                                              [--storage memory|file] [-M 64] [-L 64]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from py_btrees.btree import BTree
+from py_btrees.disk import Disk
+from py_btrees.file_disk import FileDisk
+
+
+def build(items, args, workers: int, directory: str) -> float:
+    if args.storage == "file":
+        disk = FileDisk(os.path.join(directory, f"build-{workers}.db"), block_size=args.block_size)
+    else:
+        disk = Disk()
+    start = time.perf_counter()
+    BTree.from_sorted(items, args.M, args.L, disk=disk, workers=workers)
+    if args.storage == "file":
+        disk.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1000000)
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, *(2 ** i for i in range(1, cores.bit_length())), cores})
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)),
+                        help="comma separated worker counts; 1 is the single-process loader")
+    parser.add_argument("--storage", choices=["memory", "file"], default="memory")
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    args = parser.parse_args()
+
+    items = [(i, f"value-{i}") for i in range(args.keys)]
+    print(f"{args.keys} keys, M={args.M}, L={args.L}, {args.storage} storage, {cores} cores")
+    print(f"{'workers':>8}{'seconds':>10}{'keys/s':>12}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for workers in map(int, args.workers.split(",")):
+            seconds = build(items, args, workers, directory)
+            baseline = baseline or seconds
+            print(f"{workers:>8}{seconds:>10.2f}{args.keys / seconds:>12.0f}{baseline / seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cost of finding the child to descend to in one internal node, for fan-outs
+M from 8 to 65536: key comparisons per level and time per search for the
+linear scan the tree used to do, bisect, and interpolation search, on evenly
+spread and on skewed integer keys.
+
+    python -m benchmarks.bench_search [--probes 300] [--max-m 65536] [--seed 0]
+"""
+
+import argparse
+import bisect
+import random
+import time
+from typing import Callable, List
+
+from py_btrees.btree_node import interpolation_search
+from py_btrees.compact import int_array
+
+
+class Counted(int):
+    """An int that counts how often it is compared."""
+    comparisons = 0
+
+    def __lt__(self, other):
+        Counted.comparisons += 1
+        return int(self) < int(other)
+
+    def __le__(self, other):
+        Counted.comparisons += 1
+        return int(self) <= int(other)
+
+    def __gt__(self, other):
+        Counted.comparisons += 1
+        return int(self) > int(other)
+
+
+def linear_search(keys: List[int], key: int) -> int:
+    """The scan BTree.find_rec did on internal nodes."""
+    index = 0
+    while index < len(keys) and key > keys[index]:
+        index += 1
+    return index
+
+
+SEARCHES = {"linear": linear_search, "bisect": bisect.bisect_left, "interpolation": interpolation_search}
+
+
+def separators(n: int, skewed: bool, rng: random.Random) -> List[int]:
+    if skewed:
+        keys = set()
+        while len(keys) < n:
+            keys.add(int(rng.lognormvariate(0, 3) * 10 ** 6))
+        return sorted(keys)
+    return sorted(rng.sample(range(n * 100), n))
+
+
+def comparisons(search: Callable, keys: List[int], probes: List[int]) -> float:
+    counted_keys = [Counted(k) for k in keys]
+    counted_probes = [Counted(p) for p in probes]
+    Counted.comparisons = 0
+    for probe in counted_probes:
+        search(counted_keys, probe)
+    return Counted.comparisons / len(probes)
+
+
+def seconds_per_search(search: Callable, keys: List[int], probes: List[int]) -> float:
+    keys = int_array(keys)
+    start = time.perf_counter()
+    for probe in probes:
+        search(keys, probe)
+    return (time.perf_counter() - start) / len(probes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--probes", type=int, default=300, help="searches per node")
+    parser.add_argument("--max-m", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'keys':<8}{'M':>7}" + "".join(f"{name + ' cmp':>19}" for name in SEARCHES)
+          + "".join(f"{name + ' us':>18}" for name in SEARCHES))
+    for skewed in (False, True):
+        M = 8
+        while M <= args.max_m:
+            keys = separators(M - 1, skewed, rng)
+            probes = [rng.randrange(keys[0] - 1, keys[-1] + 2) for _ in range(args.probes)]
+            counts = [comparisons(search, keys, probes) for search in SEARCHES.values()]
+            times = [seconds_per_search(search, keys, probes) for search in SEARCHES.values()]
+            print(f"{'skewed' if skewed else 'even':<8}{M:>7}" + "".join(f"{c:>19.1f}" for c in counts)
+                  + "".join(f"{t * 1e6:>18.2f}" for t in times))
+            M *= 4
+
+
+if __name__ == "__main__":
+    main()
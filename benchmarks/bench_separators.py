@@ -0,0 +1,136 @@
+"""
+Effect of truncated separators and prefix-compressed keys on a tree of
+URL-like string keys: for each combination, the largest M and L whose nodes
+still fit in one block, and the height and bytes per node of the resulting
+trees, bulk loaded and built by inserts in random order.
+
+    python -m benchmarks.bench_separators [--keys 150000] [--block-size 4096]
+"""
+
+import argparse
+import random
+from typing import Callable, List
+
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode, shortest_separator
+from py_btrees.codec import NodeCodec
+from py_btrees.disk import Disk
+
+CONFIGS = {
+    "full keys": (False, False),
+    "truncated": (True, False),
+    "prefixed": (False, True),
+    "both": (True, True),
+}
+
+
+def url_keys(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    hosts = [f"https://{sub}.shop{i:03d}.example.com" for i in range(200) for sub in ("www", "m")]
+    sections = ["products", "catalog/items", "p", "outlet/clearance"]
+    words = ["red", "blue", "garden", "chair", "lamp", "steel", "oak", "mini", "pro", "set", "table", "usb"]
+    keys = set()
+    while len(keys) < n:
+        slug = "-".join(rng.sample(words, rng.randint(2, 4)))
+        keys.add(f"{rng.choice(hosts)}/{rng.choice(sections)}/{slug}-{rng.randrange(10 ** 7)}?ref=home")
+    return sorted(keys)
+
+
+def largest_fitting(fits: Callable[[int], bool], hi: int) -> int:
+    """Binary search for the largest capacity in [2, hi] for which `fits` holds."""
+    lo = 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if fits(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def leaf_capacity(keys: List[str], codec: NodeCodec, block_size: int) -> int:
+    def fits(L: int) -> bool:
+        node = BTreeNode(0, 0, 0, True)
+        for start in range(0, len(keys), L):
+            node.keys = keys[start:start + L]
+            node.data = list(range(start, start + len(node.keys)))
+            if len(codec.encode(node)) > block_size:
+                return False
+        return True
+    return largest_fitting(fits, len(keys))
+
+
+def internal_capacity(separators: List[str], codec: NodeCodec, block_size: int) -> int:
+    def fits(M: int) -> bool:
+        node = BTreeNode(0, 0, 0, False)
+        for start in range(0, len(separators), M - 1):
+            node.keys = separators[start:start + M - 1]
+            node.children_addrs = list(range(start, start + len(node.keys) + 1))
+            if len(codec.encode(node)) > block_size:
+                return False
+        return True
+    return largest_fitting(fits, len(separators) + 1)
+
+
+def tree_shape(tree: BTree):
+    """Height, number of nodes, mean bytes per leaf and per internal node, mean separator length."""
+    disk = tree.disk
+    height, level = 0, [tree.root_addr]
+    sizes = {True: [], False: []}
+    separators = []
+    while level:
+        height += 1
+        next_level = []
+        for addr in level:
+            node = disk.read(addr)
+            sizes[node.is_leaf].append(len(disk.memory[addr]))
+            separators.extend(map(len, node.keys if not node.is_leaf else []))
+            next_level.extend(node.children_addrs)
+        level = next_level
+    mean = lambda values: sum(values) / len(values) if values else 0.0
+    return height, len(sizes[True]) + len(sizes[False]), mean(sizes[True]), mean(sizes[False]), mean(separators)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=150000, help="number of URL keys")
+    parser.add_argument("--block-size", type=int, default=4096, help="bytes per block")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    keys = url_keys(args.keys, args.seed)
+    shuffled = list(keys)
+    random.Random(args.seed).shuffle(shuffled)
+    print(f"{len(keys)} keys, {sum(map(len, keys)) / len(keys):.1f} characters on average, "
+          f"{args.block_size}-byte blocks")
+    print(f"{'config':<11}{'build':<7}{'L':>5}{'M':>5}{'height':>8}{'nodes':>8}"
+          f"{'leaf B':>9}{'inner B':>9}{'sep len':>9}")
+    for name, (truncate, prefix) in CONFIGS.items():
+        codec = NodeCodec(prefix_compression=prefix)
+        L = leaf_capacity(keys, codec, args.block_size)
+        chunks = [keys[start:start + L] for start in range(0, len(keys), L)]
+        if truncate:
+            separators = [shortest_separator(a[-1], b[0]) for a, b in zip(chunks, chunks[1:])]
+        else:
+            separators = [chunk[-1] for chunk in chunks[:-1]]
+        M = internal_capacity(separators, codec, args.block_size)
+        # Higher levels may hold longer separators than the leaf level: back off until every block fits
+        while True:
+            try:
+                loaded = BTree.from_sorted(((key, i) for i, key in enumerate(keys)), M, L,
+                                           disk=Disk(codec, block_size=args.block_size),
+                                           truncate_separators=truncate)
+                break
+            except ValueError:
+                M -= 1
+        inserted = BTree(M, L, disk=Disk(codec), truncate_separators=truncate)
+        for i, key in enumerate(shuffled):
+            inserted.insert(key, i)
+        for build, tree in (("bulk", loaded), ("insert", inserted)):
+            height, nodes, leaf_bytes, inner_bytes, sep_len = tree_shape(tree)
+            print(f"{name:<11}{build:<7}{L:>5}{M:>5}{height:>8}{nodes:>8}"
+                  f"{leaf_bytes:>9.0f}{inner_bytes:>9.0f}{sep_len:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Fixed M and L against BTree.for_block_size() on a FileDisk, for a few block
+sizes: the height, how much of a block the leaves use and how many nodes
+spill into chained blocks (from BTree.advise()), and insert / find throughput.
+
+    python -m benchmarks.bench_sizing [--keys 100000] [--block-sizes 1024 4096 16384]
+                                      [--value-size 20] [-M 64] [-L 64]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from py_btrees.btree import BTree
+from py_btrees.file_disk import FileDisk
+
+
+def run(tree, pairs, probes):
+    start = time.perf_counter()
+    for key, value in pairs:
+        tree.insert(key, value)
+    insert_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in probes:
+        tree.find(key)
+    find_seconds = time.perf_counter() - start
+    return len(pairs) / insert_seconds, len(probes) / find_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[1024, 4096, 16384])
+    parser.add_argument("--value-size", type=int, default=20)
+    parser.add_argument("-M", type=int, default=64)
+    parser.add_argument("-L", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pairs = [(rng.randrange(10 ** 12), "v" * rng.randrange(args.value_size // 2, args.value_size + 1))
+             for _ in range(args.keys)]
+    probes = [key for key, _ in rng.sample(pairs, min(len(pairs), 20000))]
+    print(f"{args.keys} random int keys, str values of up to {args.value_size} chars")
+    print(f"{'block':>6} {'sizing':<10}{'M':>6}{'L':>6}{'height':>7}{'leaf use':>9}{'spilled':>8}"
+          f"{'inserts/s':>11}{'finds/s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for block_size in args.block_sizes:
+            for sizing in ("fixed", "auto"):
+                with FileDisk(os.path.join(directory, f"{sizing}-{block_size}.db"), block_size=block_size) as disk:
+                    if sizing == "fixed":
+                        tree = BTree(args.M, args.L, disk=disk)
+                    else:
+                        tree = BTree.for_block_size(pairs[:1000], disk=disk)
+                    inserts, finds = run(tree, pairs, probes)
+                    report = tree.advise(samples=200, seed=args.seed)
+                    spilled = report.oversized / max(1, report.leaves + report.internals)
+                    print(f"{block_size:>6} {sizing:<10}{tree.M:>6}{tree.L:>6}{report.height:>7}"
+                          f"{report.block_use()[0]:>9.0%}{spilled:>8.0%}{inserts:>11.0f}{finds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Benchmark BTree operations over a grid of M/L values, key distributions and
+tree sizes, and write the results as JSON so that runs of different versions
+can be diffed.
+
+    python -m benchmarks.run [-M 16 128] [-L 16 128] [--sizes 10000 100000]
+                             [--dists sequential reverse uniform zipf]
+                             [--ops insert find scan delete] [--storage file]
+                             [--out results.json] [--compare baseline.json]
+
+For every combination the tree is built by inserting `size` keys in the order
+given by the distribution, then `--lookups` finds, `--scans` range scans of
+`--scan-length` keys and `--deletes` deletes are run against it. Each phase
+reports its throughput, latency percentiles and the node reads/writes per
+operation, measured through BTree.add_listener (so the throughput includes
+the cost of the instrumentation itself). For scans, `ops` and the per-op
+averages count keys read, while the latency and read percentiles are per
+scan. After the build the tree's height,
+node counts and space utilization are reported too.
+
+Every combination gets a fresh disk of its own: with `--storage file` (the
+default) a FileDisk in a temporary directory, with `--storage memory` an
+in-memory Disk that is dropped after the combination has run.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+from py_btrees.btree import BTree
+from py_btrees.disk import Disk
+from py_btrees.file_disk import FileDisk
+
+DISTRIBUTIONS = ("sequential", "reverse", "uniform", "zipf")
+OPERATIONS = ("insert", "find", "scan", "delete")
+
+# Keep at most this many latency samples per phase; longer phases keep every k-th one
+MAX_SAMPLES = 1000000
+
+
+class ZipfGenerator:
+    """
+    Draws ranks in [0, n) with P(rank i) proportional to 1 / (i + 1) ** theta, in
+    constant time per draw (Gray et al., "Quickly generating billion-record
+    synthetic databases"). theta = 0.99 is the YCSB default.
+    """
+
+    def __init__(self, n: int, theta: float = 0.99, rng: Optional[random.Random] = None):
+        self.n = n
+        self.theta = theta
+        self.rng = rng or random.Random()
+        self.alpha = 1 / (1 - theta)
+        self.zetan = sum(1 / (i ** theta) for i in range(1, n + 1))
+        zeta2 = 1 + 0.5 ** theta
+        self.eta = (1 - (2 / n) ** (1 - theta)) / (1 - zeta2 / self.zetan)
+        self.half_pow_theta = 1 + 0.5 ** theta
+
+    def next(self) -> int:
+        u = self.rng.random()
+        uz = u * self.zetan
+        if uz < 1:
+            return 0
+        if uz < self.half_pow_theta:
+            return 1
+        return min(self.n - 1, int(self.n * (self.eta * u - self.eta + 1) ** self.alpha))
+
+
+def key_stream(dist: str, keys: List[int], count: int, rng: random.Random) -> List[int]:
+    """`count` keys drawn from `keys` (sorted) in the order of the distribution."""
+    n = len(keys)
+    if dist == "sequential":
+        return [keys[i % n] for i in range(count)]
+    if dist == "reverse":
+        return [keys[n - 1 - i % n] for i in range(count)]
+    if dist == "uniform":
+        if count == n:
+            stream = list(keys)
+            rng.shuffle(stream)
+            return stream
+        return [keys[rng.randrange(n)] for _ in range(count)]
+    if dist == "zipf":
+        # Hot ranks are scattered over the key space rather than clustered at the low keys
+        zipf = ZipfGenerator(n, rng=rng)
+        scatter = list(range(n))
+        rng.shuffle(scatter)
+        return [keys[scatter[zipf.next()]] for _ in range(count)]
+    raise ValueError(f"Unknown distribution {dist!r}, expected one of {DISTRIBUTIONS}")
+
+
+class PhaseListener:
+    """BTree listener that keeps sampled latencies and counter totals for one phase."""
+
+    def __init__(self, expected_ops: int):
+        self.stride = max(1, math.ceil(expected_ops / MAX_SAMPLES))
+        self.latencies = array("d")
+        self.reads = array("l")
+        self.writes = array("l")
+        self.ops = 0
+        self.totals: Dict[str, float] = {}
+
+    def __call__(self, record) -> None:
+        if self.ops % self.stride == 0:
+            self.latencies.append(record.elapsed)
+            self.reads.append(int(record.counters.get("reads", 0)))
+            self.writes.append(int(record.counters.get("writes", 0)))
+        self.ops += 1
+        for name, value in record.counters.items():
+            self.totals[name] = self.totals.get(name, 0) + value
+
+    def report(self, elapsed: float, work: int) -> Dict[str, Any]:
+        """`work` is the number of logical operations (keys) covered by the phase."""
+        report: Dict[str, Any] = {
+            "ops": work,
+            "seconds": elapsed,
+            "ops_per_sec": work / elapsed if elapsed else None,
+            "latency_us": percentiles(self.latencies, scale=1e6),
+            "reads_per_op": self.totals.get("reads", 0) / work if work else None,
+            "writes_per_op": self.totals.get("writes", 0) / work if work else None,
+            "reads": percentiles(self.reads),
+            "writes": percentiles(self.writes),
+        }
+        for name in ("allocs", "bytes_read", "bytes_written", "encode_time", "decode_time", "hits", "misses"):
+            if name in self.totals:
+                report[name] = self.totals[name]
+        return report
+
+
+def percentiles(samples, scale: float = 1.0) -> Optional[Dict[str, float]]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda fraction: ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * scale
+    return {
+        "mean": sum(ordered) / len(ordered) * scale,
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "p999": pick(0.999),
+        "max": ordered[-1] * scale,
+    }
+
+
+def run_phase(btree: BTree, expected_ops: int, body) -> Dict[str, Any]:
+    """Run `body()` (which returns the number of keys it covered) with a fresh listener attached."""
+    listener = PhaseListener(expected_ops)
+    btree.add_listener(listener)
+    start = time.perf_counter()
+    try:
+        work = body()
+    finally:
+        elapsed = time.perf_counter() - start
+        btree.remove_listener(listener)
+    return listener.report(elapsed, work)
+
+
+def tree_shape(btree: BTree) -> Dict[str, Any]:
+    """Height, node counts and how full the leaves and internal nodes are."""
+    height = 0
+    level = [btree.root_addr]
+    leaves = internals = keys = children = 0
+    while level:
+        height += 1
+        next_level = []
+        for addr in level:
+            node = btree.disk.read(addr)
+            if node.is_leaf:
+                leaves += 1
+                keys += len(node.keys)
+            else:
+                internals += 1
+                children += len(node.children_addrs)
+                next_level.extend(node.children_addrs)
+        level = next_level
+    return {
+        "height": height,
+        "keys": keys,
+        "leaves": leaves,
+        "internal_nodes": internals,
+        "leaf_utilization": keys / (leaves * btree.L) if leaves else None,
+        "internal_utilization": children / (internals * btree.M) if internals else None,
+    }
+
+
+def run_config(M: int, L: int, dist: str, size: int, args, workdir: str) -> Dict[str, Any]:
+    rng = random.Random(f"{args.seed}-{M}-{L}-{dist}-{size}")
+    result: Dict[str, Any] = {"M": M, "L": L, "dist": dist, "size": size}
+    path = os.path.join(workdir, f"bench-{M}-{L}-{dist}-{size}.db")
+    disk = FileDisk(path, block_size=args.block_size) if args.storage == "file" else Disk()
+    try:
+        btree = BTree(M, L, disk=disk)
+        universe = list(range(0, size * 2, 2))  # even keys, so odd probes miss
+        if "insert" in args.ops:
+            stream = key_stream(dist, universe, size, rng)
+            def insert_all():
+                for key in stream:
+                    btree.insert(key, key)
+                return len(stream)
+            result["insert"] = run_phase(btree, size, insert_all)
+        else:
+            btree = BTree.from_sorted(((k, k) for k in universe), M, L, disk=disk)
+        result["tree"] = tree_shape(btree)
+        present = [key for key, _ in btree.items()]
+        if not present:
+            return result
+
+        if "find" in args.ops:
+            lookups = key_stream(dist, present, args.lookups, rng)
+            def find_all():
+                for key in lookups:
+                    btree.find(key)
+                return len(lookups)
+            result["find"] = run_phase(btree, len(lookups), find_all)
+
+        if "scan" in args.ops:
+            starts = key_stream(dist, present, args.scans, rng)
+            def scan_all():
+                scanned = 0
+                for lo in starts:
+                    for _ in zip(range(args.scan_length), btree.range(lo)):
+                        scanned += 1
+                return scanned
+            result["scan"] = run_phase(btree, len(starts), scan_all)
+            result["scan"]["scans"] = len(starts)
+
+        if "delete" in args.ops:
+            victims = list(dict.fromkeys(key_stream(dist, present, args.deletes, rng)))
+            def delete_all():
+                for key in victims:
+                    btree.delete(key)
+                return len(victims)
+            result["delete"] = run_phase(btree, len(victims), delete_all)
+            result["tree_after_delete"] = tree_shape(btree)
+        return result
+    finally:
+        if args.storage == "file":
+            result["file_bytes"] = os.path.getsize(path)
+            disk.close()
+            os.remove(path)
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print the change in throughput and reads per op for every configuration present in both runs."""
+    def index(run):
+        return {(r["M"], r["L"], r["dist"], r["size"]): r for r in run["results"]}
+    old, new = index(baseline), index(current)
+    print(f"{'M':>6}{'L':>6} {'dist':<11}{'size':>10} {'op':<7}{'ops/s':>12}{'change':>9}{'reads/op':>10}{'change':>9}",
+          file=sys.stderr)
+    for config in sorted(old.keys() & new.keys()):
+        for op in OPERATIONS:
+            before, after = old[config].get(op), new[config].get(op)
+            if not before or not after or "ops_per_sec" not in before or "ops_per_sec" not in after:
+                continue
+            speed = after["ops_per_sec"] / before["ops_per_sec"] - 1 if before["ops_per_sec"] else 0
+            reads = after["reads_per_op"] - before["reads_per_op"]
+            print(f"{config[0]:>6}{config[1]:>6} {config[2]:<11}{config[3]:>10} {op:<7}"
+                  f"{after['ops_per_sec']:>12.0f}{speed:>+9.1%}{after['reads_per_op']:>10.2f}{reads:>+9.2f}",
+                  file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-M", type=int, nargs="+", default=[16, 128])
+    parser.add_argument("-L", type=int, nargs="+", default=[16, 128])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="keys in the tree")
+    parser.add_argument("--dists", nargs="+", choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    parser.add_argument("--ops", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--lookups", type=int, default=100000, help="finds per configuration")
+    parser.add_argument("--scans", type=int, default=1000, help="range scans per configuration")
+    parser.add_argument("--scan-length", type=int, default=100, help="keys read by each scan")
+    parser.add_argument("--deletes", type=int, default=10000, help="deletes per configuration")
+    parser.add_argument("--storage", choices=("file", "memory"), default="file")
+    parser.add_argument("--block-size", type=int, default=4096, help="FileDisk block size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON here instead of to stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="print the change against an earlier JSON result")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"environment": environment(), "args": vars(args), "results": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for M in args.M:
+                for L in args.L:
+                    for dist in args.dists:
+                        print(f"M={M} L={L} dist={dist} size={size}", file=sys.stderr)
+                        report["results"].append(run_config(M, L, dist, size, args, workdir))
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+asyncio front end for a BTree: reads are awaited block by block, writes run
+on a worker thread, and the nodes are the same ones the synchronous BTree
+stores, so a tree built with BTree can be opened with AsyncBTree and back.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Tuple
+from py_btrees.disk import Address, BLOCK_SIZE
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode, KT, VT
+from py_btrees.codec import ValueRef, decode_value
+from py_btrees.file_disk import FileDisk
+
+
+class AsyncDiskStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.fetches = 0    # reads handed to the executor
+        self.coalesced = 0  # reads answered by a fetch that was already in flight
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"fetches": self.fetches, "coalesced": self.coalesced}
+
+
+class AsyncDisk:
+    """
+    Awaitable version of the storage interface over any synchronous disk
+    (Disk, FileDisk, BufferPool). Every call runs on an executor of at most
+    `max_workers` threads, so blocking I/O never stalls the event loop and
+    never occupies more threads than that.
+
+    Concurrent reads of the same address share one fetch: while a read of a
+    block is in flight, further reads of it wait for that read instead of
+    starting their own, and all of them get the same node object back, which
+    they must therefore not modify. A write drops the in-flight read of its
+    block, so reads started after the write see the new node.
+    """
+
+    def __init__(self, disk, max_workers: int = 4):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, not {max_workers}")
+        self.disk = disk
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending: Dict[Address, "asyncio.Future[BTreeNode]"] = {}
+        self.stats = AsyncDiskStats()
+
+    def run(self, fn: Callable, *args: Any) -> "asyncio.Future":
+        """Run a blocking call on the executor."""
+        return asyncio.get_event_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def read(self, addr: Address) -> BTreeNode:
+        future = self.pending.get(addr)
+        if future is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.fetches += 1
+            future = self.run(self.disk.read, addr)
+            self.pending[addr] = future
+            future.add_done_callback(functools.partial(self._done, addr))
+        # One cancelled reader must not cancel the fetch the others are waiting for
+        return await asyncio.shield(future)
+
+    async def read_raw(self, addr: Address) -> bytes:
+        return await self.run(self.disk.read_raw, addr)
+
+    async def write(self, addr: Address, node: BTreeNode) -> None:
+        self.pending.pop(addr, None)
+        await self.run(self.disk.write, addr, node)
+
+    async def new(self) -> Address:
+        return await self.run(self.disk.new)
+
+    async def free(self, addr: Address) -> None:
+        self.pending.pop(addr, None)
+        await self.run(self.disk.free, addr)
+
+    async def save_meta(self, meta: Dict[str, Any]) -> None:
+        await self.run(self.disk.save_meta, meta)
+
+    async def load_meta(self) -> Dict[str, Any]:
+        return await self.run(self.disk.load_meta)
+
+    async def close(self) -> None:
+        """Stop the executor once the calls already submitted have finished. The disk stays open."""
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> "AsyncDisk":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _done(self, addr: Address, future: "asyncio.Future") -> None:
+        if self.pending.get(addr) is future:
+            del self.pending[addr]
+
+
+class AsyncFileDisk(AsyncDisk):
+    """An AsyncDisk that owns a FileDisk: the arguments are FileDisk's, and close() closes the file."""
+
+    def __init__(self, path: str, block_size: int = BLOCK_SIZE, codec=None, max_workers: int = 4,
+                 **options: Any):
+        super().__init__(FileDisk(path, block_size, codec, **options), max_workers)
+
+    async def close(self) -> None:
+        await self.run(self.disk.close)
+        await super().close()
+
+
+class AsyncRWLatch:
+    """RWLatch for coroutines: shared or exclusive, and a waiting writer keeps new readers out."""
+
+    def __init__(self):
+        self.cond = asyncio.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    async def acquire_shared(self) -> None:
+        async with self.cond:
+            while self.writer or self.waiting_writers:
+                await self.cond.wait()
+            self.readers += 1
+
+    async def release_shared(self) -> None:
+        async with self.cond:
+            self.readers -= 1
+            if self.readers == 0:
+                self.cond.notify_all()
+
+    async def acquire_exclusive(self) -> None:
+        async with self.cond:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                await self.cond.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+
+    async def release_exclusive(self) -> None:
+        async with self.cond:
+            self.writer = False
+            self.cond.notify_all()
+
+
+class AsyncBTree:
+    """
+    A BTree used from coroutines. find() and range() descend the tree on the
+    event loop, awaiting each block from the AsyncDisk; insert(), insert_many()
+    and delete() run the synchronous BTree code on the disk's executor.
+
+    Any number of lookups and scans run together, and a write waits until the
+    lookups in progress are done (scans only hold the latch while they copy
+    a leaf, as in BTree.range). Create the AsyncBTree inside the event loop
+    that uses it, and do not change the tree through the BTree in `tree`
+    while it is in use.
+    """
+
+    def __init__(self, tree: BTree, disk: AsyncDisk):
+        self.tree = tree
+        self.disk = disk
+        self.latch = AsyncRWLatch()
+
+    @classmethod
+    async def create(cls, M: int, L: int, disk: AsyncDisk) -> "AsyncBTree":
+        """Start an empty tree on `disk`."""
+        return cls(await disk.run(BTree, M, L, disk.disk), disk)
+
+    @classmethod
+    async def open(cls, disk: AsyncDisk) -> "AsyncBTree":
+        """Open the tree last saved on `disk`, for instance one built with BTree on a FileDisk."""
+        return cls(await disk.run(BTree.open, disk.disk), disk)
+
+    async def find(self, key: KT) -> Optional[VT]:
+        await self.latch.acquire_shared()
+        try:
+            leaf = await self.find_leaf(key)
+            return await self.load_value(leaf.find_data(key))
+        finally:
+            await self.latch.release_shared()
+
+    async def insert(self, key: KT, value: VT) -> None:
+        await self.write(self.tree.insert, key, value)
+
+    async def insert_many(self, pairs: Iterable[Tuple[KT, VT]]) -> None:
+        await self.write(self.tree.insert_many, list(pairs))
+
+    async def delete(self, key: KT) -> None:
+        await self.write(self.tree.delete, key)
+
+    async def range(self, lo: Optional[KT] = None, hi: Optional[KT] = None,
+                    inclusive: Tuple[bool, bool] = (True, True),
+                    reverse: bool = False) -> AsyncIterator[Tuple[KT, VT]]:
+        """`async for` version of BTree.range(), with the same arguments and guarantees."""
+        resume = None
+        await self.latch.acquire_shared()
+        try:
+            leaf = await self.find_leaf(hi if reverse else lo, last=reverse)
+        except BaseException:
+            await self.latch.release_shared()
+            raise
+        while True:
+            keys, data, done, step = self.tree.scan_leaf(leaf, lo, hi, inclusive, reverse, resume)
+            epoch = self.tree.epoch
+            try:
+                if self.tree.overflow_threshold is None:
+                    values = self.tree.load_values(data)  # nothing to fetch
+                else:
+                    values = [await self.load_value(value) for value in data]
+            finally:
+                await self.latch.release_shared()
+
+            for pair in zip(keys, values):
+                yield pair
+            if keys:
+                resume = keys[-1]
+            if done or step is None:
+                return
+
+            await self.latch.acquire_shared()
+            try:
+                if self.tree.epoch == epoch:
+                    leaf = await self.disk.read(step)
+                else:
+                    leaf = await self.find_leaf(resume if resume is not None else (hi if reverse else lo),
+                                                last=reverse)
+            except BaseException:
+                await self.latch.release_shared()
+                raise
+
+    def items(self, reverse: bool = False) -> AsyncIterator[Tuple[KT, VT]]:
+        return self.range(reverse=reverse)
+
+    async def load_value(self, value: Any) -> Any:
+        """Async BTree.load_value: fetch a value kept out of its leaf. Needs the latch held."""
+        if type(value) is ValueRef:
+            return decode_value(await self.disk.read_raw(value.addr))
+        return value
+
+    async def find_leaf(self, key: Optional[KT] = None, last: bool = False) -> BTreeNode:
+        """Descend to the leaf for `key`, or to the first (last) leaf if key is None. Needs the latch held."""
+        node = await self.disk.read(self.tree.root_addr)
+        while not node.is_leaf:
+            if key is None:
+                addr = node.children_addrs[-1 if last else 0]
+            else:
+                addr = node.children_addrs[self.tree.child_index(node, key)]
+            node = await self.disk.read(addr)
+        return node
+
+    async def write(self, fn: Callable, *args: Any) -> None:
+        await self.latch.acquire_exclusive()
+        try:
+            await self.disk.run(fn, *args)
+        finally:
+            await self.latch.release_exclusive()
@@ -0,0 +1,143 @@
+"""
+Bloom filters that let a BTree answer lookups of absent keys without
+reading the blocks that would hold them (see BTree(bloom_fp_rate=...)).
+"""
+
+import math
+from hashlib import blake2b
+from typing import Any, Dict, Iterable, Optional, Tuple
+from py_btrees.disk import Address
+
+KeyHash = Tuple[int, int]
+
+_LN2 = math.log(2)
+_MASK = 2 ** 64 - 1
+
+
+def key_hash(key: Any) -> KeyHash:
+    """
+    The two 64-bit hashes a key is probed with. They are derived from hash(),
+    so keys that compare equal (1 and 1.0) hash alike; filters are therefore
+    only meaningful within one process and are never stored.
+    """
+    digest = blake2b((hash(key) & _MASK).to_bytes(8, "little"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """A bit array sized for `capacity` keys at a false positive rate of `fp_rate`."""
+    __slots__ = ("bits", "size", "hashes")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(fp_rate) / _LN2 ** 2))
+        self.hashes = max(1, round(self.size / capacity * _LN2))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, h: KeyHash) -> None:
+        h1, h2 = h
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def might_contain(self, h: KeyHash) -> bool:
+        h1, h2 = h
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class BloomStats:
+    def __init__(self, fp_rate: float):
+        self.fp_rate = fp_rate  # the configured false positive rate of every filter
+        self.reset()
+
+    def reset(self) -> None:
+        self.lookups = 0          # keys looked up with the filters
+        self.tree_skips = 0       # rejected by the filter of the whole tree, without reading any block
+        self.leaf_skips = 0       # rejected by the filter of their leaf, without reading the leaf
+        self.false_positives = 0  # passed both filters, but the leaf did not have them
+
+    def skip_ratio(self) -> float:
+        """Fraction of lookups answered without reading a leaf."""
+        return (self.tree_skips + self.leaf_skips) / self.lookups if self.lookups else 0.0
+
+    def observed_fp_rate(self) -> float:
+        """Fraction of the lookups of absent keys that the filters let through."""
+        absent = self.tree_skips + self.leaf_skips + self.false_positives
+        return self.false_positives / absent if absent else 0.0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "bloom_lookups": self.lookups,
+            "bloom_tree_skips": self.tree_skips,
+            "bloom_leaf_skips": self.leaf_skips,
+            "bloom_false_positives": self.false_positives,
+        }
+
+
+class TreeFilters:
+    """
+    The filters of one tree: one over every key, sized for twice the keys it
+    was built with, and one per leaf, kept in memory next to the tree.
+
+    Deleted keys stay in the filters, which only ever err towards "maybe".
+    The tree filter is rebuilt from the leaves once it holds more keys than
+    it was sized for, or once half the keys added to it have been deleted.
+    A leaf filter is added to on inserts into the leaf, and dropped when the
+    leaf is split, merged or lends a key; it is rebuilt the next time a
+    lookup reads the leaf.
+    """
+
+    def __init__(self, fp_rate: float, leaf_capacity: int):
+        if not 0 < fp_rate < 1:
+            raise ValueError(f"bloom_fp_rate must be between 0 and 1, not {fp_rate}")
+        self.fp_rate = fp_rate
+        self.leaf_capacity = leaf_capacity
+        self.tree: Optional[BloomFilter] = None  # built on first use
+        self.capacity = 0
+        self.added = 0
+        self.deleted = 0
+        self.leaves: Dict[Address, BloomFilter] = {}
+        self.stats = BloomStats(fp_rate)
+
+    def build(self, keys: Iterable[Any], count: int) -> None:
+        """
+        Start the tree filter over `count` keys. Lookups read the tree filter
+        without a lock, so the new one only replaces it once it holds every key.
+        """
+        capacity = max(2 * count, 1024)
+        tree = BloomFilter(capacity, self.fp_rate)
+        added = 0
+        for key in keys:
+            tree.add(key_hash(key))
+            added += 1
+        self.capacity, self.added, self.deleted = capacity, added, 0
+        self.tree = tree
+
+    def needs_rebuild(self) -> bool:
+        return self.tree is not None and (self.added > self.capacity or 2 * self.deleted > self.added)
+
+    def add(self, key: Any, leaf: Optional[Address] = None) -> None:
+        """Record a key added to the tree, and to the leaf at `leaf` if given."""
+        if self.tree is None:
+            return
+        h = key_hash(key)
+        self.tree.add(h)
+        self.added += 1
+        if leaf is not None:
+            leaf_filter = self.leaves.get(leaf)
+            if leaf_filter is not None:
+                leaf_filter.add(h)
+
+    def build_leaf(self, leaf: Any) -> None:
+        leaf_filter = BloomFilter(self.leaf_capacity, self.fp_rate)
+        for key in leaf.keys:
+            leaf_filter.add(key_hash(key))
+        self.leaves[leaf.my_addr] = leaf_filter
+
+    def forget(self, addrs: Iterable[Address]) -> None:
+        for addr in addrs:
+            self.leaves.pop(addr, None)
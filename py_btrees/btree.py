@@ -1,7 +1,23 @@
 import bisect
-from typing import Any, List, Optional, Tuple, Union, Dict, Generic, TypeVar, cast, NewType
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, MutableSequence, Optional, Tuple, Union, Dict, Generic, TypeVar, cast, NewType
 from py_btrees.disk import DISK, Address
-from py_btrees.btree_node import BTreeNode, KT, VT, get_node
+from py_btrees.bloom import KeyHash, TreeFilters, key_hash
+from py_btrees.btree_node import SEARCHES, BTreeNode, KT, VT, shortest_separator
+from py_btrees.bulk_load import BulkLoader
+from py_btrees.codec import ValueRef, decode_value, encode_value
+from py_btrees.dump import TransferStats, dump, load
+from py_btrees.fastpath import FastPathStats, Finger, ValueCache
+from py_btrees.sizing import DEFAULT_MAX_KEYS, SizingReport, advise, block_budget, fit_node_sizes, node_codec
+from py_btrees.compact import IntArray, compact, int_array, take
+from py_btrees.parallel_build import build_parallel
+from py_btrees.instrumentation import OpRecord, OpRecorder, instrumented
+from py_btrees.latches import LatchTable, NullLatchTable, RWLatch
+from py_btrees.wal import atomic
+
+# Latch-table key of the root pointer, held while the root address may change
+ROOT_LATCH = "root"
 
 """
 ----------------------- Starter code for your B-Tree -----------------------
@@ -42,18 +58,577 @@ Helpful Tips (You will need these):
 
 
 # Complete both the find and insert methods to earn full credit
-class BTree:
-    def __init__(self, M: int, L: int):
+class BTree(Generic[KT, VT]):
+    def __init__(self, M: int, L: int, disk=DISK, concurrent: bool = False, truncate_separators: bool = True,
+                 search: str = "bisect", overflow_threshold: Optional[int] = None,
+                 bloom_fp_rate: Optional[float] = None, cache_size: Optional[int] = None,
+                 order_stats: bool = False):
         """
         Initialize a new BTree.
-        You do not need to edit this method, nor should you.
+        `disk` is where the nodes live: the global DISK, or anything with the
+        same new/read/write interface such as a BufferPool wrapping it.
+        With `concurrent` set, the tree can be shared between threads: any
+        number of finds and range scans run in parallel with one writer.
+        With `truncate_separators` set, a leaf split with string or bytes keys
+        copies the shortest key that separates the two halves into the parent
+        (see shortest_separator) rather than the whole last key of the left half.
+        `search` picks how a descent finds the child to follow in an internal
+        node: "bisect", or "interpolation" for numeric keys that are spread
+        about evenly (see interpolation_search). Interpolation makes fewer key
+        comparisons, but bisect runs in C and is still faster on plain ints.
+        With `overflow_threshold` set, a value whose encoding is longer than
+        that many bytes is stored in a block of its own and only its address
+        is kept in the leaf (the disk needs read_raw and write_raw). Leaves then
+        hold more keys, and a lookup reads only the one large value it returns.
+        With `bloom_fp_rate` set, find and find_many first ask Bloom filters
+        with that false positive rate (one over the whole tree and one per
+        leaf, kept in memory) whether the key can be there, and return None
+        for absent keys without reading the leaf, or any block at all. See
+        bloom.TreeFilters; the counters are in `self.bloom.stats`.
+        With `cache_size` set, find keeps the values of up to that many
+        recently found keys in memory and answers them again without reading
+        a block (see fastpath.ValueCache). Independently of it, lookups first
+        try the leaf the previous lookup ended in (see fastpath.Finger); the
+        counters of both are in `self.fast_stats`.
+        With `order_stats` set, internal nodes keep the number of keys in the
+        subtree of each child, for rank(), select() and count(). An insert of
+        a new key or a delete then rewrites every node on its path instead of
+        just the leaf (and a concurrent tree looks the key up first), which
+        about doubles the blocks written per key.
         """
-        self.root_addr: Address = DISK.new()  # Remember, this is the ADDRESS of the root node
+        self.init_state(disk, M, L, concurrent, truncate_separators, search, overflow_threshold, bloom_fp_rate,
+                        cache_size, order_stats)
+        if self.bloom is not None:
+            self.bloom.build([], 0)
+        with self.transaction():
+            root_addr = self.disk.new()
+            self.disk.write(root_addr, BTreeNode(root_addr, None, None, True))
+            self.root_addr: Address = root_addr  # Remember, this is the ADDRESS of the root node
         # DO NOT RENAME THE ROOT MEMBER -- LEAVE IT AS self.root_addr
-        DISK.write(self.root_addr, BTreeNode(self.root_addr, None, None, True))
+
+    def init_state(self, disk, M: int, L: int, concurrent: bool = False, truncate_separators: bool = True,
+                   search: str = "bisect", overflow_threshold: Optional[int] = None,
+                   bloom_fp_rate: Optional[float] = None, cache_size: Optional[int] = None,
+                   order_stats: bool = False) -> None:
+        """Set up everything but the root; shared by __init__ and the alternative constructors."""
+        if search not in SEARCHES:
+            raise ValueError(f"Unknown search {search!r}, expected one of {', '.join(SEARCHES)}")
+        self.disk = disk
         self.M = M  # M will fall in the range 2 to 99999
         self.L = L  # L will fall in the range 1 to 99999
+        self.truncate_separators = truncate_separators
+        self.search = search
+        self.search_keys = SEARCHES[search]
+        self.overflow_threshold = overflow_threshold
+        self.bloom = TreeFilters(bloom_fp_rate, L + 1) if bloom_fp_rate is not None else None
+        self.cache = ValueCache(cache_size) if cache_size is not None else None
+        self.order_stats = order_stats
+        self.finger: Optional[Finger] = None
+        self.fast_stats = FastPathStats()
+        self.listeners: List[Callable[[OpRecord], None]] = []
+        self.op_depth = 0
+        self.txn_depth = 0
+        # Readers couple shared latches down the tree; writers take exclusive ones one at a time
+        self.concurrent = concurrent
+        self.latches = LatchTable() if concurrent else NullLatchTable()
+        self.writer_lock = threading.RLock()
+        self.held: Dict[Any, RWLatch] = {}
+        # Bumped after every write that split, merged or borrowed, so that scans notice that keys
+        # moved between leaves and the finger goes stale. It only changes once the write is complete,
+        # before its latches go.
+        self.epoch = 0
+        self.restructured = False
+
+    @property
+    def root_addr(self) -> Address:
+        return self._root_addr
+
+    @root_addr.setter
+    def root_addr(self, addr: Address) -> None:
+        # Every root change is recorded on the disk so a persistent tree can be reopened
+        self._root_addr = addr
+        self.disk.save_meta(self.tree_meta())
+
+    def tree_meta(self) -> Dict[str, Any]:
+        """Everything besides the nodes themselves that is needed to reopen this tree."""
+        return {"root_addr": self.root_addr, "M": self.M, "L": self.L,
+                "truncate_separators": self.truncate_separators, "search": self.search,
+                "overflow_threshold": self.overflow_threshold,
+                "bloom_fp_rate": self.bloom.fp_rate if self.bloom is not None else None,
+                "cache_size": self.cache.capacity if self.cache is not None else None,
+                "order_stats": self.order_stats}
+
+    @classmethod
+    def open(cls, disk, concurrent: bool = False, order_stats: Optional[bool] = None) -> "BTree":
+        """
+        Reopen the tree whose metadata was last saved on `disk` (e.g. a FileDisk after a restart).
+        `order_stats` turns order statistics on or off for the reopened tree
+        (see __init__); the subtree counts are then filled in or dropped in one
+        pass over every node. By default the tree keeps what it was saved with.
+        """
+        meta = disk.load_meta()
+        if "root_addr" not in meta:
+            raise ValueError("There is no tree stored on this disk")
+        tree = cls.__new__(cls)
+        tree.init_state(disk, meta["M"], meta["L"], concurrent, meta.get("truncate_separators", True),
+                        meta.get("search", "bisect"), meta.get("overflow_threshold"), meta.get("bloom_fp_rate"),
+                        meta.get("cache_size"), meta.get("order_stats", False))
+        tree._root_addr = meta["root_addr"]
+        if order_stats is not None and order_stats != tree.order_stats:
+            tree.order_stats = order_stats
+            with tree.writer_lock, tree.transaction():
+                tree.recount(tree.root_addr)
+                tree.root_addr = tree.root_addr
+        return tree
+
+    @classmethod
+    def from_sorted(cls, items: Iterable[Tuple[KT, VT]], M: int, L: int, fill_factor: float = 1.0,
+                    disk=DISK, concurrent: bool = False, truncate_separators: bool = True,
+                    workers: int = 1, search: str = "bisect", overflow_threshold: Optional[int] = None,
+                    bloom_fp_rate: Optional[float] = None, cache_size: Optional[int] = None,
+                    order_stats: bool = False) -> "BTree":
+        """
+        Build a tree bottom-up from (key, value) pairs in strictly ascending key order.
+        Leaves and internal nodes are packed to `fill_factor` of their capacity and
+        every node is written to disk exactly once. `items` may be a generator.
+
+        With `workers` > 1 the input is read into a list, split by key range
+        and the subtrees are built by that many processes (see
+        parallel_build.build_parallel); `disk` then has to be a Disk or a FileDisk.
+        `search`, `overflow_threshold`, `bloom_fp_rate`, `cache_size` and
+        `order_stats` are as for __init__.
+        """
+        tree = cls.__new__(cls)
+        tree.init_state(disk, M, L, concurrent, truncate_separators, search, overflow_threshold, bloom_fp_rate,
+                        cache_size, order_stats)
+        with tree.transaction():
+            stored: Iterable[Tuple[KT, Union[VT, ValueRef]]] = items
+            if overflow_threshold is not None:
+                stored = ((key, tree.store_value(value)) for key, value in items)
+            root_addr = None
+            if workers > 1:
+                stored = list(stored)
+                root_addr = build_parallel(stored, M, L, fill_factor, disk, truncate_separators, workers,
+                                           order_stats=order_stats)
+            if root_addr is None:
+                loader = BulkLoader(M, L, fill_factor, disk, truncate_separators, order_stats=order_stats)
+                loader.add_all(stored)
+                root_addr = loader.finish()
+            tree.root_addr = root_addr
+        return tree
+
+    @classmethod
+    def for_block_size(cls, sample: Iterable[Tuple[KT, VT]], block_size: Optional[int] = None, disk=DISK,
+                       max_keys: int = DEFAULT_MAX_KEYS, **options: Any) -> "BTree":
+        """
+        A new, empty tree whose M and L are the largest for which its nodes
+        fit in one block, for keys and values like the (key, value) pairs of
+        `sample` (see sizing.fit_node_sizes). `block_size` defaults to the
+        block of `disk` (see sizing.block_budget): BLOCK_SIZE unless the disk
+        says otherwise. `max_keys` bounds the tree size, which decides how wide
+        child addresses and subtree counts are stored. Other keyword arguments
+        are passed to __init__.
+        """
+        block_size = block_size if block_size is not None else block_budget(disk)
+        M, L = fit_node_sizes(list(sample), block_size, node_codec(disk),
+                              options.get("overflow_threshold"), max_keys)
+        return cls(M, L, disk=disk, **options)
+
+    def advise(self, block_size: Optional[int] = None, samples: int = 64,
+               seed: Optional[int] = None) -> SizingReport:
+        """
+        Look at the nodes on `samples` random root-to-leaf paths (leaves are
+        picked in proportion to their keys) and report the height, the average
+        encoded size and fill of leaves and internal nodes, and the M and L
+        that for_block_size() would choose for the pairs seen, against
+        `block_size` (default: the block of the disk). Runs alongside other
+        readers and writers like find() does.
+        """
+        return advise(self, block_size, samples, seed)
+
+    def dump(self, path: str, chunk_keys: int = 4096) -> TransferStats:
+        """
+        Stream every pair to the file at `path` in key order, in checksummed
+        chunks of `chunk_keys` pairs, with the options of the tree. Memory use
+        does not grow with the tree. Returns the size, pair count and time.
+        BTree.load() rebuilds the tree from the file; see dump.dump().
+        """
+        return dump(self, path, chunk_keys)
+
+    @classmethod
+    def load(cls, path: str, disk=DISK, concurrent: bool = False, fill_factor: float = 1.0,
+             M: Optional[int] = None, L: Optional[int] = None,
+             stats: Optional[TransferStats] = None, allow_pickle: bool = False) -> "BTree":
+        """
+        Build a tree on `disk` from a file written by dump(), bottom-up like
+        from_sorted() while the file is read, so that no key is looked up and
+        memory use does not grow with the tree. The tree gets the options it
+        was dumped with, except for `M` and `L` if given. Pass a TransferStats
+        as `stats` to get the size, pair count and time. A file that is not a
+        dump, is truncated or fails a checksum raises ValueError; the nodes
+        built until then are only rolled back on a transactional disk.
+        Keys and values that dump() could not store as ints, strings or bytes
+        are pickled, and unpickling a file from an untrusted source can run
+        arbitrary code. Such a file therefore raises ValueError too, unless
+        `allow_pickle` is set.
+        """
+        return load(cls, path, disk, concurrent, fill_factor, M, L, stats, allow_pickle)
+
+    def snapshot(self) -> "Snapshot":
+        """
+        A read-only handle on the tree as it is now, which later inserts and
+        deletes do not affect. The tree has to be on a VersionedDisk, or on
+        a BufferPool over one (see snapshot.VersionedDisk).
+        """
+        from py_btrees.snapshot import Snapshot  # snapshot.py builds on this module
+        if not hasattr(self.disk, "snapshot"):
+            raise ValueError("Snapshots need the tree to be on a VersionedDisk")
+        with self.writer_lock:
+            return Snapshot(self.disk.snapshot(), self)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Make everything done inside the `with` block one atomic, crash-safe
+        unit on a transactional disk (a FileDisk opened with wal=True): it is
+        committed when the block ends and rolled back if it raises. Insert,
+        insert_many and delete already run as their own transactions; nested
+        transactions join the outermost one. On other disks this does nothing.
+        Other writers wait until the transaction ends.
+        """
+        with self.writer_lock:
+            if not getattr(self.disk, "transactional", False):
+                yield
+                return
+            self.txn_depth += 1
+            try:
+                yield
+            except BaseException:
+                self.txn_depth -= 1
+                if self.txn_depth == 0:
+                    self.disk.abort()
+                    if self.bloom is not None:
+                        # Rolled back leaves may hold keys their filters lack, and the tree filter
+                        # may have been rebuilt without them; both are rebuilt on first use
+                        self.bloom.leaves.clear()
+                        self.bloom.tree = None
+                    # Leaves may have gone back to other key ranges, and values to older ones
+                    self.epoch += 1
+                    if self.cache is not None:
+                        self.cache.clear()
+                    self._root_addr = self.disk.load_meta().get("root_addr")
+                raise
+            self.txn_depth -= 1
+            if self.txn_depth == 0:
+                self.disk.commit()
+
+    def latch_root(self) -> Tuple[BTreeNode, RWLatch]:
+        """Read the root with its latch held shared. The root pointer cannot change in between."""
+        root_latch = self.latches.get(ROOT_LATCH)
+        root_latch.acquire_shared()
+        addr = self.root_addr
+        latch = self.latches.get(addr)
+        latch.acquire_shared()
+        root_latch.release_shared()
+        return self.disk.read(addr), latch
+
+    def latch_leaf(self, key: Optional[KT] = None, last: bool = False,
+                   bloom: Optional[KeyHash] = None) -> Tuple[Optional[BTreeNode], Optional[RWLatch]]:
+        """
+        Descend to the leaf for `key`, or to the first (last) leaf if key is None,
+        coupling shared latches: a node's latch is only released once its child's
+        is held. Returns the leaf with its latch still held.
+        With `bloom` (the key_hash of `key`), returns (None, None) instead if
+        the filter of the leaf shows that the key is not there.
+        A key that the finger covers goes straight to the finger's leaf; any
+        other key leaves the finger on the leaf its descent ends in.
+        """
+        if key is not None:
+            addr = self.finger_leaf(key)
+            if addr is not None:
+                latch = self.latches.get(addr)
+                latch.acquire_shared()
+                if self.finger_leaf(key) == addr:
+                    return self.latched_leaf(addr, latch, bloom)
+                latch.release_shared()  # restructured in the meantime
+            self.fast_stats.finger_misses += 1
+            # Taken before the root is read: if the leaf's bounds change while we descend,
+            # the epoch has moved on by the time the finger is used
+            epoch = self.epoch
+        node, latch = self.latch_root()
+        lo = hi = None
+        while not node.is_leaf:
+            if key is None:
+                addr = node.children_addrs[-1 if last else 0]
+            else:
+                idx = self.child_index(node, key)
+                if idx > 0:
+                    lo = node.keys[idx - 1]
+                if idx < len(node.keys):
+                    hi = node.keys[idx]
+                addr = node.children_addrs[idx]
+            child_latch = self.latches.get(addr)
+            child_latch.acquire_shared()
+            latch.release_shared()
+            latch = child_latch
+            if bloom is not None:
+                leaf_filter = self.bloom.leaves.get(addr)
+                if leaf_filter is not None and not leaf_filter.might_contain(bloom):
+                    self.bloom.stats.leaf_skips += 1
+                    self.finger = Finger(addr, lo, hi, epoch)
+                    latch.release_shared()
+                    return None, None
+            node = self.disk.read(addr)
+        if key is not None:
+            self.finger = Finger(node.my_addr, lo, hi, epoch, *self.edge_keys(node))
+        return node, latch
+
+    def finger_leaf(self, key: KT) -> Optional[Address]:
+        """The address of the finger's leaf if that is where `key` belongs and no restructure has moved it."""
+        finger = self.finger
+        if finger is not None and finger.epoch == self.epoch and finger.covers(key):
+            return finger.addr
+        return None
+
+    @staticmethod
+    def edge_keys(leaf: BTreeNode) -> Tuple[Optional[KT], Optional[KT]]:
+        """The first and last key of `leaf`, or (None, None) if it is empty."""
+        return (leaf.keys[0], leaf.keys[-1]) if len(leaf.keys) else (None, None)
+
+    def latched_leaf(self, addr: Address, latch: RWLatch,
+                     bloom: Optional[KeyHash] = None) -> Tuple[Optional[BTreeNode], Optional[RWLatch]]:
+        """The end of latch_leaf() when the finger's leaf at `addr` is already latched."""
+        self.fast_stats.finger_hits += 1
+        if bloom is not None:
+            leaf_filter = self.bloom.leaves.get(addr)
+            if leaf_filter is not None and not leaf_filter.might_contain(bloom):
+                self.bloom.stats.leaf_skips += 1
+                latch.release_shared()
+                return None, None
+        return self.disk.read(addr), latch
 
+    def latch_path(self, key: KT, safe: Callable[[BTreeNode], bool], delta: int = 0,
+                   path: Optional[List[Tuple[BTreeNode, int]]] = None) -> BTreeNode:
+        """
+        Descend to the leaf for `key` taking exclusive latches, for a writer.
+        Once a node is `safe` (the operation cannot spread from it to its parent)
+        the latches above it are released, so readers only wait on the part of
+        the path the writer may change. Returns the leaf; the latches still held
+        are released by release_latches().
+        `delta` is the number of keys the write adds to the leaf (-1 for a
+        delete): the subtree count of the child followed in each internal
+        node is changed by that much and the node is written on the way down.
+        Each internal node is appended to `path`, if given, with the index of
+        the child followed. The finger is left on the leaf.
+        """
+        self.hold(ROOT_LATCH)
+        node = self.read_for_update(self.root_addr)
+        lo = hi = None
+        while True:
+            if safe(node):
+                self.release_latches(keep=node.my_addr)
+            if node.is_leaf:
+                self.finger = Finger(node.my_addr, lo, hi, self.epoch, *self.edge_keys(node))
+                return node
+            idx = self.child_index(node, key)
+            if idx > 0:
+                lo = node.keys[idx - 1]
+            if idx < len(node.keys):
+                hi = node.keys[idx]
+            if delta:
+                node.counts[idx] += delta
+                self.disk.write(node.my_addr, node)
+            if path is not None:
+                path.append((node, idx))
+            node = self.read_for_update(node.children_addrs[idx])
+
+    def latch_counted_path(self, key: KT, safe: Callable[[BTreeNode], bool], if_present: int,
+                           if_absent: int) -> BTreeNode:
+        """
+        latch_path() for a write that changes the number of keys in the tree
+        by `if_present` or `if_absent`, depending on whether `key` is there,
+        and keeps the subtree counts on the path up to date. A concurrent tree
+        asks key_present() first, so that the counts can be written on the way
+        down and latches released as usual. Otherwise no latch is ever waited
+        on, so the path is read once and its counts written at the end.
+        Without order statistics it is plain latch_path().
+        """
+        if not self.order_stats:
+            return self.latch_path(key, safe)
+        if self.concurrent:
+            return self.latch_path(key, safe, if_present if self.key_present(key) else if_absent)
+        path: List[Tuple[BTreeNode, int]] = []
+        leaf = self.latch_path(key, safe, path=path)
+        idx = leaf.find_idx(key)
+        delta = if_present if idx < len(leaf.keys) and leaf.keys[idx] == key else if_absent
+        if delta:
+            for node, idx in path:
+                node.counts[idx] += delta
+                self.disk.write(node.my_addr, node)
+        return leaf
+
+    def latch_finger_leaf(self, key: KT) -> Optional[BTreeNode]:
+        """
+        For a writer: the finger's leaf, latched exclusive, if `key` is already
+        in it. Replacing its value then changes no subtree count and cannot
+        split the leaf, so no other node is needed. Returns None otherwise.
+        The leaf is only read for keys it held when the finger was taken, so
+        appends of new keys past its end do not read it in vain.
+        """
+        addr = self.finger_leaf(key)
+        if addr is None or not self.finger.likely_holds(key):
+            return None
+        leaf = self.read_for_update(addr)
+        idx = leaf.find_idx(key)
+        if idx < len(leaf.keys) and leaf.keys[idx] == key:
+            self.fast_stats.finger_hits += 1
+            return leaf
+        self.release_latches()
+        return None
+
+    def key_present(self, key: KT) -> bool:
+        """Whether `key` is in the tree, read with shared latches."""
+        leaf, latch = self.latch_leaf(key)
+        try:
+            idx = leaf.find_idx(key)
+            return idx < len(leaf.keys) and leaf.keys[idx] == key
+        finally:
+            latch.release_shared()
+
+    def child_index(self, node: BTreeNode, key: KT) -> int:
+        """Index of the child of the internal `node` whose subtree holds `key`."""
+        return self.search_keys(node.keys, key)
+
+    def hold(self, addr: Any) -> None:
+        """Take the exclusive latch of `addr` for the running write, unless it is already held."""
+        if addr not in self.held:
+            latch = self.latches.get(addr)
+            latch.acquire_exclusive()
+            self.held[addr] = latch
+
+    def read_for_update(self, addr: Address) -> BTreeNode:
+        self.hold(addr)
+        return self.disk.read(addr)
+
+    def release_latches(self, keep: Optional[Address] = None) -> None:
+        if keep is None and self.restructured:
+            self.epoch += 1
+            self.restructured = False
+            if self.bloom is not None:
+                self.bloom.forget(self.held)
+        for addr in list(self.held):
+            if addr != keep:
+                self.held.pop(addr).release_exclusive()
+
+    def separator(self, left: KT, right: KT) -> KT:
+        """The key to put in the parent between two neighbouring leaves ending with `left` and starting with `right`."""
+        return shortest_separator(left, right) if self.truncate_separators else left
+
+    def store_value(self, value: VT) -> Union[VT, ValueRef]:
+        """What a leaf keeps for `value`: the value, or a ValueRef if it goes in a block of its own."""
+        if self.overflow_threshold is None:
+            return value
+        block = encode_value(value)
+        if len(block) <= self.overflow_threshold:
+            return value
+        addr = self.disk.new()
+        self.disk.write_raw(addr, block)
+        return ValueRef(addr)
+
+    def load_value(self, value: Union[VT, ValueRef]) -> VT:
+        """The value behind an entry of a leaf's data. Call it with the leaf still latched."""
+        if type(value) is ValueRef:
+            return decode_value(self.disk.read_raw(value.addr))
+        return cast(VT, value)
+
+    def load_values(self, data: List[Union[VT, ValueRef]]) -> List[VT]:
+        """load_value() for each entry of `data`; without an overflow_threshold there is nothing to load."""
+        if self.overflow_threshold is None:
+            return cast(List[VT], data)
+        return [self.load_value(value) for value in data]
+
+    def drop_value(self, value: Union[VT, ValueRef]) -> None:
+        """Release the block of a value that was removed from its leaf."""
+        if type(value) is ValueRef:
+            self.disk.free(value.addr)
+
+    def bloom_admits(self, h: KeyHash) -> bool:
+        """Count a lookup and check the tree filter, building it first if needed."""
+        if self.bloom.tree is None:
+            with self.writer_lock:
+                if self.bloom.tree is None:
+                    self.rebuild_bloom()
+        self.bloom.stats.lookups += 1
+        if self.bloom.tree.might_contain(h):
+            return True
+        self.bloom.stats.tree_skips += 1
+        return False
+
+    def bloom_leaf(self, leaf: BTreeNode):
+        """The filter of a leaf that was just read, built now if it has none. Needs the leaf latched."""
+        leaf_filter = self.bloom.leaves.get(leaf.my_addr)
+        if leaf_filter is None:
+            self.bloom.build_leaf(leaf)
+            leaf_filter = self.bloom.leaves[leaf.my_addr]
+        return leaf_filter
+
+    def rebuild_bloom(self) -> None:
+        """Build the tree filter and every leaf filter from the leaves. Needs the writer lock."""
+        node = self.disk.read(self.root_addr)
+        while not node.is_leaf:
+            node = self.disk.read(node.children_addrs[0])
+        keys: List[KT] = []
+        self.bloom.leaves.clear()
+        while True:
+            keys.extend(node.keys)
+            self.bloom.build_leaf(node)
+            if node.next_addr is None:
+                break
+            node = self.disk.read(node.next_addr)
+        self.bloom.build(keys, len(keys))
+
+    def after_write(self) -> None:
+        """Housekeeping once a write has released its latches (it still holds the writer lock)."""
+        if self.bloom is not None and self.bloom.needs_rebuild():
+            self.rebuild_bloom()
+
+    def insert_safe(self, node: BTreeNode) -> bool:
+        """An insert below `node` cannot split it."""
+        return len(node.keys) < self.L if node.is_leaf else len(node.children_addrs) < self.M
+
+    def delete_safe(self, node: BTreeNode) -> bool:
+        """A delete below `node` cannot make it underfull (or collapse it, for the root)."""
+        if self.is_it_root_node(node):
+            return node.is_leaf or len(node.children_addrs) > 2
+        return self.node_size(node) > self.min_size(node)
+
+    def add_listener(self, listener: Callable[[OpRecord], None]) -> None:
+        """
+        Call `listener` with an OpRecord after every public operation on this tree,
+        carrying the operation name, its duration and the storage counters it moved
+        (reads, writes, allocs, bytes, codec time, and buffer pool hits/misses).
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[OpRecord], None]) -> None:
+        self.listeners.remove(listener)
+
+    def notify(self, record: OpRecord) -> None:
+        for listener in self.listeners:
+            listener(record)
+
+    @contextmanager
+    def record_ops(self) -> Iterator[OpRecorder]:
+        """Collect an OpRecord for every operation run inside the `with` block."""
+        recorder = OpRecorder()
+        self.add_listener(recorder)
+        try:
+            yield recorder
+        finally:
+            self.remove_listener(recorder)
+
+    @instrumented
+    @atomic
     def insert(self, key: KT, value: VT) -> None:
         """
         Insert the key-value pair into your tree.
@@ -73,17 +648,32 @@ class BTree:
                 and write the leaf back to the disk
             4. 
         """
-        root_node = get_node(self.root_addr)
-        self.insert_util(key, value, root_node)
-        self.printNode(root_node)
+        with self.writer_lock:
+            stored = self.store_value(value)
+            leaf = self.latch_finger_leaf(key)
+            if leaf is None:
+                leaf = self.latch_counted_path(key, self.insert_safe, 0, 1)
+            try:
+                self.insert_util(key, stored, leaf)
+                if self.cache is not None:
+                    self.cache.invalidate(key)
+            finally:
+                self.release_latches()
+            self.after_write()
 
-    def insert_util(self, key, value, node: BTreeNode):
-        # root is none , create root and add key
-        idx, node_to_insert = self.find_rec(key, node, True)
-        node_to_insert.keys.insert(idx, key)
+    def insert_util(self, key, value, node_to_insert: BTreeNode):
+        idx = node_to_insert.find_idx(key)
+        if idx < len(node_to_insert.keys) and node_to_insert.keys[idx] == key:
+            self.drop_value(node_to_insert.data[idx])
+            node_to_insert.data[idx] = value
+            self.disk.write(node_to_insert.my_addr, node_to_insert)
+            return
+        node_to_insert.insert_key(idx, key)
         node_to_insert.data.insert(idx, value)
+        if self.bloom is not None:
+            self.bloom.add(key, node_to_insert.my_addr)
         if self.hasEmptySpace(node_to_insert):
-            DISK.write(node_to_insert.my_addr, node_to_insert)
+            self.disk.write(node_to_insert.my_addr, node_to_insert)
         else:
             self.split_node(node_to_insert)
 
@@ -96,81 +686,297 @@ class BTree:
     def isLeafNode(self, node: BTreeNode):
         return node.is_leaf
 
-    def merge_up(self, parent_node, node, index):
-        pivot = node.keys[0]
-        parent_node.children_addrs.pop(index)
-        parent_node.children_addrs = parent_node.children_addrs + node.children_addrs
+    def merge_up(self, parent_node: BTreeNode, pivot: KT, right_node: BTreeNode, index: int):
+        """
+        Hang `right_node`, the new right half of the child at `index`, into
+        `parent_node` with `pivot` as the key between the two halves.
+        The siblings after it shift one place, so their index_in_parent is
+        rewritten. The parent itself is written by the caller.
+        """
+        parent_node.insert_key(index, pivot)
+        parent_node.children_addrs.insert(index + 1, right_node.my_addr)
+        if self.order_stats:
+            moved = right_node.size()
+            parent_node.counts[index] -= moved
+            parent_node.counts.insert(index + 1, moved)
 
-        for i, item in enumerate(parent_node.keys):
-            if pivot < item:
-                parent_node.keys = parent_node.keys[:i] + [pivot] + parent_node.keys[i:]
-                break
+        right_node.parent_addr = parent_node.my_addr
+        right_node.index_in_parent = index + 1
+        self.disk.write(right_node.my_addr, right_node)
 
-            elif i + 1 == len(parent_node.keys):
-                parent_node.keys += [pivot]
-                break
+        for i in range(index + 2, len(parent_node.children_addrs)):
+            updated_child = self.disk.read(parent_node.children_addrs[i])
+            updated_child.index_in_parent = i
+            self.disk.write(updated_child.my_addr, updated_child)
 
-        index = 0
-        for child in parent_node.children_addrs:
-            updated_child = get_node(child)
-            updated_child.index_in_parent = index
-            updated_child.parent_addr = parent_node.my_addr
-            index +=1
-            DISK.write(updated_child.my_addr, updated_child)
+    def split_node(self, node: BTreeNode) -> None:
+        while not self.hasEmptySpace(node):
+            self.restructured = True
+            if self.is_it_root_node(node):
+                parent_node = BTreeNode(self.disk.new(), None, None, False)
+                parent_node.children_addrs.append(node.my_addr)
+                if self.order_stats:
+                    parent_node.counts.append(node.size())
+                node.parent_addr = parent_node.my_addr
+                node.index_in_parent = 0
+                self.root_addr = parent_node.my_addr
+            else:
+                parent_node = self.read_for_update(node.parent_addr)
+            pivot, right_node = self.split_node_util(node)
+            self.merge_up(parent_node, pivot, right_node, node.index_in_parent)
+            node = parent_node
+        self.disk.write(node.my_addr, node)
+
+    def split_node_util(self, node: BTreeNode) -> Tuple[KT, BTreeNode]:
+        """
+        Split an overfull node in two. `node` keeps the left half at its address
+        and is written back; the right half is returned (not yet written) along
+        with the key that separates the two halves in the parent.
+        The right half is moved out with one slice copy and a truncation per
+        array, so the left half is never copied.
+        """
+        mid_index = self.get_mid_index(node)
+        right_node = BTreeNode(self.disk.new(), node.parent_addr, None, node.is_leaf)
 
-        self.set_root_node(parent_node)
-        DISK.write(parent_node.my_addr, parent_node)
+        if node.is_leaf:
+            right_node.keys, right_node.data = take(node.keys, mid_index), node.data[mid_index:]
+            del node.keys[mid_index:]
+            del node.data[mid_index:]
+            pivot = self.separator(node.keys[-1], right_node.keys[0])
 
-    def split_node(self, node: BTreeNode) -> list:
+            right_node.prev_addr = node.my_addr
+            right_node.next_addr = node.next_addr
+            if node.next_addr is not None:
+                next_node = self.read_for_update(node.next_addr)
+                next_node.prev_addr = right_node.my_addr
+                self.disk.write(next_node.my_addr, next_node)
+            node.next_addr = right_node.my_addr
+        else:
+            # The middle key moves up to the parent instead of staying in either half
+            pivot = node.keys[mid_index]
+            right_node.keys = take(node.keys, mid_index + 1)
+            right_node.children_addrs = take(node.children_addrs, mid_index + 1)
+            right_node.counts = take(node.counts, mid_index + 1)
+            del node.keys[mid_index:]
+            del node.children_addrs[mid_index + 1:]
+            del node.counts[mid_index + 1:]
 
-        while not self.hasEmptySpace(node):
-            if self.is_it_root_node(node):
-                node = self.split_node_util(node)
-                self.set_root_node(node)
+            for i, child_addr in enumerate(right_node.children_addrs):
+                child = self.disk.read(child_addr)
+                child.parent_addr = right_node.my_addr
+                child.index_in_parent = i
+                self.disk.write(child.my_addr, child)
+
+        self.disk.write(node.my_addr, node)
+        return pivot, right_node
+
+    @instrumented
+    @atomic
+    def insert_many(self, pairs: Iterable[Tuple[KT, VT]]) -> None:
+        """
+        Insert a batch of key-value pairs. Later pairs win over earlier ones with the same key.
+
+        The batch is sorted and pushed down the tree like find_many. Each leaf
+        applies all of its new entries in memory and, if it overflows, is split
+        once into as many nodes as needed; overfull parents are split the same
+        way on the way back up. Every node modified by the batch is written
+        exactly once.
+        """
+        batch = sorted(pairs, key=lambda pair: pair[0])
+        keys: List[KT] = []
+        values: List[VT] = []
+        for key, value in batch:
+            if keys and keys[-1] == key:
+                values[-1] = value
             else:
-                par_add = node.parent_addr
-                node = self.split_node_util(node)  # Split & Set node as the 'top' node.
-                parent_node = get_node(par_add)
-                idx = self.find_idx_util(node.keys[0], parent_node)
-                self.merge_up(parent_node, node, idx)
-                node = parent_node
+                keys.append(key)
+                values.append(value)
+        if not keys:
+            return
+        stored = [self.store_value(value) for value in values]
+
+        # The batch may touch any part of the tree, so every node it reads stays latched until the end
+        with self.writer_lock:
+            self.hold(ROOT_LATCH)
+            try:
+                self.restructured = True
+                self.insert_sorted(keys, stored)
+                if self.bloom is not None:
+                    for key in keys:
+                        self.bloom.add(key)
+                if self.cache is not None:
+                    for key in keys:
+                        self.cache.invalidate(key)
+            finally:
+                self.release_latches()
+            self.after_write()
 
-    def split_node_util(self, node: BTreeNode)->BTreeNode:
+    def insert_sorted(self, keys: List[KT], values: List[Union[VT, ValueRef]]) -> None:
+        """Body of insert_many for deduplicated, sorted keys."""
+        # prev_addr updates for leaves to the right of a split leaf, applied when
+        # that leaf is next read in this batch, or at the end
+        pending_prev: Dict[Address, Address] = {}
+        root = self.read_for_update(self.root_addr)
+        pieces, pivots = self.insert_many_rec(root, keys, values, 0, len(keys), pending_prev)
+        while len(pieces) > 1:
+            new_root = BTreeNode(self.disk.new(), None, None, False)
+            pieces, pivots = self.distribute_children(new_root, list(pieces), pivots)
+        root = pieces[0]
+        root.parent_addr = None
+        root.index_in_parent = None
+        self.disk.write(root.my_addr, root)
+        if root.my_addr != self.root_addr:
+            self.root_addr = root.my_addr
 
-        l_keys, l_data = self.left_children(node)
-        r_keys, r_data = self.right_children(node)
-        # Move key up to the new root and set
-        mid_key = self.get_mid_index(node)
+        for addr, prev_addr in pending_prev.items():
+            leaf = self.read_for_update(addr)
+            leaf.prev_addr = prev_addr
+            self.disk.write(addr, leaf)
+
+    def insert_many_rec(self, node: BTreeNode, keys: List[KT], values: List[Union[VT, ValueRef]], lo: int, hi: int,
+                        pending_prev: Dict[Address, Address]) -> Tuple[List[BTreeNode], List[KT]]:
+        """
+        Apply the sorted entries keys[lo:hi] to the subtree of `node`.
+        Returns the node(s) that now take its place, left to right, and the keys
+        that separate them. They are not written: their parent decides their
+        parent_addr and index_in_parent and writes them.
+        """
+        if node.is_leaf:
+            if node.my_addr in pending_prev:
+                node.prev_addr = pending_prev.pop(node.my_addr)
+            self.merge_into_leaf(node, keys, values, lo, hi)
+            return self.split_leaf_many(node, pending_prev)
+
+        # Each entry is either a rewritten child (a node) or an untouched child (address, old index)
+        entries: List[Union[BTreeNode, Tuple[Address, int]]] = []
+        pivots: List[KT] = []
+        child_idx = 0
+        while child_idx < len(node.children_addrs):
+            if child_idx > 0:
+                pivots.append(node.keys[child_idx - 1])
+            child_addr = node.children_addrs[child_idx]
+            if lo < hi and self.child_index(node, keys[lo]) == child_idx:
+                if child_idx < len(node.keys):
+                    end = bisect.bisect_right(keys, node.keys[child_idx], lo, hi)
+                else:
+                    end = hi
+                pieces, child_pivots = self.insert_many_rec(self.read_for_update(child_addr), keys, values, lo, end,
+                                                            pending_prev)
+                entries.extend(pieces)
+                pivots.extend(child_pivots)
+                lo = end
+            else:
+                entries.append((child_addr, child_idx))
+            child_idx += 1
+        return self.distribute_children(node, entries, pivots)
 
-        top_node = BTreeNode(DISK.new(), None, None, False)
-        top_node.keys.append(l_keys[mid_key - 1])
+    def merge_into_leaf(self, node: BTreeNode, keys: List[KT], values: List[Union[VT, ValueRef]], lo: int,
+                        hi: int) -> None:
+        """Merge the sorted entries keys[lo:hi] into a leaf, overwriting existing keys."""
+        old_keys, old_data = node.keys, node.data
+        new_keys: List[KT] = []
+        new_data: List[Union[VT, ValueRef]] = []
+        i = 0
+        while lo < hi:
+            key = keys[lo]
+            if i < len(old_keys) and old_keys[i] < key:
+                new_keys.append(old_keys[i])
+                new_data.append(old_data[i])
+                i += 1
+                continue
+            new_keys.append(key)
+            new_data.append(values[lo])
+            if i < len(old_keys) and old_keys[i] == key:
+                self.drop_value(old_data[i])
+                i += 1
+            lo += 1
+        new_keys.extend(old_keys[i:])
+        new_data.extend(old_data[i:])
+        node.keys = compact(new_keys) if isinstance(old_keys, IntArray) else new_keys
+        node.data = new_data
 
-        new_left_node = BTreeNode(node.my_addr, top_node.my_addr,None, True)
-        new_left_node.keys = new_left_node.keys + l_keys
-        new_left_node.data = new_left_node.data + l_data
-        DISK.write(new_left_node.my_addr, new_left_node)
+    def split_leaf_many(self, node: BTreeNode, pending_prev: Dict[Address, Address]) -> Tuple[List[BTreeNode], List[KT]]:
+        """Split a leaf into as many evenly filled leaves as needed to respect L."""
+        sizes = self.even_chunks(len(node.keys), self.L)
+        if len(sizes) == 1:
+            return [node], []
+        keys, data, next_addr = node.keys, node.data, node.next_addr
+        pieces = [node]
+        for _ in sizes[1:]:
+            piece = BTreeNode(self.disk.new(), None, None, True)
+            piece.prev_addr = pieces[-1].my_addr
+            pieces[-1].next_addr = piece.my_addr
+            pieces.append(piece)
+        pieces[-1].next_addr = next_addr
+        if next_addr is not None:
+            pending_prev[next_addr] = pieces[-1].my_addr
 
-        new_right_node = BTreeNode(DISK.new(), top_node.my_addr,None, True)
-        new_right_node.keys = new_right_node.keys + r_keys
-        new_right_node.data = new_right_node.data + r_data
-        DISK.write(new_right_node.my_addr, new_right_node)
+        start = 0
+        for piece, size in zip(pieces, sizes):
+            piece.keys = take(keys, start, start + size)
+            piece.data = data[start:start + size]
+            start += size
+        return pieces, [self.separator(left.keys[-1], right.keys[0]) for left, right in zip(pieces, pieces[1:])]
 
-        top_node.children_addrs.append(new_left_node.my_addr)
-        top_node.children_addrs.append(new_right_node.my_addr)
+    def distribute_children(self, node: BTreeNode, entries: List[Union[BTreeNode, Tuple[Address, int]]],
+                            pivots: List[KT]) -> Tuple[List[BTreeNode], List[KT]]:
+        """
+        Lay the children in `entries` out over `node` and, if there are more
+        than M, over as many new internal nodes as needed. Rewritten children
+        are written here, now that their parent and position are final; an
+        untouched child is only rewritten if its parent or index changed.
+        Returns the resulting nodes (not written) and the keys separating them.
+        """
+        sizes = self.even_chunks(len(entries), self.M)
+        old_counts = node.counts  # of the untouched children, by their old index
+        pieces = [node] + [BTreeNode(self.disk.new(), None, None, False) for _ in sizes[1:]]
+        separators = []
+        start = 0
+        for piece, size in zip(pieces, sizes):
+            if start > 0:
+                separators.append(pivots[start - 1])
+            piece.keys = pivots[start:start + size - 1]
+            piece.children_addrs = int_array()
+            piece.counts = int_array()
+            for idx, entry in enumerate(entries[start:start + size]):
+                if isinstance(entry, BTreeNode):
+                    entry.parent_addr = piece.my_addr
+                    entry.index_in_parent = idx
+                    self.disk.write(entry.my_addr, entry)
+                    piece.children_addrs.append(entry.my_addr)
+                    if self.order_stats:
+                        piece.counts.append(entry.size())
+                    continue
+                child_addr, old_idx = entry
+                if self.order_stats:
+                    piece.counts.append(old_counts[old_idx])
+                if piece is not node or idx != old_idx:
+                    child = self.disk.read(child_addr)
+                    child.parent_addr = piece.my_addr
+                    child.index_in_parent = idx
+                    self.disk.write(child_addr, child)
+                piece.children_addrs.append(child_addr)
+            start += size
+        return pieces, separators
 
-        return top_node
+    @staticmethod
+    def even_chunks(n: int, cap: int) -> List[int]:
+        """Sizes of the fewest chunks of at most `cap` items that `n` items split into, as equal as possible."""
+        count = max(1, -(-n // cap))
+        base, extra = divmod(n, count)
+        return [base + 1] * extra + [base] * (count - extra)
 
     def get_root_node(self):
-        return get_node(self.root_addr)
+        return self.disk.read(self.root_addr)
 
     def set_root_node(self, node: BTreeNode):
         self.root_addr = node.my_addr
-        DISK.write(node.my_addr, node)
+        self.disk.write(node.my_addr, node)
 
 
     def add_key_to_node(self, key: int, node: BTreeNode):
         index = self.find_idx_to_insert(key)
-        node.keys.insert(index, key)
+        node.insert_key(index, key)
 
     def is_it_root_node(self, node: BTreeNode) -> bool:
         return node.parent_addr is None
@@ -238,6 +1044,7 @@ class BTree:
     def maxKeysAllowed(self):
         return self.M - 1
 
+    @instrumented
     def find(self, key: KT) -> Optional[VT]:
         """
         Find a key and return the value associated with it.
@@ -255,11 +1062,109 @@ class BTree:
             4. Repeat until you find key or reach leaf
             5. return value or None
         """
-        root_node = self.get_root_node()
-        if root_node is None:
+        if self.cache is not None:
+            hit, value = self.cache.get(key, self.fast_stats)
+            if hit:
+                return value
+            generation = self.cache.generation
+        h = None
+        if self.bloom is not None:
+            h = key_hash(key)
+            if not self.bloom_admits(h):
+                return None
+        leaf, latch = self.latch_leaf(key, bloom=h)
+        if leaf is None:
             return None
+        try:
+            idx = leaf.find_idx(key)
+            if idx < len(leaf.keys) and leaf.keys[idx] == key:
+                if self.bloom is not None:
+                    self.bloom_leaf(leaf)
+                value = self.load_value(leaf.data[idx])
+                if self.cache is not None:
+                    self.cache.put(key, value, generation, self.fast_stats)
+                return value
+            if self.bloom is not None and self.bloom_leaf(leaf).might_contain(h):
+                self.bloom.stats.false_positives += 1
+            return None
+        finally:
+            latch.release_shared()
+
+    @instrumented
+    def find_many(self, keys: Iterable[KT]) -> List[Optional[VT]]:
+        """
+        Look up many keys at once. Returns the values (None for missing keys)
+        in the same order as `keys`.
 
-        self.find_rec(key, root_node)
+        The probes are sorted and pushed down the tree together: at every
+        internal node they are partitioned among the children with bisect, so
+        each node on the way to the touched leaves is read from disk only once
+        instead of once per key. With Bloom filters, keys rejected by the tree
+        filter are dropped first, and a leaf is only read if its filter admits
+        one of the keys that would be in it.
+        """
+        keys = list(keys)
+        results: List[Optional[VT]] = [None] * len(keys)
+        if not keys:
+            return results
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        hashes = None
+        if self.bloom is not None:
+            admitted = [(i, h) for i, h in ((i, key_hash(keys[i])) for i in order) if self.bloom_admits(h)]
+            order = [i for i, _ in admitted]
+            hashes = [h for _, h in admitted]
+        probes = [keys[i] for i in order]
+        if not probes:
+            return results
+        root, latch = self.latch_root()
+        try:
+            self.find_many_rec(root, probes, order, 0, len(probes), results, hashes)
+        finally:
+            latch.release_shared()
+        return results
+
+    def find_many_rec(self, node: BTreeNode, probes: List[KT], order: List[int], lo: int, hi: int,
+                      results: List[Optional[VT]], hashes: Optional[List[KeyHash]] = None) -> None:
+        """
+        Resolve the sorted probes[lo:hi], which all belong in the subtree of
+        `node`. The caller holds the latch of `node`; each child is latched
+        while its part of the probes is resolved. `hashes` are the key_hash
+        of each probe if the tree has Bloom filters.
+        """
+        if node.is_leaf:
+            if hashes is None:
+                for i in range(lo, hi):
+                    data = node.find_data(probes[i])
+                    results[order[i]] = None if data is None else self.load_value(data)
+                return
+            leaf_filter = self.bloom_leaf(node)
+            for i in range(lo, hi):
+                idx = node.find_idx(probes[i])
+                if idx < len(node.keys) and node.keys[idx] == probes[i]:
+                    results[order[i]] = self.load_value(node.data[idx])
+                elif leaf_filter.might_contain(hashes[i]):
+                    self.bloom.stats.false_positives += 1
+                else:
+                    self.bloom.stats.leaf_skips += 1
+            return
+        while lo < hi:
+            child_idx = self.child_index(node, probes[lo])
+            if child_idx < len(node.keys):
+                end = bisect.bisect_right(probes, node.keys[child_idx], lo, hi)
+            else:
+                end = hi
+            child_addr = node.children_addrs[child_idx]
+            child_latch = self.latches.get(child_addr)
+            child_latch.acquire_shared()
+            try:
+                leaf_filter = self.bloom.leaves.get(child_addr) if hashes is not None else None
+                if leaf_filter is not None and not any(leaf_filter.might_contain(hashes[i]) for i in range(lo, end)):
+                    self.bloom.stats.leaf_skips += end - lo
+                else:
+                    self.find_many_rec(self.disk.read(child_addr), probes, order, lo, end, results, hashes)
+            finally:
+                child_latch.release_shared()
+            lo = end
 
     def find_idx_util(self, key: KT, node: BTreeNode) -> Optional[int]:
         """
@@ -277,21 +1182,11 @@ class BTree:
                 idx = bt_node.find_idx(key)
                 return idx, bt_node
 
-            if key in bt_node.keys:
-                return self.find_data_util(key)
-            else:
-                return None
-        else:
-            # match with key if its <= go to left else match with next key, if last go to right
-            index = 0
-            while index < len(bt_node.keys) and key > bt_node.keys[index]:
-                index += 1
-            if index < len(bt_node.keys) and key <= bt_node.keys[index]:
-                return self.find_rec(key, DISK.read(bt_node.children_addrs[index]),return_index_node)
-            else:
-                return self.find_rec(key,  DISK.read(bt_node.children_addrs[index]),return_index_node)
+            return self.load_value(bt_node.find_data(key))
+        index = self.child_index(bt_node, key)
+        return self.find_rec(key, self.disk.read(bt_node.children_addrs[index]), return_index_node)
 
-    def find_data_util(self, key: KT, node:BTreeNode) -> Optional[VT]:
+    def find_data_util(self, key: KT, node:BTreeNode) -> Optional[Union[VT, ValueRef]]:
         """
         Given a key, retrieve the data associated with that key.
         Returns None if key is not present in self.keys.
@@ -305,16 +1200,415 @@ class BTree:
             return node.data[idx]
         return None
 
+    @instrumented
+    def range(self, lo: Optional[KT] = None, hi: Optional[KT] = None,
+              inclusive: Tuple[bool, bool] = (True, True), reverse: bool = False) -> Iterator[Tuple[KT, VT]]:
+        """
+        Yield the (key, value) pairs with lo <= key <= hi in key order, or in
+        descending order if `reverse` is set. `inclusive` says whether each
+        bound is included; a bound of None leaves that side open.
+
+        The tree is descended once to the first leaf of the range, after which
+        the leaves are walked through their sibling links, so every leaf in the
+        range is read from disk exactly once.
+
+        No latch is held while the caller consumes the pairs: each leaf is
+        copied under its latch, and if a split or merge happened in the
+        meantime (the tree's epoch changed) the scan descends again to the
+        last key it returned instead of following a possibly stale link.
+        """
+        resume = None  # the last key yielded; the scan continues strictly beyond it
+        leaf, latch = self.latch_leaf(hi if reverse else lo, last=reverse)
+        while True:
+            keys, data, done, step = self.scan_leaf(leaf, lo, hi, inclusive, reverse, resume)
+            epoch = self.epoch
+            try:
+                values = self.load_values(data)
+            finally:
+                latch.release_shared()
+
+            yield from zip(keys, values)
+            if keys:
+                resume = keys[-1]
+            if done or step is None:
+                return
+
+            latch = self.latches.get(step)
+            latch.acquire_shared()
+            if self.epoch == epoch:
+                leaf = self.disk.read(step)
+            else:
+                latch.release_shared()
+                leaf, latch = self.latch_leaf(resume if resume is not None else (hi if reverse else lo), last=reverse)
+
+    @staticmethod
+    def scan_leaf(leaf: BTreeNode, lo: Optional[KT], hi: Optional[KT], inclusive: Tuple[bool, bool],
+                  reverse: bool, resume: Optional[KT]
+                  ) -> Tuple[MutableSequence[KT], List[Union[VT, ValueRef]], bool, Optional[Address]]:
+        """
+        One step of a range scan: copies of the keys and values of `leaf` that
+        are in range and beyond `resume`, in scan order, whether the range ends
+        in this leaf, and the address of the next leaf to visit.
+        """
+        lo_inclusive, hi_inclusive = inclusive
+        if lo is None:
+            start = 0
+        elif lo_inclusive:
+            start = bisect.bisect_left(leaf.keys, lo)
+        else:
+            start = bisect.bisect_right(leaf.keys, lo)
+        if hi is None:
+            end = len(leaf.keys)
+        elif hi_inclusive:
+            end = bisect.bisect_right(leaf.keys, hi)
+        else:
+            end = bisect.bisect_left(leaf.keys, hi)
+        if reverse:
+            done = start > 0
+            if resume is not None:
+                end = min(end, bisect.bisect_left(leaf.keys, resume))
+            step = leaf.prev_addr
+        else:
+            done = end < len(leaf.keys)
+            if resume is not None:
+                start = max(start, bisect.bisect_right(leaf.keys, resume))
+            step = leaf.next_addr
+        keys, data = leaf.keys[start:end], leaf.data[start:end]
+        if reverse:
+            keys.reverse()
+            data.reverse()
+        return keys, data, done, step
+
+    def items(self, reverse: bool = False) -> Iterator[Tuple[KT, VT]]:
+        """Yield every (key, value) pair in the tree in key order (descending if `reverse`)."""
+        return self.range(reverse=reverse)
+
+    def find_leaf(self, key: KT) -> BTreeNode:
+        """Return the leaf that holds `key`, or would hold it if it were inserted."""
+        node, latch = self.latch_leaf(key)
+        latch.release_shared()
+        return node
+
+    def find_edge_leaf(self, last: bool = False) -> BTreeNode:
+        """Return the left-most leaf of the tree, or the right-most one if `last` is set."""
+        node, latch = self.latch_leaf(None, last)
+        latch.release_shared()
+        return node
+
+    def latch_child(self, addr: Address, latch: RWLatch) -> Tuple[BTreeNode, RWLatch]:
+        """One step down for a reader: latch the child at `addr` shared, then let go of its parent's `latch`."""
+        child_latch = self.latches.get(addr)
+        child_latch.acquire_shared()
+        latch.release_shared()
+        return self.disk.read(addr), child_latch
+
+    @instrumented
+    def rank(self, key: KT, inclusive: bool = False) -> int:
+        """
+        The number of keys in the tree below `key` (at or below it if
+        `inclusive` is set), which is the position `key` has or would have in
+        items(). One descent: the subtree counts of the children to the left
+        of the path are added up, so only height blocks are read. Raises
+        ValueError unless the tree has order_stats set (see __init__), as do
+        select() and count().
+        """
+        self.check_order_stats()
+        node, latch = self.latch_root()
+        below = 0
+        try:
+            while not node.is_leaf:
+                idx = self.child_index(node, key)
+                below += sum(node.counts[:idx])
+                node, latch = self.latch_child(node.children_addrs[idx], latch)
+            search = bisect.bisect_right if inclusive else bisect.bisect_left
+            return below + search(node.keys, key)
+        finally:
+            latch.release_shared()
+
+    @instrumented
+    def select(self, k: int) -> Tuple[KT, VT]:
+        """
+        The k-th (key, value) pair in key order, counting from 0; a negative
+        `k` counts from the end like a list index. Raises IndexError if the
+        tree has no k-th key. One descent, following the subtree counts.
+        """
+        self.check_order_stats()
+        node, latch = self.latch_root()
+        try:
+            size = node.size()
+            if k < 0:
+                k += size
+            if not 0 <= k < size:
+                raise IndexError("BTree index out of range")
+            while not node.is_leaf:
+                idx = 0
+                while k >= node.counts[idx]:
+                    k -= node.counts[idx]
+                    idx += 1
+                node, latch = self.latch_child(node.children_addrs[idx], latch)
+            return node.keys[k], self.load_value(node.data[k])
+        finally:
+            latch.release_shared()
+
+    @instrumented
+    def count(self, lo: Optional[KT] = None, hi: Optional[KT] = None,
+              inclusive: Tuple[bool, bool] = (True, True)) -> int:
+        """
+        The number of keys range(lo, hi, inclusive) would yield, from two
+        rank() descents instead of a scan; with no bounds, the number of keys
+        in the tree, from the root alone. With a concurrent writer each
+        descent sees a consistent tree, but the writer may run in between.
+        """
+        self.check_order_stats()
+        lo_inclusive, hi_inclusive = inclusive
+        if hi is None:
+            root, latch = self.latch_root()
+            latch.release_shared()
+            above = root.size()
+        else:
+            above = self.rank(hi, inclusive=hi_inclusive)
+        below = 0 if lo is None else self.rank(lo, inclusive=not lo_inclusive)
+        return max(0, above - below)
+
+    def recount(self, addr: Address) -> int:
+        """
+        Fill in the subtree counts of every internal node below and at `addr`,
+        or drop them without order statistics, and return its key count.
+        """
+        node = self.read_for_update(addr)
+        if node.is_leaf:
+            return len(node.keys)
+        counts = int_array(self.recount(child) for child in node.children_addrs)
+        node.counts = counts if self.order_stats else int_array()
+        self.disk.write(addr, node)
+        return sum(counts)
+
+    def check_order_stats(self) -> None:
+        if not self.order_stats:
+            raise ValueError("rank, select and count need a tree with order_stats set")
+
+    @instrumented
+    @atomic
     def delete(self, key: KT) -> None:
-        raise NotImplementedError("Karma method delete()")
+        """
+        Remove a key and its value from the tree. Deleting a key that is not
+        in the tree does nothing.
+
+        A leaf that drops below (L+1)//2 entries borrows one from a sibling
+        that can spare it, or else is merged with a sibling; a merge takes a
+        child away from the parent, which is then rebalanced the same way
+        (at least (M+1)//2 children). Blocks of merged-away nodes are freed
+        so that later splits reuse them. A root left with a single child is
+        replaced by that child.
+        """
+        with self.writer_lock:
+            leaf = self.latch_counted_path(key, self.delete_safe, -1, 0)
+            try:
+                idx = leaf.find_idx(key)
+                if idx == len(leaf.keys) or leaf.keys[idx] != key:
+                    return
+                self.drop_value(leaf.data[idx])
+                if self.bloom is not None:
+                    self.bloom.deleted += 1
+                del leaf.keys[idx]
+                del leaf.data[idx]
+                self.rebalance(leaf)
+                if not leaf.keys:
+                    self.finger = None  # an empty tree may take keys of another type next
+                if self.cache is not None:
+                    self.cache.invalidate(key)
+            finally:
+                self.release_latches()
+            self.after_write()
+
+    def rebalance(self, node: BTreeNode) -> None:
+        """Restore the occupancy invariants from `node` (modified, not yet written) up to the root."""
+        while True:
+            if self.is_it_root_node(node):
+                if not node.is_leaf and len(node.children_addrs) == 1:
+                    self.collapse_root(node)
+                else:
+                    self.disk.write(node.my_addr, node)
+                return
+            if not self.is_underfull(node):
+                self.disk.write(node.my_addr, node)
+                return
+
+            parent = self.read_for_update(node.parent_addr)
+            if len(parent.children_addrs) == 1:
+                # Only possible with M == 2: give the parent a second child first
+                self.disk.write(node.my_addr, node)
+                self.give_sibling(parent)
+                node = self.disk.read(node.my_addr)
+                parent = self.read_for_update(node.parent_addr)
+
+            idx = node.index_in_parent
+            left = self.read_for_update(parent.children_addrs[idx - 1]) if idx > 0 else None
+            if left is not None and self.can_lend(left):
+                self.borrow_from_left(parent, left, node)
+                return
+            right = None
+            if idx + 1 < len(parent.children_addrs):
+                right = self.read_for_update(parent.children_addrs[idx + 1])
+            if right is not None and self.can_lend(right):
+                self.borrow_from_right(parent, node, right)
+                return
+            if left is not None:
+                self.merge_nodes(parent, left, node)
+            else:
+                self.merge_nodes(parent, node, right)
+            node = parent
+
+    def min_size(self, node: BTreeNode) -> int:
+        return (self.L + 1) // 2 if node.is_leaf else (self.M + 1) // 2
+
+    def node_size(self, node: BTreeNode) -> int:
+        return len(node.keys) if node.is_leaf else len(node.children_addrs)
+
+    def is_underfull(self, node: BTreeNode) -> bool:
+        return self.node_size(node) < self.min_size(node)
+
+    def can_lend(self, node: BTreeNode) -> bool:
+        return self.node_size(node) > self.min_size(node)
+
+    def collapse_root(self, root: BTreeNode) -> None:
+        """Replace an internal root that has a single child by that child."""
+        self.restructured = True
+        child = self.disk.read(root.children_addrs[0])
+        child.parent_addr = None
+        child.index_in_parent = None
+        self.disk.write(child.my_addr, child)
+        self.root_addr = child.my_addr
+        self.disk.free(root.my_addr)
+
+    def adopt_children(self, node: BTreeNode, start: int = 0) -> None:
+        """Point the children of `node` from position `start` on back at it, with their new positions."""
+        for i in range(start, len(node.children_addrs)):
+            child = self.disk.read(node.children_addrs[i])
+            child.parent_addr = node.my_addr
+            child.index_in_parent = i
+            self.disk.write(child.my_addr, child)
+
+    def borrow_from_left(self, parent: BTreeNode, left: BTreeNode, node: BTreeNode) -> None:
+        """Move the last entry of `left` to the front of its right neighbour `node`. Writes all three."""
+        self.restructured = True
+        sep_idx = node.index_in_parent - 1
+        if node.is_leaf:
+            node.insert_key(0, left.keys.pop())
+            node.data.insert(0, left.data.pop())
+            parent.set_key(sep_idx, self.separator(left.keys[-1], node.keys[0]))
+            moved = 1
+        else:
+            node.insert_key(0, parent.keys[sep_idx])
+            node.children_addrs.insert(0, left.children_addrs.pop())
+            if self.order_stats:
+                moved = left.counts.pop()
+                node.counts.insert(0, moved)
+            parent.set_key(sep_idx, left.keys.pop())
+            self.adopt_children(node)
+        if self.order_stats:
+            parent.counts[sep_idx] -= moved
+            parent.counts[sep_idx + 1] += moved
+        self.disk.write(left.my_addr, left)
+        self.disk.write(node.my_addr, node)
+        self.disk.write(parent.my_addr, parent)
+
+    def borrow_from_right(self, parent: BTreeNode, node: BTreeNode, right: BTreeNode) -> None:
+        """Move the first entry of `right` to the end of its left neighbour `node`. Writes all three."""
+        self.restructured = True
+        sep_idx = node.index_in_parent
+        if node.is_leaf:
+            node.insert_key(len(node.keys), right.keys.pop(0))
+            node.data.append(right.data.pop(0))
+            parent.set_key(sep_idx, self.separator(node.keys[-1], right.keys[0]))
+            moved = 1
+        else:
+            node.insert_key(len(node.keys), parent.keys[sep_idx])
+            node.children_addrs.append(right.children_addrs.pop(0))
+            if self.order_stats:
+                moved = right.counts.pop(0)
+                node.counts.append(moved)
+            parent.set_key(sep_idx, right.keys.pop(0))
+            self.adopt_children(node, len(node.children_addrs) - 1)
+            self.adopt_children(right)
+        if self.order_stats:
+            parent.counts[sep_idx] += moved
+            parent.counts[sep_idx + 1] -= moved
+        self.disk.write(right.my_addr, right)
+        self.disk.write(node.my_addr, node)
+        self.disk.write(parent.my_addr, parent)
+
+    def merge_nodes(self, parent: BTreeNode, left: BTreeNode, right: BTreeNode) -> None:
+        """
+        Fold `right` into its left neighbour `left` and free its block. `left`
+        is written; `parent` loses a child and is left for the caller to write.
+        """
+        self.restructured = True
+        sep_idx = left.index_in_parent
+        if left.is_leaf:
+            left.extend_keys(right.keys)
+            left.data.extend(right.data)
+            left.next_addr = right.next_addr
+            if right.next_addr is not None:
+                next_node = self.read_for_update(right.next_addr)
+                next_node.prev_addr = left.my_addr
+                self.disk.write(next_node.my_addr, next_node)
+        else:
+            start = len(left.children_addrs)
+            left.insert_key(len(left.keys), parent.keys[sep_idx])
+            left.extend_keys(right.keys)
+            left.children_addrs.extend(right.children_addrs)
+            left.counts.extend(right.counts)
+            self.adopt_children(left, start)
+        self.disk.write(left.my_addr, left)
+        self.disk.free(right.my_addr)
+
+        del parent.keys[sep_idx]
+        del parent.children_addrs[sep_idx + 1]
+        if self.order_stats:
+            parent.counts[sep_idx] += parent.counts.pop(sep_idx + 1)
+        for i in range(sep_idx + 1, len(parent.children_addrs)):
+            child = self.disk.read(parent.children_addrs[i])
+            child.index_in_parent = i
+            self.disk.write(child.my_addr, child)
+
+    def give_sibling(self, node: BTreeNode) -> None:
+        """
+        Make sure the internal node `node`, the only child of its parent, gets a
+        sibling: it borrows a child from a cousin if one can spare it, or is
+        merged with the cousin's parent otherwise. Only happens with M == 2,
+        where an internal node may have a single child.
+        """
+        parent = self.read_for_update(node.parent_addr)
+        if len(parent.children_addrs) == 1:
+            self.give_sibling(parent)
+            node = self.read_for_update(node.my_addr)
+            parent = self.read_for_update(node.parent_addr)
+        idx = node.index_in_parent
+        if idx > 0:
+            left = self.read_for_update(parent.children_addrs[idx - 1])
+            if self.can_lend(left):
+                self.borrow_from_left(parent, left, node)
+                return
+            self.merge_nodes(parent, left, node)
+        else:
+            right = self.read_for_update(parent.children_addrs[idx + 1])
+            if self.can_lend(right):
+                self.borrow_from_right(parent, node, right)
+                return
+            self.merge_nodes(parent, node, right)
+        if self.is_it_root_node(parent) and len(parent.children_addrs) == 1:
+            self.collapse_root(parent)
+        else:
+            self.disk.write(parent.my_addr, parent)
 
     def printNode(self, node):
         print('Keys:', '|'.join([str(y) for y in node.keys]))
         if node.parent_addr:
-            print('Parent Keys:', "|".join([str(y) for y in get_node(node.parent_addr).keys]))
+            print('Parent Keys:', "|".join([str(y) for y in self.disk.read(node.parent_addr).keys]))
         else:
             print('Root')
         print('Index in parent:', node.index_in_parent)
-        print('Child keys:', [DISK.read(x).keys for x in node.children_addrs])
+        print('Child keys:', [self.disk.read(x).keys for x in node.children_addrs])
         print('')
 
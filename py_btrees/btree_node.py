@@ -1,14 +1,20 @@
 from __future__ import annotations
 import typing
 import bisect
+import math
 from typing import Any, List, Optional, Tuple, Union, Dict, Generic, TypeVar, cast, NewType
 from py_btrees.disk import DISK, Address
 from py_btrees.comparable import Comparable
+from py_btrees.compact import IntArray, Ints, int_array
+from py_btrees.codec import ValueRef
 
 KT = TypeVar("KT", bound=Comparable)  # Key Type for generics
 VT = TypeVar("VT", bound=Any)  # Value Type for generics
 
 class BTreeNode(Generic[KT, VT]):
+    # No per-node __dict__; with large M and L most of a node is its keys anyway
+    __slots__ = ("my_addr", "parent_addr", "index_in_parent", "is_leaf", "keys", "children_addrs", "data",
+                 "prev_addr", "next_addr", "counts")
 
     def __init__(self, my_addr: Address, parent_addr: Optional[Address], index_in_parent: Optional[int], is_leaf: bool):
         """
@@ -33,26 +39,77 @@ class BTreeNode(Generic[KT, VT]):
           keys[i] and keys[i+1] according to BTree rules.
           You can have each key represent either the max value of the left child
           or the min value of the right child.
+
+        * counts[i] is the number of keys in the subtree of children_addrs[i]
+          (for internal nodes of a tree with order_stats; empty otherwise), so
+          that order statistics (BTree.rank(), select(), count()) need one descent.
+
+        * prev_addr / next_addr link a leaf to its left and right neighbours so that
+          range scans can walk the leaf level without descending from the root again.
+          They are None for internal nodes and at either end of the leaf level.
+
+        Child addresses, and the keys of nodes read back from a disk whose keys
+        are all 64-bit ints, are kept in an IntArray rather than a list (see
+        compact.py). Both behave the same; add keys through insert_key(),
+        set_key() and extend_keys(), which go back to a list for keys that
+        do not fit in an IntArray.
         """
         self.my_addr = my_addr
         self.parent_addr = parent_addr
         self.index_in_parent = index_in_parent
         self.is_leaf = is_leaf
-        self.keys: List[KT] = []
-        self.children_addrs: List[Address] = [] # for use when self.is_leaf == False. Otherwise it should be empty.
-        self.data: List[VT] = []                # for use when self.is_leaf == True. Otherwise it should be empty.
+        self.keys: Ints = []
+        self.children_addrs: Ints = int_array() # for use when self.is_leaf == False. Otherwise it should be empty.
+        self.data: List[Union[VT, ValueRef]] = []  # for use when self.is_leaf == True. Otherwise it should be empty.
+        self.prev_addr: Optional[Address] = None
+        self.next_addr: Optional[Address] = None
+        self.counts: Ints = int_array()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Any) -> None:
+        # Nodes pickled before __slots__ was introduced carry a plain attribute dict
+        if isinstance(state, tuple):
+            state = state[1]
+        self.counts = int_array()  # not in nodes pickled before subtree counts
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def insert_key(self, idx: int, key: KT) -> None:
+        try:
+            self.keys.insert(idx, key)
+        except (TypeError, OverflowError):
+            self.keys = list(self.keys)
+            self.keys.insert(idx, key)
+
+    def set_key(self, idx: int, key: KT) -> None:
+        try:
+            self.keys[idx] = key
+        except (TypeError, OverflowError):
+            self.keys = list(self.keys)
+            self.keys[idx] = key
 
-    def get_child(self, idx: int) -> BTreeNode:
-        return DISK.read(self.children_addrs[idx])
+    def extend_keys(self, keys: Ints) -> None:
+        if isinstance(self.keys, IntArray) and not isinstance(keys, IntArray):
+            self.keys = list(self.keys)
+        self.keys.extend(keys)
 
-    def get_children(self) -> BTreeNode:
-        return DISK.read(self.children_addrs)
+    def size(self) -> int:
+        """The number of keys in the subtree of this node."""
+        return len(self.keys) if self.is_leaf else sum(self.counts)
 
-    def get_parent(self) -> BTreeNode:
-        return DISK.read(self.parent_addr)
+    def get_child(self, idx: int, disk=DISK) -> BTreeNode:
+        return disk.read(self.children_addrs[idx])
 
-    def write_back(self):
-        DISK.write(self.my_addr, self)
+    def get_children(self, disk=DISK) -> List[BTreeNode]:
+        return [disk.read(addr) for addr in self.children_addrs]
+
+    def get_parent(self, disk=DISK) -> BTreeNode:
+        return disk.read(self.parent_addr)
+
+    def write_back(self, disk=DISK):
+        disk.write(self.my_addr, self)
 
     def find_idx(self, key: KT) -> Optional[int]:
         """
@@ -64,7 +121,7 @@ class BTreeNode(Generic[KT, VT]):
         # Get index of key
         return bisect.bisect_left(self.keys, key)
 
-    def find_data(self, key: KT) -> Optional[VT]:
+    def find_data(self, key: KT) -> Optional[Union[VT, ValueRef]]:
         """
         Given a key, retrieve the data associated with that key.
         Returns None if key is not present in self.keys.
@@ -90,11 +147,74 @@ class BTreeNode(Generic[KT, VT]):
         if idx < len(self.keys) and self.keys[idx] == key:
             self.data[idx] = value
         else:
-            self.keys.insert(idx, key)
+            self.insert_key(idx, key)
             self.data.insert(idx, value)
 
 
 # You may find this helper function useful
-def get_node(addr: Address) -> BTreeNode:
-    return DISK.read(addr)
+def get_node(addr: Address, disk=DISK) -> BTreeNode:
+    return disk.read(addr)
+
+
+
+def shortest_separator(left: KT, right: KT) -> KT:
+    """
+    The shortest key s with left <= s < right, for use as the separator of two
+    neighbouring nodes whose keys end with `left` and start with `right`.
+
+    For strings and bytes this is `right` cut just past the point where it
+    departs from `left` (e.g. "apple" | "apricot" -> "apr"), whenever that is
+    shorter than `left` and still below `right`. Other keys are not shortened.
+    """
+    if type(left) is not type(right) or not isinstance(left, (str, bytes)):
+        return left
+    common = 0
+    limit = min(len(left), len(right))
+    while common < limit and left[common] == right[common]:
+        common += 1
+    candidate = right[:common + 1]
+    if len(candidate) < len(left) and candidate < right:
+        return candidate
+    return left
+
+
+def interpolation_search(keys: List[KT], key: KT) -> int:
+    """
+    Same result as bisect.bisect_left(keys, key), found by guessing the
+    position of `key` from its value relative to the first and last key of
+    the remaining range. On evenly spread numbers that takes a few steps
+    instead of log2(len(keys)). A step that does not at least halve the range
+    is followed by a plain bisection step, so skewed keys cost at most about
+    twice as many steps as bisect. Keys that are not numbers are bisected,
+    and so is any range where the guess is not a finite number (infinities,
+    NaN, or floats whose difference overflows).
+    """
+    if not isinstance(key, (int, float)) or isinstance(key, bool):
+        return bisect.bisect_left(keys, key)
+    lo, hi = 0, len(keys)
+    interpolate = True
+    # The answer is always in [lo, hi]; each step compares key to one element
+    while lo < hi:
+        first, last = keys[lo], keys[hi - 1]
+        pos = (lo + hi) // 2
+        if interpolate and last != first:
+            try:
+                span = last - first
+                if span < math.inf:  # neither infinite nor NaN
+                    pos = min(max(lo + int((key - first) * (hi - 1 - lo) // span), lo), hi - 1)
+            except (ValueError, OverflowError):
+                pass  # the key is infinite or NaN, or a difference overflows: bisect
+        size = hi - lo
+        if keys[pos] < key:
+            lo = pos + 1
+        else:
+            hi = pos
+        interpolate = 2 * (hi - lo) <= size
+    return lo
+
 
+# Ways to find the child of an internal node to descend to (BTree(search=...))
+SEARCHES = {
+    "bisect": bisect.bisect_left,
+    "interpolation": interpolation_search,
+}
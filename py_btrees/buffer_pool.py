@@ -0,0 +1,269 @@
+"""
+A bounded page cache that sits in front of a Disk and keeps decoded
+BTreeNode objects resident between operations.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+from py_btrees.disk import DISK, Address
+
+
+class LRUPolicy:
+    """Evict the page that was used least recently."""
+
+    def __init__(self, capacity: int):
+        self.order: "OrderedDict[Address, None]" = OrderedDict()
+
+    def admit(self, addr: Address) -> None:
+        self.order[addr] = None
+
+    def touch(self, addr: Address) -> None:
+        self.order.move_to_end(addr)
+
+    def remove(self, addr: Address) -> None:
+        self.order.pop(addr, None)
+
+    def victim(self) -> Address:
+        addr, _ = self.order.popitem(last=False)
+        return addr
+
+
+class ClockPolicy:
+    """Second-chance approximation of LRU: a hand sweeps over reference bits."""
+
+    def __init__(self, capacity: int):
+        self.ring: List[Optional[Address]] = []
+        self.slots: Dict[Address, int] = {}
+        self.referenced: Dict[Address, bool] = {}
+        self.free_slots: List[int] = []
+        self.hand = 0
+
+    def admit(self, addr: Address) -> None:
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.ring[slot] = addr
+        else:
+            slot = len(self.ring)
+            self.ring.append(addr)
+        self.slots[addr] = slot
+        self.referenced[addr] = False
+
+    def touch(self, addr: Address) -> None:
+        self.referenced[addr] = True
+
+    def remove(self, addr: Address) -> None:
+        slot = self.slots.pop(addr, None)
+        if slot is not None:
+            self.ring[slot] = None
+            del self.referenced[addr]
+            self.free_slots.append(slot)
+
+    def victim(self) -> Address:
+        while True:
+            if self.hand >= len(self.ring):
+                self.hand = 0
+            addr = self.ring[self.hand]
+            self.hand += 1
+            if addr is None:
+                continue
+            if self.referenced[addr]:
+                self.referenced[addr] = False
+                continue
+            self.remove(addr)
+            return addr
+
+
+class TwoQPolicy:
+    """
+    Simplified 2Q: pages enter a FIFO (A1in) and only move to the main LRU (Am)
+    when they are requested again after being evicted from the FIFO, which
+    keeps one-off scans from flushing the hot upper levels of the tree.
+    """
+
+    def __init__(self, capacity: int):
+        self.in_limit = max(1, capacity // 4)
+        self.out_limit = max(1, capacity // 2)
+        self.a1in: "OrderedDict[Address, None]" = OrderedDict()
+        self.a1out: "OrderedDict[Address, None]" = OrderedDict()  # ghost entries, no data
+        self.am: "OrderedDict[Address, None]" = OrderedDict()
+
+    def admit(self, addr: Address) -> None:
+        if addr in self.a1out:
+            del self.a1out[addr]
+            self.am[addr] = None
+        else:
+            self.a1in[addr] = None
+
+    def touch(self, addr: Address) -> None:
+        if addr in self.am:
+            self.am.move_to_end(addr)
+
+    def remove(self, addr: Address) -> None:
+        self.a1in.pop(addr, None)
+        self.am.pop(addr, None)
+
+    def victim(self) -> Address:
+        if len(self.a1in) > self.in_limit or not self.am:
+            addr, _ = self.a1in.popitem(last=False)
+            self.a1out[addr] = None
+            if len(self.a1out) > self.out_limit:
+                self.a1out.popitem(last=False)
+            return addr
+        addr, _ = self.am.popitem(last=False)
+        return addr
+
+
+POLICIES = {
+    "lru": LRUPolicy,
+    "clock": ClockPolicy,
+    "2q": TwoQPolicy,
+}
+
+
+class BufferPoolStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "writebacks": self.writebacks,
+        }
+
+
+class BufferPool:
+    """
+    Write-back cache of decoded nodes with the same new/read/write interface as Disk,
+    so a BTree can be given a BufferPool wherever it expects a disk.
+
+    Nodes returned by read() are the cached objects themselves, not copies. As with
+    Disk, a modified node must still be passed to write() so that it is marked dirty;
+    dirty nodes reach the underlying disk when they are evicted or on flush().
+    A lock makes every call atomic, so the pool can be shared between threads.
+    """
+
+    def __init__(self, disk=DISK, capacity: int = 1024, policy: str = "lru"):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, not {capacity}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, expected one of {sorted(POLICIES)}")
+        self.disk = disk
+        self.capacity = capacity
+        self.policy = POLICIES[policy](capacity)
+        self.frames: Dict[Address, "BTreeNode"] = {}
+        self.dirty: Set[Address] = set()
+        self.stats = BufferPoolStats()
+        self.lock = threading.RLock()
+
+    def new(self) -> Address:
+        with self.lock:
+            return self.disk.new()
+
+    def read(self, addr: Address) -> "BTreeNode":
+        with self.lock:
+            node = self.frames.get(addr)
+            if node is not None:
+                self.stats.hits += 1
+                self.policy.touch(addr)
+                return node
+            self.stats.misses += 1
+            node = self.disk.read(addr)
+            self._admit(addr, node)
+            return node
+
+    def write(self, addr: Address, data: "BTreeNode") -> None:
+        with self.lock:
+            if addr in self.frames:
+                self.frames[addr] = data
+                self.policy.touch(addr)
+            else:
+                self._admit(addr, data)
+            self.dirty.add(addr)
+
+    def free(self, addr: Address) -> None:
+        """Drop a node from the cache without writing it back and release its block."""
+        with self.lock:
+            if self.frames.pop(addr, None) is not None:
+                self.policy.remove(addr)
+            self.dirty.discard(addr)
+            self.disk.free(addr)
+
+    def read_raw(self, addr: Address) -> bytes:
+        """Blocks that do not hold nodes (such as values kept out of their leaf) are not cached."""
+        with self.lock:
+            return self.disk.read_raw(addr)
+
+    def write_raw(self, addr: Address, block: bytes) -> None:
+        with self.lock:
+            if self.frames.pop(addr, None) is not None:
+                self.policy.remove(addr)
+            self.dirty.discard(addr)
+            self.disk.write_raw(addr, block)
+
+    def snapshot(self):
+        """Flush, then start a snapshot view on the VersionedDisk under the pool (see BTree.snapshot)."""
+        with self.lock:
+            if not hasattr(self.disk, "snapshot"):
+                raise ValueError("Snapshots need a VersionedDisk under the buffer pool")
+            self.flush()
+            return self.disk.snapshot()
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.disk, "transactional", False)
+
+    def commit(self) -> None:
+        """Flush the dirty nodes and commit them on a transactional disk."""
+        with self.lock:
+            self.flush()
+            self.disk.commit()
+
+    def abort(self) -> None:
+        """Forget the cached nodes, including uncommitted changes, and roll back the disk."""
+        with self.lock:
+            for addr in list(self.frames):
+                self.policy.remove(addr)
+            self.frames.clear()
+            self.dirty.clear()
+            self.disk.abort()
+
+    def save_meta(self, meta: Dict[str, Any]) -> None:
+        self.disk.save_meta(meta)
+
+    def load_meta(self) -> Dict[str, Any]:
+        return self.disk.load_meta()
+
+    def flush(self) -> None:
+        """Write every dirty node back to the underlying disk. Nodes stay cached."""
+        with self.lock:
+            for addr in sorted(self.dirty):
+                self.disk.write(addr, self.frames[addr])
+                self.stats.writebacks += 1
+            self.dirty.clear()
+
+    def _admit(self, addr: Address, node: "BTreeNode") -> None:
+        while len(self.frames) >= self.capacity:
+            self._evict(self.policy.victim())
+        self.frames[addr] = node
+        self.policy.admit(addr)
+
+    def _evict(self, addr: Address) -> None:
+        node = self.frames.pop(addr)
+        if addr in self.dirty:
+            self.dirty.discard(addr)
+            self.disk.write(addr, node)
+            self.stats.writebacks += 1
+        self.stats.evictions += 1
@@ -0,0 +1,236 @@
+"""
+Bottom-up bulk loading of a B-Tree from keys that arrive in ascending order.
+"""
+
+from typing import Any, Iterable, List, Optional, Tuple
+from py_btrees.disk import DISK, Address
+from py_btrees.btree_node import BTreeNode, KT, VT, shortest_separator
+from py_btrees.compact import int_array
+
+_NO_KEY = object()
+
+
+class _Group:
+    """
+    A node that is still being built. `members` holds the child groups of an
+    internal node; they are only written to disk once this group is finalized,
+    because that is the first moment their parent_addr / index_in_parent are known.
+    """
+    __slots__ = ("node", "members", "lo", "hi")
+
+    def __init__(self, node: BTreeNode):
+        self.node = node
+        self.members: List["_Group"] = []
+        self.lo: Any = None
+        self.hi: Any = None
+
+    def size(self) -> int:
+        return len(self.node.keys) if self.node.is_leaf else len(self.members)
+
+
+class _Level:
+    __slots__ = ("sealed", "current", "count")
+
+    def __init__(self):
+        self.sealed: Optional[_Group] = None   # full group kept back so the last one can be rebalanced
+        self.current: Optional[_Group] = None  # group being filled
+        self.count = 0                         # groups ever created on this level
+
+
+class BulkLoader:
+    """
+    Builds a tree level by level while the input streams in.
+
+    Every level keeps at most two unfinished nodes: the one being filled and
+    the previous (full) one, so that the right-most node can borrow from its
+    neighbour when the input ends. A node is written exactly once, as soon as
+    its parent is finalized. Memory use depends on M, L and the height of the
+    tree, not on the number of keys.
+
+    With `truncate_separators` set, the keys of internal nodes are the
+    shortest keys that separate their children (see shortest_separator).
+    With `top` set, nothing is built above that level; finish_level() then
+    returns the nodes on it instead of a single root.
+    With `order_stats` set, internal nodes get the subtree counts of their
+    children (see BTree(order_stats=...)).
+    """
+
+    def __init__(self, M: int, L: int, fill_factor: float = 1.0, disk=DISK, truncate_separators: bool = True,
+                 top: Optional[int] = None, order_stats: bool = False):
+        if not 0 < fill_factor <= 1:
+            raise ValueError(f"fill_factor must be in (0, 1], not {fill_factor}")
+        self.disk = disk
+        self.truncate_separators = truncate_separators
+        self.M = M
+        self.L = L
+        self.leaf_min = (L + 1) // 2
+        self.internal_min = (M + 1) // 2
+        self.leaf_cap = min(L, max(self.leaf_min, 1, round(L * fill_factor)))
+        self.internal_cap = min(M, max(self.internal_min, 2, round(M * fill_factor)))
+        self.levels: List[_Level] = []
+        self.last_key: Any = _NO_KEY
+        self.base = 0                     # lowest level that receives input (see add_subtree)
+        self.top = top
+        self.order_stats = order_stats
+        self.tops: List[_Group] = []
+
+    def add(self, key: KT, value: VT) -> None:
+        if self.last_key is not _NO_KEY and not self.last_key < key:
+            raise ValueError(f"Keys must be strictly ascending, got {key!r} after {self.last_key!r}")
+        self.last_key = key
+        level = self._level(0)
+        group = self._open_group(0, level)
+        group.node.keys.append(key)
+        group.node.data.append(value)
+
+    def add_all(self, items: Iterable[Tuple[KT, VT]]) -> None:
+        for key, value in items:
+            self.add(key, value)
+
+    def add_subtree(self, node: BTreeNode, depth: int, lo: KT, hi: KT) -> None:
+        """
+        Append a finished subtree whose root `node` is at `depth` (0 for a
+        leaf) and whose keys run from `lo` to `hi`. Its descendants must be on
+        disk already; the node itself is written once its parent is known.
+        All subtrees given to one loader must have the same depth, and the
+        loader cannot also take single keys.
+        """
+        if self.last_key is not _NO_KEY and not self.last_key < lo:
+            raise ValueError(f"Subtrees must be in ascending key order, got {lo!r} after {self.last_key!r}")
+        self.last_key = hi
+        self.base = depth + 1
+        group = _Group(node)
+        group.lo, group.hi = lo, hi
+        parent = self._open_group(self.base, self._level(self.base))
+        if not parent.members:
+            parent.lo = lo
+        parent.members.append(group)
+        parent.hi = hi
+
+    def finish(self) -> Address:
+        """Flush every level bottom-up and return the address of the root."""
+        if not self.levels:
+            root_addr = self.disk.new()
+            self.disk.write(root_addr, BTreeNode(root_addr, None, None, True))
+            return root_addr
+
+        depth = self.base
+        while True:
+            level = self.levels[depth]
+            self._rebalance_tail(level)
+            if level.count == 1:
+                root = level.current
+                self._finalize(root)
+                root.node.parent_addr = None
+                root.node.index_in_parent = None
+                self.disk.write(root.node.my_addr, root.node)
+                return root.node.my_addr
+            if level.sealed is not None:
+                self._emit(depth, level.sealed)
+            self._emit(depth, level.current)
+            level.sealed = level.current = None
+            depth += 1
+
+    def finish_level(self) -> List[_Group]:
+        """
+        Like finish(), but for a loader with a `top` level: the groups on
+        that level are finalized (their children written) and returned in key
+        order without being written themselves, for add_subtree() on another loader.
+        """
+        for depth in range(self.top + 1):
+            level = self._level(depth)
+            self._rebalance_tail(level)
+            if level.sealed is not None:
+                self._emit(depth, level.sealed)
+            if level.current is not None:
+                self._emit(depth, level.current)
+            level.sealed = level.current = None
+        return self.tops
+
+    def _level(self, depth: int) -> _Level:
+        while depth >= len(self.levels):
+            self.levels.append(_Level())
+        return self.levels[depth]
+
+    def _cap(self, depth: int) -> int:
+        return self.leaf_cap if depth == 0 else self.internal_cap
+
+    def _open_group(self, depth: int, level: _Level) -> _Group:
+        """Return the group the next item on this level goes into, starting a new one if needed."""
+        current = level.current
+        if current is not None and current.size() < self._cap(depth):
+            return current
+        if level.sealed is not None:
+            self._emit(depth, level.sealed)
+        level.sealed = current
+        group = _Group(BTreeNode(self.disk.new(), None, None, depth == 0))
+        if depth == 0 and current is not None:
+            current.node.next_addr = group.node.my_addr
+            group.node.prev_addr = current.node.my_addr
+        level.current = group
+        level.count += 1
+        return group
+
+    def _emit(self, depth: int, group: _Group) -> None:
+        """Finalize a group and hand it to the level above as a child."""
+        self._finalize(group)
+        if depth == self.top:
+            self.tops.append(group)
+            return
+        parent = self._open_group(depth + 1, self._level(depth + 1))
+        if not parent.members:
+            parent.lo = group.lo
+        parent.members.append(group)
+        parent.hi = group.hi
+
+    def _finalize(self, group: _Group) -> None:
+        """Fix the contents of a group and write its children, whose position is now final."""
+        node = group.node
+        if node.is_leaf:
+            group.lo, group.hi = node.keys[0], node.keys[-1]
+            return
+        members = group.members
+        if self.truncate_separators:
+            node.keys = [shortest_separator(left.hi, right.lo) for left, right in zip(members, members[1:])]
+        else:
+            node.keys = [member.hi for member in members[:-1]]
+        node.children_addrs = int_array(member.node.my_addr for member in group.members)
+        if self.order_stats:
+            node.counts = int_array(member.node.size() for member in group.members)
+        for idx, member in enumerate(group.members):
+            member.node.parent_addr = node.my_addr
+            member.node.index_in_parent = idx
+            self.disk.write(member.node.my_addr, member.node)
+        group.members = []
+
+    def _rebalance_tail(self, level: _Level) -> None:
+        """
+        Make sure the right-most group on a level is not underfull by sharing
+        the contents of the last two groups.
+        """
+        sealed, current = level.sealed, level.current
+        if sealed is None:
+            return
+        minimum = self.leaf_min if current.node.is_leaf else self.internal_min
+        if current.size() >= minimum:
+            return
+        total = sealed.size() + current.size()
+        # Merging into one node only happens with small fill factors; the
+        # address allocated for `current` is then given back to the disk.
+        keep = total if total // 2 < minimum else total - total // 2
+        if current.node.is_leaf:
+            keys = [*sealed.node.keys, *current.node.keys]
+            data = sealed.node.data + current.node.data
+            sealed.node.keys, sealed.node.data = keys[:keep], data[:keep]
+            current.node.keys, current.node.data = keys[keep:], data[keep:]
+        else:
+            members = sealed.members + current.members
+            sealed.members, current.members = members[:keep], members[keep:]
+            sealed.hi = sealed.members[-1].hi
+            if current.members:
+                current.lo = current.members[0].lo
+        if current.size() == 0:
+            sealed.node.next_addr = current.node.next_addr
+            self.disk.free(current.node.my_addr)
+            level.current, level.sealed = sealed, None
+            level.count -= 1
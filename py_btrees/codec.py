@@ -0,0 +1,376 @@
+"""
+Serialization of BTreeNode objects into disk blocks.
+
+NodeCodec is a compact, schema-driven binary format; PickleCodec keeps the
+original pickle format around for comparison and for exotic node contents.
+Both expose encode(node) -> bytes and decode(buffer) -> BTreeNode, and a Disk
+can be built with either.
+
+Values that a tree keeps out of its leaves (BTree(overflow_threshold=...))
+are stored with encode_value and appear in the leaf as a ValueRef.
+"""
+
+import pickle
+import struct
+from itertools import accumulate, chain
+from typing import Any, List, Sequence, Tuple
+from py_btrees.compact import IntArray, Ints
+
+VERSION = 2
+# Version 1 blocks have no subtree counts: internal nodes written before there were any,
+# and those of trees without order statistics (see BTree(order_stats=...))
+_VERSION_NO_COUNTS = 1
+_READABLE = (1, 2)
+
+# version, is_leaf, my_addr, parent_addr, index_in_parent, prev_addr, next_addr,
+# len(keys), len(children_addrs), len(data). Optional fields are stored as -1 when they are None.
+_HEADER = struct.Struct("<BBqqqqqIII")
+
+# Tags for the encoding of a list of keys or values
+TAG_PICKLE = 0
+TAG_INT = 1
+TAG_BYTES = 2
+TAG_STR = 3
+TAG_FIXED_BYTES = 4
+TAG_PREFIXED = 5  # a shared prefix, then every value without it
+TAG_FRAME = 6     # sorted ints: the first one, then each one's offset from it
+TAG_DELTA = 7     # sorted ints: the first one, then the gap to the one before
+TAG_REFS = 8      # values with some of them kept in blocks of their own: (position, address) pairs, then the rest
+
+_U32 = struct.Struct("<I")
+_TAG = struct.Struct("<B")
+_TAG_WIDTH = struct.Struct("<BB")
+
+# Integers and lengths are packed with the narrowest struct code that fits
+_SIGNED = ((-(2 ** 7), 2 ** 7 - 1, "b"), (-(2 ** 15), 2 ** 15 - 1, "h"), (-(2 ** 31), 2 ** 31 - 1, "i"),
+           (-(2 ** 63), 2 ** 63 - 1, "q"))
+_UNSIGNED = ((2 ** 8 - 1, "B"), (2 ** 16 - 1, "H"), (2 ** 32 - 1, "I"))
+_I64 = struct.Struct("<q")
+
+
+def _signed_code(lo: int, hi: int):
+    for low, high, code in _SIGNED:
+        if low <= lo and hi <= high:
+            return code
+    return None
+
+
+def _unsigned_code(hi: int) -> str:
+    for high, code in _UNSIGNED:
+        if hi <= high:
+            return code
+    raise ValueError(f"Length {hi} is too large to encode")
+
+
+class ValueRef:
+    """Stands in a leaf for a value that is stored in a block of its own, at `addr`."""
+    __slots__ = ("addr",)
+
+    def __init__(self, addr: int):
+        self.addr = addr
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ValueRef) and other.addr == self.addr
+
+    def __hash__(self) -> int:
+        return hash(self.addr)
+
+    def __repr__(self) -> str:
+        return f"ValueRef({self.addr})"
+
+
+def encode_value(value: Any) -> bytes:
+    """The block contents for a single value kept out of its leaf."""
+    out: List[bytes] = []
+    encode_values([value], out)
+    return b"".join(out)
+
+
+def decode_value(buf) -> Any:
+    return decode_values(buf, 0, 1)[0][0]
+
+
+def _encode_sorted_ints(values: Sequence[int], out: List[bytes]) -> bool:
+    """
+    Write sorted ints as frame-of-reference offsets or as gaps, if either is
+    smaller than packing them as they are. Returns whether anything was written.
+    """
+    n = len(values)
+    plain = _signed_code(values[0], values[-1])
+    if plain is None or n < 3:
+        return False
+    best = n * struct.calcsize(plain)
+    choice = None
+    span = values[-1] - values[0]
+    if span <= _UNSIGNED[-1][0]:
+        code = _unsigned_code(span)
+        if 8 + n * struct.calcsize(code) < best:
+            best, choice = 8 + n * struct.calcsize(code), (TAG_FRAME, code)
+    gap = max(b - a for a, b in zip(values, values[1:]))
+    if gap <= _UNSIGNED[-1][0]:
+        code = _unsigned_code(gap)
+        if 8 + (n - 1) * struct.calcsize(code) < best:
+            choice = (TAG_DELTA, code)
+    if choice is None:
+        return False
+    tag, code = choice
+    out.append(_TAG_WIDTH.pack(tag, ord(code)))
+    out.append(_I64.pack(values[0]))
+    first = values[0]
+    if tag == TAG_FRAME:
+        out.append(struct.pack(f"<{n}{code}", *[value - first for value in values]))
+    else:
+        out.append(struct.pack(f"<{n - 1}{code}", *[b - a for a, b in zip(values, values[1:])]))
+    return True
+
+_node_class = None
+
+
+def _new_node() -> Any:
+    # Imported lazily: disk.py builds its default codec from this module,
+    # and btree_node.py imports disk.py.
+    global _node_class
+    if _node_class is None:
+        from py_btrees.btree_node import BTreeNode
+        _node_class = BTreeNode
+    return _node_class.__new__(_node_class)
+
+
+def _opt(value) -> int:
+    return -1 if value is None else value
+
+
+def _unopt(value: int):
+    return None if value == -1 else value
+
+
+def _common_prefix(first, last) -> int:
+    n = 0
+    limit = min(len(first), len(last))
+    while n < limit and first[n] == last[n]:
+        n += 1
+    return n
+
+
+def encode_values(values: Sequence[Any], out: List[bytes], ordered: bool = False, prefix: bool = False,
+                  delta: bool = False) -> None:
+    """
+    Append the encoding of a list of keys, values or addresses to `out`.
+
+    Homogeneous lists get a compact layout: ints (that fit in 64 bits) are
+    packed with the narrowest width that fits, strings without NUL characters
+    are stored NUL-separated, and bytes are stored back to back, with a single
+    width if they all have the same length or length-prefixed. Everything else
+    is pickled. Set `ordered` for sorted input (like node keys) to skip the
+    min/max scan. With `prefix` also set, sorted strings or bytes that all
+    start the same way are stored as that prefix followed by the rest of each.
+    With `delta` also set, sorted ints are stored as offsets from the first
+    one or as the gaps between neighbours, whichever is smallest.
+    ValueRefs among the values are stored as their addresses, next to the
+    encoding of the other values.
+    """
+    n = len(values)
+    if not n:
+        out.append(_TAG_WIDTH.pack(TAG_INT, ord("b")))
+        return
+    kinds = set(map(type, values))
+    if ValueRef in kinds:
+        positions = [i for i, value in enumerate(values) if type(value) is ValueRef]
+        out.append(_TAG.pack(TAG_REFS))
+        out.append(_U32.pack(len(positions)))
+        encode_values([x for i in positions for x in (i, values[i].addr)], out)
+        encode_values([value for value in values if type(value) is not ValueRef], out)
+        return
+    if len(kinds) == 1:
+        kind = kinds.pop()
+        if prefix and ordered and n > 1 and kind in (str, bytes):
+            # In sorted input the prefix shared by the first and last value is shared by all
+            common = _common_prefix(values[0], values[-1])
+            if common:
+                out.append(_TAG.pack(TAG_PREFIXED))
+                encode_values([values[0][:common]], out)
+                encode_values([value[common:] for value in values], out)
+                return
+        if kind is int:
+            if ordered and delta and _encode_sorted_ints(values, out):
+                return
+            if ordered:
+                code = _signed_code(values[0], values[-1])
+            else:
+                code = _signed_code(min(values), max(values))
+            if code is not None:  # otherwise some value does not fit in 64 bits
+                out.append(_TAG_WIDTH.pack(TAG_INT, ord(code)))
+                out.append(struct.pack(f"<{n}{code}", *values))
+                return
+        elif kind is str:
+            joined = "\0".join(values)
+            if joined.count("\0") == n - 1:
+                blob = joined.encode("utf-8", "surrogatepass")  # lone surrogates, e.g. from os.fsdecode
+                out.append(_TAG.pack(TAG_STR))
+                out.append(_U32.pack(len(blob)))
+                out.append(blob)
+                return
+        elif kind is bytes:
+            lengths = set(map(len, values))
+            if len(lengths) == 1:
+                out.append(_TAG.pack(TAG_FIXED_BYTES))
+                out.append(_U32.pack(lengths.pop()))
+                out.append(b"".join(values))
+                return
+            code = _unsigned_code(max(lengths))
+            out.append(_TAG_WIDTH.pack(TAG_BYTES, ord(code)))
+            out.append(struct.pack(f"<{n}{code}", *map(len, values)))
+            out.append(b"".join(values))
+            return
+    blob = pickle.dumps(list(values), pickle.HIGHEST_PROTOCOL)
+    out.append(_TAG.pack(TAG_PICKLE))
+    out.append(_U32.pack(len(blob)))
+    out.append(blob)
+
+
+def decode_values(buf, offset: int, n: int, ints: bool = False, allow_pickle: bool = True) -> Tuple[Ints, int]:
+    """
+    Decode `n` items written by encode_values at `offset`. Returns (values, new offset).
+    With `ints` set, a list of ints comes back as an IntArray. Unpickling can
+    run arbitrary code: for bytes from an untrusted source, clear
+    `allow_pickle` to get a ValueError instead.
+    """
+    tag = buf[offset]
+    offset += 1
+    if tag == TAG_INT:
+        fmt = f"<{n}{chr(buf[offset])}"
+        parts = struct.unpack_from(fmt, buf, offset + 1)
+        values: Ints = IntArray("q", parts) if ints else list(parts)
+        return values, offset + 1 + struct.calcsize(fmt)
+    if tag == TAG_FRAME or tag == TAG_DELTA:
+        code = chr(buf[offset])
+        (first,) = _I64.unpack_from(buf, offset + 1)
+        fmt = f"<{n if tag == TAG_FRAME else n - 1}{code}"
+        parts = struct.unpack_from(fmt, buf, offset + 9)
+        if tag == TAG_FRAME:
+            items = [first + part for part in parts]
+        else:
+            items = list(accumulate(chain((first,), parts)))
+        values = IntArray("q", items) if ints else items
+        return values, offset + 9 + struct.calcsize(fmt)
+    if tag == TAG_REFS:
+        (count,) = _U32.unpack_from(buf, offset)
+        pairs, offset = decode_values(buf, offset + 4, 2 * count, allow_pickle=allow_pickle)
+        values, offset = decode_values(buf, offset, n - count, allow_pickle=allow_pickle)
+        # Positions are ascending, so each reference lands where it was
+        for j in range(0, 2 * count, 2):
+            values.insert(pairs[j], ValueRef(pairs[j + 1]))
+        return values, offset
+    if tag == TAG_STR:
+        (size,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        return str(buf[offset:offset + size], "utf-8", "surrogatepass").split("\0"), offset + size
+    if tag == TAG_FIXED_BYTES:
+        (width,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        return list(struct.unpack_from(f"{width}s" * n, buf, offset)), offset + width * n
+    if tag == TAG_BYTES:
+        fmt = f"<{n}{chr(buf[offset])}"
+        ends = list(accumulate(struct.unpack_from(fmt, buf, offset + 1)))
+        offset += 1 + struct.calcsize(fmt)
+        blob = bytes(buf[offset:offset + ends[-1]])
+        return [blob[start:end] for start, end in zip([0] + ends, ends)], offset + ends[-1]
+    if tag == TAG_PREFIXED:
+        (head,), offset = decode_values(buf, offset, 1, allow_pickle=allow_pickle)
+        tails, offset = decode_values(buf, offset, n, allow_pickle=allow_pickle)
+        return [head + tail for tail in tails], offset
+    if tag == TAG_PICKLE:
+        if not allow_pickle:
+            raise ValueError("Refusing to unpickle values that may come from an untrusted source "
+                             "(allow_pickle is not set)")
+        (size,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        return pickle.loads(buf[offset:offset + size]), offset + size
+    raise ValueError(f"Unknown value encoding tag {tag}")
+
+
+class NodeCodec:
+    """
+    Binary node format:
+
+    * a fixed header with the version, is_leaf, my_addr, parent_addr,
+      index_in_parent, prev_addr, next_addr and the number of keys, children and values
+    * the keys, the child addresses and the data values, each as a list
+      encoded by encode_values
+    * for internal nodes, the key count of each child's subtree, likewise,
+      unless the node has none (then the block is marked as version 1)
+
+    With `prefix_compression` set, string and bytes keys are stored with the
+    prefix they share factored out, which pays off for keys like URLs or
+    composite IDs. Either codec decodes blocks written by the other.
+
+    With `int_arrays` set (the default), decoded child addresses and int keys
+    are IntArrays rather than lists.
+
+    With `delta_keys` set, sorted int keys are stored relative to the first
+    key of the node (frame of reference) or as the gaps between neighbours,
+    so that dense keys take a byte or two each.
+    """
+
+    def __init__(self, prefix_compression: bool = False, int_arrays: bool = True, delta_keys: bool = False):
+        self.prefix_compression = prefix_compression
+        self.int_arrays = int_arrays
+        self.delta_keys = delta_keys
+
+    def encode(self, node) -> bytes:
+        keys = node.keys
+        children = node.children_addrs
+        counts = node.counts
+        with_counts = len(children) > 0 and len(counts) > 0
+        if with_counts and len(counts) != len(children):
+            raise ValueError(f"Node {node.my_addr} has {len(children)} children but {len(counts)} subtree counts")
+        out = [_HEADER.pack(
+            VERSION if with_counts or not len(children) else _VERSION_NO_COUNTS,
+            node.is_leaf,
+            node.my_addr,
+            _opt(node.parent_addr),
+            _opt(node.index_in_parent),
+            _opt(node.prev_addr),
+            _opt(node.next_addr),
+            len(keys),
+            len(children),
+            len(node.data),
+        )]
+        encode_values(keys, out, ordered=True, prefix=self.prefix_compression, delta=self.delta_keys)
+        encode_values(children, out)
+        encode_values(node.data, out)
+        if with_counts:
+            encode_values(counts, out)
+        return b"".join(out)
+
+    def decode(self, buf) -> Any:
+        version, is_leaf, my_addr, parent_addr, index_in_parent, prev_addr, next_addr, \
+            n_keys, n_children, n_data = _HEADER.unpack_from(buf, 0)
+        if version not in _READABLE:
+            raise ValueError(f"Unsupported node format version {version}")
+        node = _new_node()
+        node.my_addr = my_addr
+        node.parent_addr = _unopt(parent_addr)
+        node.index_in_parent = _unopt(index_in_parent)
+        node.is_leaf = bool(is_leaf)
+        node.prev_addr = _unopt(prev_addr)
+        node.next_addr = _unopt(next_addr)
+
+        node.keys, offset = decode_values(buf, _HEADER.size, n_keys, self.int_arrays)
+        node.children_addrs, offset = decode_values(buf, offset, n_children, self.int_arrays)
+        node.data, offset = decode_values(buf, offset, n_data)
+        if n_children and version > 1:
+            node.counts, offset = decode_values(buf, offset, n_children, self.int_arrays)
+        else:
+            node.counts = IntArray("q") if self.int_arrays else []
+        return node
+
+
+class PickleCodec:
+    """The original block format: the whole node object, pickled."""
+
+    def encode(self, node) -> bytes:
+        return pickle.dumps(node)
+
+    def decode(self, buf) -> Any:
+        return pickle.loads(buf)
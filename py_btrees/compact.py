@@ -0,0 +1,59 @@
+"""
+Compact storage for the integer keys and child addresses of a node.
+"""
+
+from array import array
+from typing import Any, Iterable, List, Optional, Union
+
+
+class IntArray(array):
+    """
+    array("q") that compares equal to a list with the same items, so that it
+    can stand in for the `keys` or `children_addrs` list of a node. It holds
+    each int in 8 bytes instead of a pointer to a separate int object.
+
+    Slicing or adding arrays gives plain arrays; use take() to split one.
+    Storing a value that is not an int in 64 bits raises TypeError or
+    OverflowError: BTreeNode.insert_key() and friends then go back to a list.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, array):
+            return len(self) == len(other) and self.tolist() == other.tolist()
+        if isinstance(other, list):
+            return len(self) == len(other) and self.tolist() == other
+        return NotImplemented
+
+    def __ne__(self, other: Any) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"IntArray({self.tolist()!r})"
+
+
+Ints = Union[IntArray, List[Any]]
+
+
+def int_array(values: Iterable[int] = ()) -> IntArray:
+    return IntArray("q", values)
+
+
+def take(values: Ints, start: int, stop: Optional[int] = None) -> Ints:
+    """A copy of values[start:stop] of the same kind: an IntArray stays one."""
+    if isinstance(values, IntArray):
+        return IntArray("q", values[start:stop])
+    return values[start:stop]
+
+
+def compact(values: List[Any]) -> Ints:
+    """An IntArray with the items of `values` if they are all ints that fit, otherwise `values` itself."""
+    if all(type(value) is int for value in values):
+        try:
+            return IntArray("q", values)
+        except OverflowError:
+            pass
+    return values
@@ -2,60 +2,163 @@
 Disk interace abstraction for the B-Tree
 """
 
-import pickle
-from typing import List, NewType
+import threading
+import time
+from typing import Any, Dict, List, NewType, Optional, Set
+from py_btrees.codec import NodeCodec
 
 #NUM_BLOCKS = 20
-#BLOCK_SIZE = 4096
+BLOCK_SIZE = 4096
 LOGGING = False
 
 Address = NewType("Address", int)  # Address type
 
-class Disk:
-    __frozen = False
+class DiskStats:
+    """Running I/O counters of a disk. Times are in seconds."""
 
     def __init__(self):
-        self.memory: List[bytearray] = []
-        self.__frozen = True
+        self.reset()
+
+    def reset(self) -> None:
+        self.reads = 0
+        self.writes = 0
+        self.allocs = 0
+        self.frees = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "reads": self.reads,
+            "writes": self.writes,
+            "allocs": self.allocs,
+            "frees": self.frees,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "encode_time": self.encode_time,
+            "decode_time": self.decode_time,
+        }
 
-    def __setattr__(self, name: str, value) -> None:
-        if self.__frozen:
-            raise Exception("Internal error.")
-        super.__setattr__(self, name, value)
 
-    def verify(self):
-        assert self == DISK, "Error. Did you override DISK?"
+class Disk:
+    """
+    In-memory block store. DISK is the default one, but any number of Disks can
+    be created and handed to BTree, BufferPool or BulkLoader; trees on different
+    disks share nothing. Trees may also share a disk, except that the metadata
+    used by BTree.open() only records the tree whose root changed last.
+    """
+
+    def __init__(self, codec=None, block_size: Optional[int] = None):
+        """
+        `codec` turns nodes into block contents and back. It defaults to the
+        binary NodeCodec; pass codec.PickleCodec() for the original format.
+        If `block_size` is given, writing a node whose encoding is larger fails.
+        """
+        self.codec = codec if codec is not None else NodeCodec()
+        self.block_size = block_size
+        self.memory: List[bytes] = []
+        self.free_list: List[Address] = []  # released blocks, handed out again by new()
+        self.freed: Set[Address] = set()
+        self.lock = threading.Lock()  # allocation is shared by every thread using the disk
+        self.meta: Dict[str, Any] = {}
+        self.stats = DiskStats()
 
     def new(self) -> Address:
-        self.verify()
-        empty = bytearray(pickle.dumps(object()))
-        self.memory.append(empty)
+        with self.lock:
+            self.stats.allocs += 1
+            if self.free_list:
+                addr = self.free_list.pop()
+                self.freed.discard(addr)
+            else:
+                self.memory.append(b"")
+                addr = len(self.memory) - 1
         if LOGGING:
-            print(f"allocated block {len(self.memory) - 1}")
-        return len(self.memory) - 1
+            print(f"allocated block {addr}")
+        return addr
+
+    def allocate_range(self, count: int) -> Address:
+        """Allocate `count` consecutive fresh blocks and return the first address (see parallel_build)."""
+        with self.lock:
+            first = len(self.memory)
+            self.memory.extend([b""] * count)
+            self.stats.allocs += count
+        return first
+
+    def free(self, addr: Address) -> None:
+        """Release a block that is no longer used so that a later new() can reuse it."""
+        if addr >= len(self.memory):
+            raise ValueError(f"Error: Memory address {addr} has not yet been allocated. You cannot free it.")
+        with self.lock:
+            if addr in self.freed:
+                raise ValueError(f"Error: Memory address {addr} has already been freed.")
+            self.memory[addr] = b""
+            self.free_list.append(addr)
+            self.freed.add(addr)
+            self.stats.frees += 1
+        if LOGGING:
+            print(f"freed block {addr}")
 
     def read(self, addr: Address) -> "BTreeNode":
-        self.verify()
         if (addr >= len(self.memory)):
             raise ValueError(f"Error: Memory address {addr} has not yet been allocated. You cannot read from it.")
         block = self.memory[addr]
+        if not block:
+            raise ValueError(f"Error: Memory address {addr} has not been written yet. You cannot read from it.")
+        start = time.perf_counter()
+        node = self.codec.decode(block)
+        self.stats.decode_time += time.perf_counter() - start
+        self.stats.reads += 1
+        self.stats.bytes_read += len(block)
         if LOGGING:
-            print(f"read {pickle.loads(block)} at block {addr}")
-        return pickle.loads(block)
+            print(f"read block {addr} ({len(block)} bytes)")
+        return node
 
     def write(self, addr: Address, data: "BTreeNode"):
-        self.verify()
         if str(type(data)) != "<class 'py_btrees.btree_node.BTreeNode'>":
             raise ValueError(f"You can only write BTreeNodes to the disk, not {str(type(data))}.")
         if (addr >= len(self.memory)):
             raise ValueError(f"Error: Memory address {addr} has not yet been allocated. You cannot write to it.")
-        block = pickle.dumps(data)
-        #if len(block) > BLOCK_SIZE:
-            #raise Exception(f"Data blob of size {len(block)} cannot fit in the block size of {BLOCK_SIZE}")
+        start = time.perf_counter()
+        block = self.codec.encode(data)
+        self.stats.encode_time += time.perf_counter() - start
+        self.write_raw(addr, block)
+
+    def read_raw(self, addr: Address) -> bytes:
+        """The block at `addr` as stored, without decoding it (see write_raw)."""
+        if (addr >= len(self.memory)):
+            raise ValueError(f"Error: Memory address {addr} has not yet been allocated. You cannot read from it.")
+        block = self.memory[addr]
+        if not block:
+            raise ValueError(f"Error: Memory address {addr} has not been written yet. You cannot read from it.")
+        self.stats.reads += 1
+        self.stats.bytes_read += len(block)
+        return block
+
+    def write_raw(self, addr: Address, block: bytes) -> None:
+        """Store a node that was already encoded with this disk's codec."""
+        if (addr >= len(self.memory)):
+            raise ValueError(f"Error: Memory address {addr} has not yet been allocated. You cannot write to it.")
+        self.stats.writes += 1
+        self.stats.bytes_written += len(block)
+        if self.block_size is not None and len(block) > self.block_size:
+            raise ValueError(f"Node of {len(block)} bytes does not fit in a block of {self.block_size} bytes")
         if LOGGING:
-            print(f"wrote {data} to block {addr}")
-        self.memory[addr] = bytearray(block)
+            print(f"wrote block {addr} ({len(block)} bytes)")
+        self.memory[addr] = block
+
+    def save_meta(self, meta: Dict[str, Any]) -> None:
+        """
+        Remember tree-level metadata (root address, M, L). Persistent disks store
+        it in their header so that a tree can be reopened with BTree.open().
+        """
+        self.meta.clear()
+        self.meta.update(meta)
+
+    def load_meta(self) -> Dict[str, Any]:
+        return dict(self.meta)
 
 DISK = Disk()
 
-__all__ = ["DISK", "LOGGING"]
+__all__ = ["DISK", "Disk", "DiskStats", "LOGGING"]
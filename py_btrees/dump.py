@@ -0,0 +1,155 @@
+"""
+Streaming export of a tree to a file and import from it (see BTree.dump() and BTree.load()).
+"""
+
+import json
+import struct
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from py_btrees.btree_node import KT, VT
+from py_btrees.codec import decode_values, encode_values
+
+MAGIC = b"PYBTDUMP"
+VERSION = 1
+
+# magic, version, len(meta). The JSON metadata follows.
+_FILE_HEADER = struct.Struct("<8sHI")
+# number of pairs, payload length, CRC32 of the payload. A chunk of 0 pairs ends the file.
+_CHUNK = struct.Struct("<III")
+# the payload of the last chunk: the number of pairs in the file
+_TRAILER = struct.Struct("<Q")
+
+
+class TransferStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.keys = 0       # pairs written or read
+        self.chunks = 0     # chunks written or read, not counting the end marker
+        self.bytes = 0      # size of the dump file
+        self.seconds = 0.0  # wall time of the whole dump or load
+
+    def mb_per_s(self) -> float:
+        """Throughput in megabytes (10**6 bytes) of dump file per second."""
+        return self.bytes / self.seconds / 1e6 if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"keys": self.keys, "chunks": self.chunks, "bytes": self.bytes, "seconds": self.seconds,
+                "mb_per_s": self.mb_per_s()}
+
+
+def _write_chunk(file, keys: List[KT], values: List[VT], stats: TransferStats) -> None:
+    out: List[bytes] = []
+    encode_values(keys, out, ordered=True, prefix=True, delta=True)
+    encode_values(values, out)
+    payload = b"".join(out)
+    file.write(_CHUNK.pack(len(keys), len(payload), zlib.crc32(payload)))
+    file.write(payload)
+    stats.keys += len(keys)
+    stats.chunks += 1
+    stats.bytes += _CHUNK.size + len(payload)
+
+
+def dump(tree, path: str, chunk_keys: int = 4096) -> TransferStats:
+    """
+    Write every pair of `tree` to `path` in key order, `chunk_keys` pairs
+    per chunk. Only one chunk and one leaf are in memory at a time. Values
+    kept out of the leaves (overflow_threshold) are written inline.
+
+    The file holds the tree's options (M, L, search, ...), then the chunks,
+    each with its keys and values encoded like those of a node and a CRC32,
+    and a trailer with the total number of pairs.
+
+    Other writers may run meanwhile; the scan then sees each pair as range()
+    does. Dump a Snapshot of the tree for a copy of one moment.
+    """
+    if chunk_keys < 1:
+        raise ValueError(f"chunk_keys must be at least 1, not {chunk_keys}")
+    stats = TransferStats()
+    start = time.perf_counter()
+    meta = tree.tree_meta()
+    del meta["root_addr"]
+    blob = json.dumps(meta).encode("utf-8")
+    with open(path, "wb") as file:
+        file.write(_FILE_HEADER.pack(MAGIC, VERSION, len(blob)))
+        file.write(blob)
+        stats.bytes += _FILE_HEADER.size + len(blob)
+        keys: List[KT] = []
+        values: List[VT] = []
+        for key, value in tree.items():
+            keys.append(key)
+            values.append(value)
+            if len(keys) == chunk_keys:
+                _write_chunk(file, keys, values, stats)
+                keys, values = [], []
+        if keys:
+            _write_chunk(file, keys, values, stats)
+        trailer = _TRAILER.pack(stats.keys)
+        file.write(_CHUNK.pack(0, len(trailer), zlib.crc32(trailer)))
+        file.write(trailer)
+        stats.bytes += _CHUNK.size + len(trailer)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def _read_exactly(file, size: int, path: str) -> bytes:
+    data = file.read(size)
+    if len(data) < size:
+        raise ValueError(f"{path} is truncated")
+    return data
+
+
+def read_meta(file, path: str) -> Tuple[Dict[str, Any], int]:
+    """Check the header of an open dump file and return the tree options and the header size."""
+    magic, version, meta_len = _FILE_HEADER.unpack(_read_exactly(file, _FILE_HEADER.size, path))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a tree dump")
+    if version != VERSION:
+        raise ValueError(f"{path} has dump format version {version}, expected {VERSION}")
+    return json.loads(_read_exactly(file, meta_len, path).decode("utf-8")), _FILE_HEADER.size + meta_len
+
+
+def read_pairs(file, path: str, stats: TransferStats, allow_pickle: bool = False) -> Iterator[Tuple[KT, VT]]:
+    """
+    Yield the pairs of an open dump file positioned after its header, checking
+    every chunk. Pickled keys or values raise ValueError unless `allow_pickle` is set.
+    """
+    while True:
+        count, length, crc = _CHUNK.unpack(_read_exactly(file, _CHUNK.size, path))
+        payload = _read_exactly(file, length, path)
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"{path} is corrupt: checksum mismatch in chunk {stats.chunks}")
+        stats.bytes += _CHUNK.size + length
+        if not count:
+            (total,) = _TRAILER.unpack(payload)
+            if total != stats.keys:
+                raise ValueError(f"{path} is corrupt: it should hold {total} pairs, found {stats.keys}")
+            return
+        keys, offset = decode_values(payload, 0, count, allow_pickle=allow_pickle)
+        values, _ = decode_values(payload, offset, count, allow_pickle=allow_pickle)
+        stats.keys += count
+        stats.chunks += 1
+        yield from zip(keys, values)
+
+
+def load(cls, path: str, disk, concurrent: bool = False, fill_factor: float = 1.0,
+         M: Optional[int] = None, L: Optional[int] = None, stats: Optional[TransferStats] = None,
+         allow_pickle: bool = False):
+    """See BTree.load()."""
+    stats = stats if stats is not None else TransferStats()
+    stats.reset()
+    start = time.perf_counter()
+    with open(path, "rb") as file:
+        meta, stats.bytes = read_meta(file, path)
+        pairs = read_pairs(file, path, stats, allow_pickle)
+        tree = cls.from_sorted(pairs, M or meta["M"], L or meta["L"], fill_factor, disk, concurrent,
+                               meta.get("truncate_separators", True),
+                               search=meta.get("search", "bisect"),
+                               overflow_threshold=meta.get("overflow_threshold"),
+                               bloom_fp_rate=meta.get("bloom_fp_rate"),
+                               cache_size=meta.get("cache_size"),
+                               order_stats=meta.get("order_stats", False))
+    stats.seconds = time.perf_counter() - start
+    return tree
@@ -0,0 +1,113 @@
+"""
+Shortcuts that let repeated and sequential lookups skip the descent from the
+root: the finger on the last leaf a key was looked up in, and the optional
+value cache (see BTree(cache_size=...)).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+from py_btrees.disk import Address
+
+
+class Finger:
+    """
+    The leaf the last descent for a key ended in, with the separators that
+    bound its keys: it holds every key with lo < key <= hi, a missing bound
+    being open. Those bounds only change when the leaf is split, merged or
+    borrowed from, so the finger is good as long as the tree's epoch is the
+    one it was taken at. `first` and `last` are the smallest and largest key
+    the leaf held then, if it was read; they are only a hint, as the leaf may
+    have gained or lost keys since.
+    """
+    __slots__ = ("addr", "lo", "hi", "epoch", "first", "last")
+
+    def __init__(self, addr: Address, lo: Any, hi: Any, epoch: int, first: Any = None, last: Any = None):
+        self.addr = addr
+        self.lo = lo
+        self.hi = hi
+        self.epoch = epoch
+        self.first = first
+        self.last = last
+
+    def covers(self, key: Any) -> bool:
+        return (self.lo is None or self.lo < key) and (self.hi is None or key <= self.hi)
+
+    def likely_holds(self, key: Any) -> bool:
+        """Whether `key` was within the keys of the leaf, so that it is probably there."""
+        return self.first is not None and self.first <= key <= self.last
+
+
+class ValueCache:
+    """
+    At most `capacity` key -> value pairs, the least recently used evicted
+    first. Writers invalidate a key after changing it. A reader that missed
+    remembers the generation first and only fills in what it then read from
+    the leaf if nothing was invalidated in between, so a value a writer has
+    just replaced is never put back.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("A value cache needs room for at least one key")
+        self.capacity = capacity
+        self.entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Any, stats: "FastPathStats") -> Tuple[bool, Any]:
+        """(True, value) if `key` is cached, else (False, None)."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                stats.cache_hits += 1
+                return True, self.entries[key]
+            stats.cache_misses += 1
+            return False, None
+
+    def put(self, key: Any, value: Any, generation: int, stats: "FastPathStats") -> None:
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                stats.cache_evictions += 1
+
+    def invalidate(self, key: Any) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+
+class FastPathStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.finger_hits = 0      # keys found in the finger's leaf, without a descent from the root
+        self.finger_misses = 0    # keys outside it (or after a restructure), found by a descent
+        self.cache_hits = 0       # finds answered by the value cache, without reading any block
+        self.cache_misses = 0
+        self.cache_evictions = 0  # least recently used pairs dropped to make room
+
+    def descents_avoided(self) -> int:
+        return self.finger_hits + self.cache_hits
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "finger_hits": self.finger_hits,
+            "finger_misses": self.finger_misses,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_evictions": self.cache_evictions,
+        }
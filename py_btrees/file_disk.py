@@ -0,0 +1,400 @@
+"""
+A Disk whose blocks live in a single memory-mapped file.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, List
+from py_btrees.disk import Address, BLOCK_SIZE, DiskStats
+from py_btrees.codec import NodeCodec
+from py_btrees.wal import WriteAheadLog
+
+MAGIC = b"PYBTREE1"
+
+# magic, block_size, num_blocks, free_head, len(meta). The JSON metadata follows.
+_FILE_HEADER = struct.Struct("<8sIQqI")
+# next block in the chain (-1 for the last one), number of payload bytes in this block
+_BLOCK_HEADER = struct.Struct("<qI")
+
+_UNWRITTEN = 0
+_FREE = 0xFFFFFFFF
+
+
+class FileDisk:
+    """
+    Stores every node in fixed-size blocks of one file, accessed through mmap.
+
+    Block 0 holds the file header: the block size, the number of blocks in use,
+    the head of the list of free blocks and the tree metadata saved through
+    save_meta() (root address, M, L), so that BTree.open() can pick the tree
+    up again after a restart.
+
+    Every other block starts with a small header (next block, payload length).
+    A node whose encoding does not fit in one block continues in overflow
+    blocks chained through `next`; the address of a node is its first block.
+    Single-block nodes are decoded straight out of the mapping through a
+    memoryview, without copying the block.
+
+    With `wal=True` the file is only ever changed by checkpoints. The file
+    is mapped copy-on-write, every block changed by a transaction is logged
+    to `path + "-wal"` when the transaction commits (see WriteAheadLog), and
+    the changed blocks are copied into the file once the log grows past
+    `checkpoint_bytes` or the disk is closed. Opening the file again replays
+    whatever the log holds, so after a crash the tree is exactly as it was
+    after its last logged commit. A BTree on such a disk runs each insert or
+    delete as one transaction; BTree.transaction() groups several.
+    """
+
+    def __init__(self, path: str, block_size: int = BLOCK_SIZE, codec=None, wal: bool = False,
+                 group_commit: int = 1, checkpoint_bytes: int = 16 * 1024 * 1024):
+        self.path = path
+        self.codec = codec if codec is not None else NodeCodec()
+        self.meta: Dict[str, Any] = {}
+        self.meta_blob = b"{}"
+        self.stats = DiskStats()
+        self.lock = threading.RLock()  # the mapping is replaced when the file grows
+        self.log = None
+        self.checkpoint_bytes = checkpoint_bytes
+        self.before: Dict[int, bytes] = {}  # blocks changed by the open transaction, with their old contents
+        self.unflushed: set = set()         # blocks committed to the log but not yet checkpointed
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            try:
+                self._load_header()
+                if wal:
+                    self.log = WriteAheadLog(path + "-wal", group_commit)
+                    self._replay()
+            except ValueError:
+                self.file.close()
+                raise
+        else:
+            if block_size <= _FILE_HEADER.size or block_size <= _BLOCK_HEADER.size:
+                raise ValueError(f"block_size {block_size} is too small")
+            self.block_size = block_size
+            self.num_blocks = 1
+            self.free_head = -1
+            self.file.truncate(block_size * 16)
+            if wal:
+                self.log = WriteAheadLog(path + "-wal", group_commit)
+                self.log.reset()
+        self.map = self._map()
+        if not exists:
+            self._store_header()
+            self._store_meta()
+            if wal:
+                # The empty file goes straight to disk so that replay always finds a valid header
+                self.unflushed.update(self.before)
+                self.before = {}
+                self.checkpoint()
+
+    @property
+    def payload_size(self) -> int:
+        return self.block_size - _BLOCK_HEADER.size
+
+    def new(self) -> Address:
+        with self.lock:
+            addr = self._allocate_block()
+            self._set_block_header(addr, -1, _UNWRITTEN)
+            self.stats.allocs += 1
+            return addr
+
+    def read(self, addr: Address) -> "BTreeNode":
+        with self.lock:
+            self._check_addr(addr)
+            nxt, length = self._block_header(addr)
+            if length == _UNWRITTEN:
+                raise ValueError(f"Error: Memory address {addr} has not been written yet. You cannot read from it.")
+            if length == _FREE:
+                raise ValueError(f"Error: Memory address {addr} has been freed. You cannot read from it.")
+            start = addr * self.block_size + _BLOCK_HEADER.size
+            self.stats.reads += 1
+            if nxt == -1:
+                self.stats.bytes_read += length
+                began = time.perf_counter()
+                with memoryview(self.map) as view, view[start:start + length] as block:
+                    node = self.codec.decode(block)
+                self.stats.decode_time += time.perf_counter() - began
+                return node
+            parts = [self.map[start:start + length]]
+            while nxt != -1:
+                block = nxt
+                nxt, length = self._block_header(block)
+                start = block * self.block_size + _BLOCK_HEADER.size
+                parts.append(self.map[start:start + length])
+            payload = b"".join(parts)
+            self.stats.bytes_read += len(payload)
+            began = time.perf_counter()
+            node = self.codec.decode(payload)
+            self.stats.decode_time += time.perf_counter() - began
+            return node
+
+    def read_raw(self, addr: Address) -> bytes:
+        """The payload stored at `addr` (all of its chained blocks), without decoding it."""
+        with self.lock:
+            self._check_addr(addr)
+            length = self._block_header(addr)[1]
+            if length == _UNWRITTEN:
+                raise ValueError(f"Error: Memory address {addr} has not been written yet. You cannot read from it.")
+            if length == _FREE:
+                raise ValueError(f"Error: Memory address {addr} has been freed. You cannot read from it.")
+            parts = []
+            for block in self._chain(addr):
+                start = block * self.block_size + _BLOCK_HEADER.size
+                parts.append(self.map[start:start + self._block_header(block)[1]])
+            payload = b"".join(parts)
+            self.stats.reads += 1
+            self.stats.bytes_read += len(payload)
+            return payload
+
+    def allocate_range(self, count: int) -> Address:
+        """Allocate `count` consecutive fresh blocks at the end of the file and return the first one."""
+        with self.lock:
+            first = self.num_blocks
+            self.num_blocks += count
+            size = len(self.map)
+            while self.num_blocks * self.block_size > size:
+                size *= 2
+            if size > len(self.map):
+                self._grow(size)
+            for block in range(first, self.num_blocks):
+                self._set_block_header(block, -1, _UNWRITTEN)
+            self._store_header()
+            self.stats.allocs += count
+            return first
+
+    def write(self, addr: Address, data: "BTreeNode") -> None:
+        if str(type(data)) != "<class 'py_btrees.btree_node.BTreeNode'>":
+            raise ValueError(f"You can only write BTreeNodes to the disk, not {str(type(data))}.")
+        began = time.perf_counter()
+        payload = self.codec.encode(data)
+        with self.lock:
+            self.stats.encode_time += time.perf_counter() - began
+            self.write_raw(addr, payload)
+
+    def write_raw(self, addr: Address, payload: bytes) -> None:
+        """Store a node that was already encoded with this disk's codec."""
+        with self.lock:
+            self._check_addr(addr)
+            if self._block_header(addr)[1] == _FREE:
+                raise ValueError(f"Error: Memory address {addr} has been freed. You cannot write to it.")
+            self.stats.writes += 1
+            self.stats.bytes_written += len(payload)
+            chunk = self.payload_size
+            chunks = [payload[i:i + chunk] for i in range(0, len(payload), chunk)] or [b""]
+
+            # Reuse the blocks already chained to this address, then allocate or release the difference
+            chain = self._chain(addr)
+            while len(chain) < len(chunks):
+                chain.append(self._allocate_block())
+            for block in chain[len(chunks):]:
+                self._release_block(block)
+            for i, part in enumerate(chunks):
+                nxt = chain[i + 1] if i + 1 < len(chunks) else -1
+                self._write_block(chain[i], nxt, part)
+
+    def free(self, addr: Address) -> None:
+        """Release the blocks of a node that is no longer used; later allocations reuse them."""
+        with self.lock:
+            self._check_addr(addr)
+            if self._block_header(addr)[1] == _FREE:
+                raise ValueError(f"Error: Memory address {addr} has already been freed.")
+            for block in self._chain(addr):
+                self._release_block(block)
+            self.stats.frees += 1
+
+    def save_meta(self, meta: Dict[str, Any]) -> None:
+        with self.lock:
+            blob = json.dumps(meta).encode("utf-8")
+            if _FILE_HEADER.size + len(blob) > self.block_size:
+                raise ValueError("Tree metadata does not fit in the header block")
+            self.meta = dict(meta)
+            self.meta_blob = blob
+            self._store_header()
+            self._store_meta()
+
+    def load_meta(self) -> Dict[str, Any]:
+        return dict(self.meta)
+
+    @property
+    def transactional(self) -> bool:
+        return self.log is not None
+
+    def commit(self) -> None:
+        """Log the blocks changed since the last commit as one transaction."""
+        with self.lock:
+            if self.log is None:
+                return
+            if self.before:
+                self.log.append({block: self._image(block) for block in sorted(self.before)})
+                self.unflushed.update(self.before)
+                self.before = {}
+            if self.log.size >= self.checkpoint_bytes:
+                self.checkpoint()
+
+    def abort(self) -> None:
+        """Undo every change made since the last commit."""
+        with self.lock:
+            for block, image in self.before.items():
+                start = block * self.block_size
+                self.map[start:start + self.block_size] = image
+            self.before = {}
+            self._parse_header(self.map)
+
+    def checkpoint(self) -> None:
+        """Copy every committed block into the file, make it durable and empty the log."""
+        with self.lock:
+            if self.before:
+                raise ValueError("Cannot checkpoint in the middle of a transaction")
+            self.log.sync()
+            for block in sorted(self.unflushed):
+                start = block * self.block_size
+                self.file.seek(start)
+                self.file.write(self.map[start:start + self.block_size])
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unflushed.clear()
+            self.log.reset()
+
+    def sync(self) -> None:
+        """Make everything committed so far durable."""
+        with self.lock:
+            if self.log is not None:
+                self.log.sync()
+            else:
+                self.map.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.map.closed:
+                return
+            if self.log is not None:
+                # Changes that were never committed are dropped, as they would be by a crash
+                self.abort()
+                self.checkpoint()
+                self.log.close()
+            else:
+                self.sync()
+            self.map.close()
+            self.file.close()
+
+    def __enter__(self) -> "FileDisk":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _check_addr(self, addr: Address) -> None:
+        if not 0 < addr < self.num_blocks:
+            raise ValueError(f"Error: Memory address {addr} has not yet been allocated.")
+
+    def _block_header(self, block: int):
+        return _BLOCK_HEADER.unpack_from(self.map, block * self.block_size)
+
+    def _touch(self, block: int) -> None:
+        """Remember the contents of a block before the open transaction first changes it."""
+        if self.log is not None and block not in self.before:
+            start = block * self.block_size
+            self.before[block] = self.map[start:start + self.block_size]
+
+    def _image(self, block: int) -> bytes:
+        start = block * self.block_size
+        return self.map[start:start + self.block_size].rstrip(b"\0")
+
+    def _set_block_header(self, block: int, nxt: int, length: int) -> None:
+        self._touch(block)
+        _BLOCK_HEADER.pack_into(self.map, block * self.block_size, nxt, length)
+
+    def _write_block(self, block: int, nxt: int, payload: bytes) -> None:
+        self._touch(block)
+        start = block * self.block_size
+        _BLOCK_HEADER.pack_into(self.map, start, nxt, len(payload))
+        start += _BLOCK_HEADER.size
+        self.map[start:start + len(payload)] = payload
+
+    def _chain(self, addr: Address) -> List[int]:
+        chain = [addr]
+        nxt, length = self._block_header(addr)
+        while nxt != -1 and length != _UNWRITTEN:
+            chain.append(nxt)
+            nxt, length = self._block_header(nxt)
+        return chain
+
+    def _allocate_block(self) -> int:
+        if self.free_head != -1:
+            block = self.free_head
+            self.free_head = self._block_header(block)[0]
+        else:
+            block = self.num_blocks
+            self.num_blocks += 1
+            if self.num_blocks * self.block_size > len(self.map):
+                self._grow(2 * len(self.map))
+        self._store_header()
+        return block
+
+    def _release_block(self, block: int) -> None:
+        self._set_block_header(block, self.free_head, _FREE)
+        self.free_head = block
+        self._store_header()
+
+    def _map(self) -> mmap.mmap:
+        access = mmap.ACCESS_COPY if self.log is not None else mmap.ACCESS_WRITE
+        return mmap.mmap(self.file.fileno(), 0, access=access)
+
+    def _grow(self, size: int) -> None:
+        # A copy-on-write mapping loses its private changes when it is remapped, so carry them over
+        changed = {}
+        if self.log is not None:
+            for block in self.unflushed.union(self.before):
+                start = block * self.block_size
+                changed[start] = self.map[start:start + self.block_size]
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(size)
+        self.map = self._map()
+        for start, image in changed.items():
+            self.map[start:start + len(image)] = image
+
+    def _store_header(self) -> None:
+        self._touch(0)
+        _FILE_HEADER.pack_into(self.map, 0, MAGIC, self.block_size, self.num_blocks, self.free_head,
+                               len(self.meta_blob))
+
+    def _store_meta(self) -> None:
+        self._touch(0)
+        self.map[_FILE_HEADER.size:_FILE_HEADER.size + len(self.meta_blob)] = self.meta_blob
+
+    def _load_header(self) -> None:
+        self.file.seek(0)
+        header = self.file.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a B-Tree file")
+        self.file.seek(0)
+        self._parse_header(self.file.read(_FILE_HEADER.size + _FILE_HEADER.unpack(header)[4]))
+
+    def _parse_header(self, buf) -> None:
+        magic, self.block_size, self.num_blocks, self.free_head, meta_len = _FILE_HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a B-Tree file")
+        self.meta_blob = bytes(buf[_FILE_HEADER.size:_FILE_HEADER.size + meta_len])
+        self.meta = json.loads(self.meta_blob.decode("utf-8"))
+
+    def _replay(self) -> None:
+        """Apply the transactions left in the log by a crash to the file, then empty the log."""
+        replayed = False
+        for blocks in self.log.records():
+            for block, image in blocks.items():
+                self.file.seek(block * self.block_size)
+                self.file.write(image.ljust(self.block_size, b"\0"))
+            replayed = True
+        if replayed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._load_header()
+        if os.path.getsize(self.path) < self.num_blocks * self.block_size:
+            self.file.truncate(self.num_blocks * self.block_size)
+        self.log.reset()
@@ -0,0 +1,148 @@
+"""
+Per-operation accounting of the disk I/O that a BTree performs.
+
+Every public BTree operation (find, insert, range, ...) is wrapped by
+`instrumented`. When at least one listener is registered on the tree, the
+wrapper takes a snapshot of the storage counters before and after the call
+and passes the difference to the listeners as an OpRecord. With no listeners
+the wrappers only cost one attribute check.
+"""
+
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, List
+
+
+class OpRecord:
+    """What one call of a public BTree method cost."""
+    __slots__ = ("op", "elapsed", "counters")
+
+    def __init__(self, op: str, elapsed: float, counters: Dict[str, float]):
+        self.op = op
+        self.elapsed = elapsed
+        self.counters = counters
+
+    def __repr__(self) -> str:
+        return f"OpRecord({self.op!r}, elapsed={self.elapsed:.6f}, counters={self.counters})"
+
+
+def storage_counters(disk) -> Dict[str, float]:
+    """
+    Collect the counters of a storage stack: a BufferPool contributes its hit/miss
+    counters, the disk under it its read/write counters, and so on down the chain.
+    """
+    counters: Dict[str, float] = {}
+    while disk is not None:
+        stats = getattr(disk, "stats", None)
+        if stats is not None:
+            for name, value in stats.as_dict().items():
+                counters.setdefault(name, value)
+        disk = getattr(disk, "disk", None)
+    return counters
+
+
+def tree_counters(tree) -> Dict[str, float]:
+    """
+    storage_counters of the tree's disk, plus the counters of its Bloom
+    filters if it has them and of its finger and value cache.
+    """
+    counters = storage_counters(tree.disk)
+    if getattr(tree, "bloom", None) is not None:
+        counters.update(tree.bloom.stats.as_dict())
+    if getattr(tree, "fast_stats", None) is not None:
+        counters.update(tree.fast_stats.as_dict())
+    return counters
+
+
+def _delta(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, float]:
+    return {name: value - before.get(name, 0) for name, value in after.items()}
+
+
+def instrumented(fn: Callable) -> Callable:
+    """
+    Report each call of a BTree method to the tree's listeners. Calls made from
+    inside another instrumented call are attributed to the outer one. For
+    generators (range scans) the record covers the whole iteration, from the
+    first item until the generator is exhausted or closed.
+    """
+    op = fn.__name__
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(tree, *args, **kwargs):
+            if not tree.listeners or tree.op_depth:
+                yield from fn(tree, *args, **kwargs)
+                return
+            before, start = tree_counters(tree), time.perf_counter()
+            try:
+                yield from fn(tree, *args, **kwargs)
+            finally:
+                tree.notify(OpRecord(op, time.perf_counter() - start, _delta(before, tree_counters(tree))))
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(tree, *args, **kwargs):
+        if not tree.listeners or tree.op_depth:
+            return fn(tree, *args, **kwargs)
+        before, start = tree_counters(tree), time.perf_counter()
+        tree.op_depth += 1
+        try:
+            return fn(tree, *args, **kwargs)
+        finally:
+            tree.op_depth -= 1
+            tree.notify(OpRecord(op, time.perf_counter() - start, _delta(before, tree_counters(tree))))
+    return wrapper
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class OpRecorder:
+    """
+    Listener that keeps every OpRecord it receives and summarizes them per
+    operation. Use it through BTree.record_ops():
+
+        with tree.record_ops() as recorder:
+            tree.insert(1, "a")
+        recorder.summary()["insert"]["writes"]["p50"]
+    """
+
+    def __init__(self):
+        self.records: List[OpRecord] = []
+
+    def __call__(self, record: OpRecord) -> None:
+        self.records.append(record)
+
+    def histogram(self, op: str, counter: str) -> Dict[float, int]:
+        """How many calls of `op` had each value of `counter` ("elapsed" for time)."""
+        counts: Dict[float, int] = {}
+        for record in self.records:
+            if record.op == op:
+                value = record.elapsed if counter == "elapsed" else record.counters.get(counter, 0)
+                counts[value] = counts.get(value, 0) + 1
+        return dict(sorted(counts.items()))
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per operation: call count and mean/p50/p90/p99/max of elapsed time and of every counter."""
+        by_op: Dict[str, List[OpRecord]] = {}
+        for record in self.records:
+            by_op.setdefault(record.op, []).append(record)
+        summary: Dict[str, Dict[str, Any]] = {}
+        for op, records in by_op.items():
+            series = {"elapsed": [r.elapsed for r in records]}
+            for name in records[0].counters:
+                series[name] = [r.counters.get(name, 0) for r in records]
+            entry: Dict[str, Any] = {"count": len(records)}
+            for name, values in series.items():
+                ordered = sorted(values)
+                entry[name] = {
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": _percentile(ordered, 0.50),
+                    "p90": _percentile(ordered, 0.90),
+                    "p99": _percentile(ordered, 0.99),
+                    "max": ordered[-1],
+                }
+            summary[op] = entry
+        return summary
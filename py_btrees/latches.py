@@ -0,0 +1,86 @@
+"""
+Per-node read/write latches, so that readers can run in parallel with a writer.
+"""
+
+import threading
+from typing import Any, Dict, Hashable
+
+
+class RWLatch:
+    """
+    Shared/exclusive latch. Any number of threads can hold it shared, or one
+    thread exclusively. A waiting writer keeps new readers out, so a steady
+    stream of readers cannot starve it.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    def acquire_shared(self) -> None:
+        with self.cond:
+            while self.writer or self.waiting_writers:
+                self.cond.wait()
+            self.readers += 1
+
+    def release_shared(self) -> None:
+        with self.cond:
+            self.readers -= 1
+            if self.readers == 0:
+                self.cond.notify_all()
+
+    def acquire_exclusive(self) -> None:
+        with self.cond:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.cond.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+
+    def release_exclusive(self) -> None:
+        with self.cond:
+            self.writer = False
+            self.cond.notify_all()
+
+
+class NullLatch:
+    """Stands in for an RWLatch when a tree is only used from one thread."""
+
+    def acquire_shared(self) -> None:
+        pass
+
+    def release_shared(self) -> None:
+        pass
+
+    def acquire_exclusive(self) -> None:
+        pass
+
+    def release_exclusive(self) -> None:
+        pass
+
+
+NULL_LATCH = NullLatch()
+
+
+class LatchTable:
+    """One RWLatch per node address, created on first use."""
+
+    def __init__(self):
+        self.latches: Dict[Hashable, RWLatch] = {}
+        self.lock = threading.Lock()
+
+    def get(self, addr: Hashable) -> RWLatch:
+        latch = self.latches.get(addr)
+        if latch is None:
+            with self.lock:
+                latch = self.latches.setdefault(addr, RWLatch())
+        return latch
+
+
+class NullLatchTable:
+    """Latch table of a tree that is not shared between threads: every latch is a no-op."""
+
+    def get(self, addr: Hashable) -> Any:
+        return NULL_LATCH
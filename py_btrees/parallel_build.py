@@ -0,0 +1,143 @@
+"""
+Bulk loading spread over several processes (see BTree.from_sorted(workers=...)).
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from py_btrees.disk import Address
+from py_btrees.btree_node import BTreeNode, KT, VT
+from py_btrees.bulk_load import BulkLoader
+
+
+class _RangeDisk:
+    """
+    Stand-in disk of a worker process: hands out the addresses of the block
+    range reserved for its partition and keeps the encoded nodes, which the
+    parent process copies to the real disk.
+    """
+
+    def __init__(self, first: Address, count: int, codec):
+        self.next = first
+        self.end = first + count
+        self.codec = codec
+        self.blocks: Dict[Address, bytes] = {}
+        self.freed: List[Address] = []
+        self.last_leaf: Optional[Address] = None  # leaves are written in key order
+
+    def new(self) -> Address:
+        if self.next == self.end:
+            raise RuntimeError("Partition needs more blocks than were reserved for it")
+        self.next += 1
+        return self.next - 1
+
+    def write(self, addr: Address, node: BTreeNode) -> None:
+        self.blocks[addr] = self.codec.encode(node)
+        if node.is_leaf:
+            self.last_leaf = addr
+
+    def free(self, addr: Address) -> None:
+        self.blocks.pop(addr, None)
+        self.freed.append(addr)
+
+    def unused(self) -> List[Address]:
+        return self.freed + list(range(self.next, self.end))
+
+
+class _Partition:
+    """What a worker sends back: its encoded nodes and the roots of its subtrees on the top level."""
+
+    def __init__(self, blocks: Dict[Address, bytes], unused: List[Address],
+                 tops: List[Tuple[BTreeNode, Any, Any]], first_leaf: Address, last_leaf: Address):
+        self.blocks = blocks
+        self.unused = unused
+        self.tops = tops
+        self.first_leaf = first_leaf
+        self.last_leaf = last_leaf
+
+
+def _build_partition(items: Sequence[Tuple[KT, VT]], M: int, L: int, fill_factor: float, codec,
+                     truncate_separators: bool, first: Address, count: int, top: int,
+                     order_stats: bool) -> _Partition:
+    disk = _RangeDisk(first, count, codec)
+    loader = BulkLoader(M, L, fill_factor, disk, truncate_separators, top, order_stats)
+    loader.add_all(items)
+    groups = loader.finish_level()
+    # The first leaf is the first address handed out; only the last one can be merged away
+    return _Partition(disk.blocks, disk.unused(), [(g.node, g.lo, g.hi) for g in groups], first, disk.last_leaf)
+
+
+def level_sizes(n: int, loader: BulkLoader) -> List[int]:
+    """
+    Upper bounds on the number of nodes the loader creates on each level for
+    `n` keys, from the leaves up to a single root.
+    """
+    sizes = [math.ceil(n / loader.leaf_cap)]
+    while sizes[-1] > 1:
+        sizes.append(math.ceil(sizes[-1] / loader.internal_cap))
+    return sizes
+
+
+def _lower_level_sizes(n: int, loader: BulkLoader) -> List[int]:
+    # Rebalancing the tail of a level can merge its last two nodes, so a level may have one node less
+    sizes = [max(1, math.ceil(n / loader.leaf_cap) - 1)]
+    while sizes[-1] > 1:
+        sizes.append(max(1, math.ceil(sizes[-1] / loader.internal_cap) - 1))
+    return sizes
+
+
+def build_parallel(items: Sequence[Tuple[KT, VT]], M: int, L: int, fill_factor: float, disk,
+                   truncate_separators: bool, workers: int, partitions: Optional[int] = None,
+                   order_stats: bool = False) -> Optional[Address]:
+    """
+    Build the tree for `items` (strictly ascending) on `disk` and return the
+    root address, or None if the input is too small to be worth splitting.
+
+    The input is cut into `partitions` (default: `workers`) runs of
+    consecutive keys. Each run gets a block range of its own on `disk`
+    (allocate_range) and a worker process bulk loads it into that range, up
+    to the highest level on which every run still has two nodes or more.
+    The parent copies the encoded nodes to the disk (write_raw), links the
+    leaves at the seams between runs and builds the levels above from the
+    subtree roots, which are the only nodes whose parent it has to set.
+    `order_stats` is as for BulkLoader.
+    """
+    partitions = partitions or workers
+    probe = BulkLoader(M, L, fill_factor, disk, truncate_separators)
+    n = len(items)
+    bounds = [n * i // partitions for i in range(partitions + 1)]
+    smallest = min(hi - lo for lo, hi in zip(bounds, bounds[1:]))
+    top = max((depth for depth, size in enumerate(_lower_level_sizes(smallest, probe)) if size >= 2), default=0)
+    if top < 1:
+        return None
+    for cut in bounds[1:-1]:
+        if not items[cut - 1][0] < items[cut][0]:
+            raise ValueError(f"Keys must be strictly ascending, got {items[cut][0]!r} after {items[cut - 1][0]!r}")
+
+    jobs = []
+    for lo, hi in zip(bounds, bounds[1:]):
+        count = sum(level_sizes(hi - lo, probe)[:top + 1])
+        jobs.append((items[lo:hi], M, L, fill_factor, disk.codec, truncate_separators,
+                     disk.allocate_range(count), count, top, order_stats))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_build_partition, *zip(*jobs)))
+    else:
+        results = [_build_partition(*job) for job in jobs]
+
+    for result in results:
+        for addr, block in result.blocks.items():
+            disk.write_raw(addr, block)
+        for addr in result.unused:
+            disk.free(addr)
+    for left, right in zip(results, results[1:]):
+        last, first = disk.read(left.last_leaf), disk.read(right.first_leaf)
+        last.next_addr, first.prev_addr = first.my_addr, last.my_addr
+        disk.write(last.my_addr, last)
+        disk.write(first.my_addr, first)
+
+    loader = BulkLoader(M, L, fill_factor, disk, truncate_separators, order_stats=order_stats)
+    for result in results:
+        for node, lo, hi in result.tops:
+            loader.add_subtree(node, top, lo, hi)
+    return loader.finish()
@@ -0,0 +1,219 @@
+"""
+Choosing M and L from the size of a block and of the keys and values stored
+(see BTree.for_block_size() and BTree.advise()).
+"""
+
+import random
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from py_btrees.disk import BLOCK_SIZE
+from py_btrees.btree_node import BTreeNode
+from py_btrees.codec import NodeCodec, ValueRef, encode_value
+from py_btrees.compact import compact
+
+# Addresses and subtree counts are assumed to stay below this when no `max_keys` is given
+DEFAULT_MAX_KEYS = 2 ** 31 - 1
+
+
+def block_budget(disk) -> int:
+    """
+    The most bytes a node may encode to on `disk` and still fit one block:
+    the payload of a FileDisk block, the block_size of a Disk if it has one,
+    and BLOCK_SIZE otherwise. Wrappers (BufferPool, VersionedDisk) are looked through.
+    """
+    while True:
+        payload = getattr(disk, "payload_size", None)
+        if payload is not None:
+            return payload
+        if getattr(disk, "block_size", None) is not None:
+            return disk.block_size
+        if not hasattr(disk, "disk"):
+            return BLOCK_SIZE
+        disk = disk.disk
+
+
+def node_codec(disk):
+    """The codec `disk` encodes nodes with, looking through wrappers like block_budget(); NodeCodec if none."""
+    while True:
+        codec = getattr(disk, "codec", None)
+        if codec is not None:
+            return codec
+        if not hasattr(disk, "disk"):
+            return NodeCodec()
+        disk = disk.disk
+
+
+def _leaf_size(codec, keys: List[Any], values: List[Any]) -> int:
+    node = BTreeNode(0, 0, 0, True)
+    node.keys, node.data = compact(keys), values
+    return len(codec.encode(node))
+
+
+def _internal_size(codec, keys: List[Any], max_keys: int) -> int:
+    node = BTreeNode(0, 0, 0, False)
+    node.keys = compact(keys)
+    node.children_addrs = compact([max_keys] * (len(keys) + 1))
+    node.counts = compact([max_keys] * (len(keys) + 1))
+    return len(codec.encode(node))
+
+
+def _capacity(block_size: int, base: int, full: int, singles: List[int]) -> int:
+    """
+    How many entries fit in `block_size` bytes, for a node that takes `base`
+    bytes empty, `full` bytes holding every sample entry, and `singles[i]`
+    bytes holding only the i-th. Entries cost the sample average, plus for a
+    node of n entries the excess of the n largest ones, so a node of
+    unusually large entries still fits.
+    """
+    n = len(singles)
+    mean = (full - base) / n
+    if mean <= 0:
+        return n
+    avg = sum(singles) / n
+    excess = list(accumulate(sorted((single - avg for single in singles), reverse=True)))
+    peak = max(excess)
+    count = int((block_size - base) / mean)
+    while count > 0 and base + count * mean + (excess[count - 1] if count <= n else peak) > block_size:
+        count -= 1
+    return count
+
+
+def fit_node_sizes(sample: Sequence[Tuple[Any, Any]], block_size: int = BLOCK_SIZE, codec=None,
+                   overflow_threshold: Optional[int] = None, max_keys: int = DEFAULT_MAX_KEYS) -> Tuple[int, int]:
+    """
+    The largest M and L for which nodes holding keys and values like those
+    of `sample` encode to at most `block_size` bytes with `codec`.
+
+    Nodes are estimated from the encoding of the sample (sorted by key) as a
+    fixed part plus the average bytes per entry, with room for the largest
+    entries of the sample to end up in the same node (see _capacity). Keys
+    spread over the whole sample are wider apart than neighbours in one
+    node, which only overestimates the size of delta or prefix encoded keys.
+    The sample has to be like the real data in its range too: ints are
+    stored as wide as the range of a node needs, so a sample of small ints
+    gives nodes too large for bigger ones. Child addresses and subtree
+    counts are taken to be as large as `max_keys`.
+    With `overflow_threshold`, values that would be kept out of the leaves
+    are counted as the reference stored instead. Raises ValueError if not
+    even a node with the minimum M = 3 or L = 1 fits.
+    """
+    codec = codec if codec is not None else NodeCodec()
+    entries = sorted(dict(sample).items(), key=lambda entry: entry[0])
+    if not entries:
+        raise ValueError("Need at least one (key, value) pair to size nodes for")
+    keys = [key for key, _ in entries]
+    values = [value for _, value in entries]
+    if overflow_threshold is not None:
+        values = [ValueRef(max_keys) if len(encode_value(value)) > overflow_threshold else value
+                  for value in values]
+
+    L = _capacity(block_size, _leaf_size(codec, [], []), _leaf_size(codec, keys, values),
+                  [_leaf_size(codec, [key], [value]) for key, value in zip(keys, values)])
+    M = _capacity(block_size, _internal_size(codec, [], max_keys), _internal_size(codec, keys, max_keys),
+                  [_internal_size(codec, [key], max_keys) for key in keys]) + 1
+    if L < 1:
+        hint = "" if overflow_threshold is not None else "; an overflow_threshold keeps large values out of the leaves"
+        raise ValueError(f"Not even one of the sample pairs fits in a block of {block_size} bytes" + hint)
+    if M < 3:
+        raise ValueError(f"Internal nodes with keys like the sample's need blocks larger than {block_size} bytes")
+    return M, L
+
+
+class SizingReport:
+    """What BTree.advise() found: averages over the nodes it sampled, per kind of node."""
+
+    def __init__(self, M: int, L: int, block_size: int, height: int):
+        self.M = M
+        self.L = L
+        self.block_size = block_size
+        self.height = height                      # levels, counting the leaves
+        self.leaves = 0                           # leaves sampled
+        self.internals = 0                        # internal nodes sampled
+        self.leaf_bytes = 0.0                     # average encoded size of a leaf
+        self.internal_bytes = 0.0                 # average encoded size of an internal node
+        self.leaf_fill = 0.0                      # average keys per leaf / L
+        self.internal_fill = 0.0                  # average children per internal node / M
+        self.oversized = 0                        # sampled nodes larger than block_size
+        self.recommended_M: Optional[int] = None  # from fit_node_sizes() over the sampled pairs
+        self.recommended_L: Optional[int] = None
+
+    def block_use(self) -> Tuple[float, float]:
+        """The average share of a block that a leaf and an internal node take up."""
+        return self.leaf_bytes / self.block_size, self.internal_bytes / self.block_size
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "M": self.M, "L": self.L, "block_size": self.block_size, "height": self.height,
+            "leaves": self.leaves, "internals": self.internals,
+            "leaf_bytes": self.leaf_bytes, "internal_bytes": self.internal_bytes,
+            "leaf_fill": self.leaf_fill, "internal_fill": self.internal_fill,
+            "leaf_block_use": self.block_use()[0], "internal_block_use": self.block_use()[1],
+            "oversized": self.oversized,
+            "recommended_M": self.recommended_M, "recommended_L": self.recommended_L,
+        }
+
+
+def advise(tree, block_size: Optional[int] = None, samples: int = 64, seed: Optional[int] = None) -> SizingReport:
+    """See BTree.advise()."""
+    block_size = block_size if block_size is not None else block_budget(tree.disk)
+    codec = node_codec(tree.disk)
+    rng = random.Random(seed)
+    seen = set()
+    leaf_sizes: List[int] = []
+    leaf_keys: List[int] = []
+    internal_sizes: List[int] = []
+    internal_children: List[int] = []
+    pairs: Dict[Any, Any] = {}
+    height = 1
+    oversized = 0
+    for _ in range(samples):
+        node, latch = tree.latch_root()
+        try:
+            total = node.size()
+            k = rng.randrange(total) if total else 0
+            depth = 1
+            while True:
+                if node.my_addr not in seen:
+                    seen.add(node.my_addr)
+                    size = len(codec.encode(node))
+                    oversized += size > block_size
+                    if node.is_leaf:
+                        leaf_sizes.append(size)
+                        leaf_keys.append(len(node.keys))
+                        pairs.update(zip(node.keys, map(tree.load_value, node.data)))
+                    else:
+                        internal_sizes.append(size)
+                        internal_children.append(len(node.children_addrs))
+                if node.is_leaf:
+                    break
+                if len(node.counts):
+                    # Follow the subtree counts to the k-th key, so leaves are picked in proportion to their keys
+                    idx = 0
+                    while idx < len(node.counts) - 1 and k >= node.counts[idx]:
+                        k -= node.counts[idx]
+                        idx += 1
+                else:
+                    idx = rng.randrange(len(node.children_addrs))
+                node, latch = tree.latch_child(node.children_addrs[idx], latch)
+                depth += 1
+            height = max(height, depth)
+        finally:
+            latch.release_shared()
+
+    report = SizingReport(tree.M, tree.L, block_size, height)
+    report.leaves = len(leaf_sizes)
+    report.internals = len(internal_sizes)
+    report.oversized = oversized
+    if leaf_sizes:
+        report.leaf_bytes = sum(leaf_sizes) / len(leaf_sizes)
+        report.leaf_fill = sum(leaf_keys) / len(leaf_keys) / tree.L
+    if internal_sizes:
+        report.internal_bytes = sum(internal_sizes) / len(internal_sizes)
+        report.internal_fill = sum(internal_children) / len(internal_children) / tree.M
+    if pairs:
+        try:
+            report.recommended_M, report.recommended_L = fit_node_sizes(
+                list(pairs.items()), block_size, codec, tree.overflow_threshold)
+        except ValueError:
+            pass  # nothing fits that block; the recommendations stay None
+    return report
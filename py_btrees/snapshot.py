@@ -0,0 +1,224 @@
+"""
+Consistent read-only views of a tree that is still being changed (see BTree.snapshot()).
+"""
+
+import threading
+import weakref
+from typing import Any, Dict, List
+from py_btrees.disk import Address
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode
+
+
+class VersionStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.copies = 0      # old versions copied aside before a block was overwritten
+        self.retained = 0    # freed blocks kept alive because a snapshot still reads them
+        self.reclaimed = 0   # old versions freed when the last snapshot using them went away
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"copies": self.copies, "retained": self.retained, "reclaimed": self.reclaimed}
+
+
+class VersionedDisk:
+    """
+    Storage wrapper that keeps old versions of blocks for snapshots. It goes
+    directly over a Disk or a non-WAL FileDisk (anything with read_raw and
+    write_raw); a BufferPool may be put on top of it.
+
+    Nodes keep the addresses of their parent and of their neighbouring
+    leaves, so a changed node cannot move to a new address without changing
+    its children and neighbours too. The live tree therefore keeps writing
+    in place. Instead, the first time a block is overwritten or freed while
+    a snapshot still sees its old contents, those contents are copied to a
+    fresh block (a freed block is simply not released) and the snapshot
+    reads that address from then on. One copy serves every snapshot that
+    needs the same version. It is freed for reuse once the last of those
+    snapshots is released. Without snapshots every call goes straight
+    through.
+    """
+
+    def __init__(self, disk):
+        if getattr(disk, "transactional", False):
+            raise ValueError("VersionedDisk does not support transactional (write-ahead logged) disks")
+        self.disk = disk
+        self.lock = threading.RLock()
+        self.views: List["SnapshotView"] = []
+        self.seq = 0
+        # Blocks allocated while snapshots exist, with the sequence number of the next snapshot:
+        # snapshots taken before that never read them
+        self.born: Dict[Address, int] = {}
+        self.refs: Dict[Address, int] = {}  # old versions and how many snapshots read each
+        self.stats = VersionStats()
+
+    @property
+    def codec(self):
+        return self.disk.codec
+
+    def new(self) -> Address:
+        with self.lock:
+            addr = self.disk.new()
+            if self.views:
+                self.born[addr] = self.seq
+            return addr
+
+    def allocate_range(self, count: int) -> Address:
+        with self.lock:
+            first = self.disk.allocate_range(count)
+            if self.views:
+                self.born.update(dict.fromkeys(range(first, first + count), self.seq))
+            return first
+
+    def read(self, addr: Address) -> BTreeNode:
+        return self.disk.read(addr)
+
+    def read_raw(self, addr: Address) -> bytes:
+        return self.disk.read_raw(addr)
+
+    def write(self, addr: Address, node: BTreeNode) -> None:
+        with self.lock:
+            self._preserve(addr, copy=True)
+            self.disk.write(addr, node)
+
+    def write_raw(self, addr: Address, block: bytes) -> None:
+        with self.lock:
+            self._preserve(addr, copy=True)
+            self.disk.write_raw(addr, block)
+
+    def free(self, addr: Address) -> None:
+        with self.lock:
+            if not self._preserve(addr, copy=False):
+                self.disk.free(addr)
+            self.born.pop(addr, None)
+
+    def save_meta(self, meta: Dict[str, Any]) -> None:
+        self.disk.save_meta(meta)
+
+    def load_meta(self) -> Dict[str, Any]:
+        return self.disk.load_meta()
+
+    def snapshot(self) -> "SnapshotView":
+        """Start a view of every block as it is now. The caller makes sure no write is in progress."""
+        with self.lock:
+            view = SnapshotView(self, self.seq)
+            self.seq += 1
+            self.views.append(view)
+            return view
+
+    def release(self, view: "SnapshotView") -> None:
+        """Forget a view and free the old versions that no other view reads."""
+        with self.lock:
+            if view not in self.views:
+                return
+            self.views.remove(view)
+            for kept in view.versions.values():
+                self.refs[kept] -= 1
+                if not self.refs[kept]:
+                    del self.refs[kept]
+                    self.disk.free(kept)
+                    self.stats.reclaimed += 1
+            view.versions.clear()
+            if not self.views:
+                self.born.clear()
+
+    def _preserve(self, addr: Address, copy: bool) -> bool:
+        """
+        Before `addr` changes, give the views that still read its current
+        contents a version of their own: a copy, or the block itself if it is
+        being freed. Returns whether the block was kept for that reason.
+        """
+        born = self.born.get(addr, -1)
+        needing = [view for view in self.views if view.seq >= born and addr not in view.versions]
+        if not needing:
+            return False
+        if copy:
+            try:
+                block = self.disk.read_raw(addr)
+            except ValueError:
+                return False  # allocated but never written: no view can have read it
+            kept = self.disk.new()
+            self.disk.write_raw(kept, block)
+            self.stats.copies += 1
+        else:
+            kept = addr
+            self.stats.retained += 1
+        self.refs[kept] = len(needing)
+        for view in needing:
+            view.versions[addr] = kept
+        return True
+
+
+class SnapshotView:
+    """Read-only disk seen by a Snapshot: every address resolves to its version at snapshot time."""
+
+    def __init__(self, base: VersionedDisk, seq: int):
+        self.base = base
+        self.seq = seq
+        self.versions: Dict[Address, Address] = {}
+
+    @property
+    def codec(self):
+        return self.base.codec
+
+    def read(self, addr: Address) -> BTreeNode:
+        with self.base.lock:
+            return self.base.disk.read(self.versions.get(addr, addr))
+
+    def read_raw(self, addr: Address) -> bytes:
+        with self.base.lock:
+            return self.base.disk.read_raw(self.versions.get(addr, addr))
+
+    def new(self) -> Address:
+        raise ValueError("A snapshot is read-only")
+
+    def write(self, addr: Address, node: BTreeNode) -> None:
+        raise ValueError("A snapshot is read-only")
+
+    def free(self, addr: Address) -> None:
+        raise ValueError("A snapshot is read-only")
+
+    def save_meta(self, meta: Dict[str, Any]) -> None:
+        raise ValueError("A snapshot is read-only")
+
+    def load_meta(self) -> Dict[str, Any]:
+        return self.base.load_meta()
+
+    def release(self) -> None:
+        self.base.release(self)
+
+
+class Snapshot(BTree):
+    """
+    The tree as it was when BTree.snapshot() returned this. Every read
+    method of BTree works on it (find, find_many, range, items, ...) and
+    stays consistent however the tree changes meanwhile; changing it raises
+    ValueError. Release it with release() or a `with` block, or let it be
+    garbage collected, so that the old versions it holds can be reused.
+    """
+
+    def __init__(self, view: SnapshotView, tree: BTree):
+        self.init_state(view, tree.M, tree.L, False, tree.truncate_separators, tree.search,
+                        tree.overflow_threshold, order_stats=tree.order_stats)
+        self._root_addr = tree.root_addr
+        self._finalizer = weakref.finalize(self, view.release)
+
+    def release(self) -> None:
+        self._finalizer()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def insert(self, key, value) -> None:
+        raise ValueError("A snapshot is read-only")
+
+    def insert_many(self, pairs) -> None:
+        raise ValueError("A snapshot is read-only")
+
+    def delete(self, key) -> None:
+        raise ValueError("A snapshot is read-only")
@@ -0,0 +1,104 @@
+"""
+Redo log that makes the block writes of a FileDisk crash consistent.
+"""
+
+import functools
+import os
+import struct
+import zlib
+from typing import Callable, Dict, Iterator
+
+# sequence number, number of blocks, payload length, CRC32 of the payload
+_RECORD = struct.Struct("<QIII")
+# block number, length of its image
+_ENTRY = struct.Struct("<QI")
+
+
+class WriteAheadLog:
+    """
+    Append-only log of committed transactions, each one the after-images of
+    the blocks it changed. A transaction is written to the operating system
+    as soon as it commits, so it survives the process being killed; the log
+    is fsynced once every `group_size` commits (group commit), which bounds
+    how many commits a power loss can take away.
+
+    Records carry a CRC, so a torn write at the end of the log (a crash in
+    the middle of an append) is detected and ignored on replay.
+    """
+
+    def __init__(self, path: str, group_size: int = 1):
+        if group_size < 1:
+            raise ValueError(f"group_size must be at least 1, not {group_size}")
+        self.path = path
+        self.group_size = group_size
+        self.file = open(path, "a+b")
+        self.size = os.path.getsize(path)
+        self.seq = 0
+        self.unsynced = 0
+        self.commits = 0
+        self.syncs = 0
+
+    def append(self, blocks: Dict[int, bytes]) -> None:
+        """Log one committed transaction."""
+        parts = []
+        for block, image in blocks.items():
+            parts.append(_ENTRY.pack(block, len(image)))
+            parts.append(image)
+        payload = b"".join(parts)
+        self.seq += 1
+        self.file.write(_RECORD.pack(self.seq, len(blocks), len(payload), zlib.crc32(payload)) + payload)
+        self.file.flush()
+        self.size += _RECORD.size + len(payload)
+        self.commits += 1
+        self.unsynced += 1
+        if self.unsynced >= self.group_size:
+            self.sync()
+
+    def sync(self) -> None:
+        """Make every logged transaction durable."""
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.syncs += 1
+
+    def records(self) -> Iterator[Dict[int, bytes]]:
+        """The block images of every complete transaction in the log, oldest first."""
+        self.file.seek(0)
+        data = self.file.read()
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            _, count, length, crc = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            blocks = {}
+            pos = 0
+            for _ in range(count):
+                block, size = _ENTRY.unpack_from(payload, pos)
+                pos += _ENTRY.size
+                blocks[block] = payload[pos:pos + size]
+                pos += size
+            yield blocks
+            offset = start + length
+
+    def reset(self) -> None:
+        """Empty the log once everything in it has reached the data file."""
+        self.file.truncate(0)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size = 0
+        self.unsynced = 0
+
+    def close(self) -> None:
+        self.sync()
+        self.file.close()
+
+
+def atomic(fn: Callable) -> Callable:
+    """Run a BTree method as one transaction on disks that support them (see BTree.transaction)."""
+    @functools.wraps(fn)
+    def wrapper(tree, *args, **kwargs):
+        with tree.transaction():
+            return fn(tree, *args, **kwargs)
+    return wrapper
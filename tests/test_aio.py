@@ -0,0 +1,136 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.aio import AsyncBTree, AsyncDisk, AsyncFileDisk
+from py_btrees.file_disk import FileDisk
+
+import asyncio
+import random
+import threading
+import time
+
+from tests.test_delete import check_tree
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def collect(pairs):
+    return [pair async for pair in pairs]
+
+
+class SlowDisk:
+    """Counts reads and makes each one block for a while, so concurrent reads overlap."""
+
+    def __init__(self, disk, delay=0.01):
+        self.disk = disk
+        self.delay = delay
+        self.reads = 0
+        self.lock = threading.Lock()
+
+    def read(self, addr):
+        with self.lock:
+            self.reads += 1
+        time.sleep(self.delay)
+        return self.disk.read(addr)
+
+    def __getattr__(self, name):
+        return getattr(self.disk, name)
+
+
+def test_open_a_tree_built_synchronously(tmp_path):
+    path = str(tmp_path / "sync.db")
+    with FileDisk(path, block_size=512) as disk:
+        tree = BTree(5, 4, disk=disk)
+        for i in range(500):
+            tree.insert(i, str(i))
+
+    async def main():
+        async with AsyncFileDisk(path) as disk:
+            tree = await AsyncBTree.open(disk)
+            assert [await tree.find(i) for i in (0, 17, 499, 500)] == ["0", "17", "499", None]
+            assert await collect(tree.items()) == [(i, str(i)) for i in range(500)]
+            assert await collect(tree.range(100, 120, inclusive=(False, True), reverse=True)) == \
+                [(i, str(i)) for i in range(120, 100, -1)]
+    run(main())
+
+
+def test_changes_are_visible_synchronously(tmp_path):
+    path = str(tmp_path / "async.db")
+
+    async def main():
+        async with AsyncFileDisk(path, block_size=256) as disk:
+            tree = await AsyncBTree.create(4, 4, disk)
+            for i in range(300):
+                await tree.insert(i, i)
+            await tree.insert_many((i, -i) for i in range(300, 400))
+            for i in range(0, 400, 3):
+                await tree.delete(i)
+    run(main())
+
+    with FileDisk(path) as disk:
+        tree = BTree.open(disk)
+        assert dict(tree.items()) == {i: (i if i < 300 else -i) for i in range(400) if i % 3}
+
+
+def test_concurrent_reads_of_a_block_are_coalesced():
+    base = Disk()
+    tree = BTree.from_sorted(((i, i) for i in range(1000)), 8, 8, disk=base)
+    slow = SlowDisk(base)
+
+    async def main():
+        disk = AsyncDisk(slow, max_workers=2)
+        atree = AsyncBTree(BTree.open(slow), disk)
+        values = await asyncio.gather(*(atree.find(i) for i in range(0, 1000, 50)))
+        await disk.close()
+        return values, disk.stats
+
+    values, stats = run(main())
+    assert values == list(range(0, 1000, 50))
+    assert stats.coalesced > 0
+    height, node = 1, base.read(tree.root_addr)
+    while not node.is_leaf:
+        height, node = height + 1, base.read(node.children_addrs[0])
+    assert stats.fetches + stats.coalesced == len(values) * height
+    assert slow.reads == stats.fetches
+
+
+def test_readers_with_a_writer():
+    expected = {i: i for i in range(0, 2000, 2)}
+
+    async def reader(tree, rng, stop):
+        while not stop.is_set():
+            key = rng.randrange(0, 2000, 2)
+            assert await tree.find(key) == key
+            lo = rng.randrange(0, 2000, 2)
+            got = [k for k, _ in await collect(tree.range(lo, lo + 200))]
+            assert got == sorted(set(got))
+            assert [k for k in got if k % 2 == 0] == list(range(lo, min(lo + 201, 2000), 2))
+
+    async def writer(tree, rng):
+        for _ in range(300):
+            key = rng.randrange(1, 2000, 2)
+            if rng.random() < 0.3:
+                await tree.delete(key)
+                expected.pop(key, None)
+            else:
+                await tree.insert(key, key)
+                expected[key] = key
+
+    async def main():
+        disk = AsyncDisk(Disk())
+        tree = AsyncBTree(BTree.from_sorted(sorted(expected.items()), 4, 3, disk=disk.disk), disk)
+        rng = random.Random(5)
+        stop = asyncio.Event()
+        readers = [asyncio.ensure_future(reader(tree, random.Random(i), stop)) for i in range(4)]
+        await writer(tree, rng)
+        stop.set()
+        await asyncio.gather(*readers)
+        await disk.close()
+        return tree.tree
+
+    check_tree(run(main()), expected)
@@ -0,0 +1,158 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.bloom import BloomFilter, key_hash
+from py_btrees.file_disk import FileDisk
+
+import random
+import threading
+import pytest
+
+from tests.test_delete import check_tree, height
+
+
+@pytest.mark.parametrize("fp_rate", [0.1, 0.01])
+def test_filter_false_positive_rate(fp_rate):
+    bloom = BloomFilter(5000, fp_rate)
+    for i in range(5000):
+        bloom.add(key_hash(i))
+    assert all(bloom.might_contain(key_hash(i)) for i in range(5000))
+    false_positives = sum(bloom.might_contain(key_hash(i)) for i in range(5000, 25000))
+    assert false_positives / 20000 < 1.5 * fp_rate
+    assert key_hash(1) == key_hash(1.0)
+
+
+def test_lookups_match_the_tree():
+    rng = random.Random(3)
+    tree = BTree(4, 4, disk=Disk(), bloom_fp_rate=0.05)
+    expected = {}
+    for round in range(30):
+        for _ in range(50):
+            key = rng.randrange(3000)
+            if rng.random() < 0.35:
+                tree.delete(key)
+                expected.pop(key, None)
+            else:
+                tree.insert(key, key * 2)
+                expected[key] = key * 2
+        tree.insert_many((rng.randrange(3000), round) for _ in range(20))
+        expected = dict(tree.items())
+        probes = rng.sample(range(3000), 200)
+        assert [tree.find(k) for k in probes] == [expected.get(k) for k in probes]
+        assert tree.find_many(probes) == [expected.get(k) for k in probes]
+    check_tree(tree, expected)
+    stats = tree.bloom.stats
+    assert stats.lookups == 30 * 400
+    assert stats.tree_skips > 0 and stats.leaf_skips > 0
+    assert 0 < stats.skip_ratio() < 1
+
+
+def test_absent_keys_read_no_blocks():
+    disk = Disk()
+    tree = BTree.from_sorted(((i, i) for i in range(0, 20000, 2)), 8, 8, disk=disk, bloom_fp_rate=0.01)
+    tree.find(0)  # builds the filters
+    reads = disk.stats.reads
+    assert [tree.find(i) for i in range(1, 20000, 2)] == [None] * 10000
+    assert disk.stats.reads - reads < 10000 * height(tree) * 0.03
+    assert tree.bloom.stats.observed_fp_rate() < 0.03
+
+    for i in range(0, 2000, 2):
+        tree.delete(i)  # still in the tree filter, but no longer in the rebuilt leaf filters
+    tree.find_many(range(2000, 4000, 2))  # reads the leaves again, rebuilding their filters
+    tree.find_many(range(0, 2000, 2))
+    reads, skips = disk.stats.reads, tree.bloom.stats.leaf_skips
+    assert [tree.find(i) for i in range(2000, 4000, 2)] == list(range(2000, 4000, 2))
+    assert [tree.find(i) for i in range(0, 2000, 2)] == [None] * 1000
+    assert tree.bloom.stats.leaf_skips - skips > 900
+
+
+def test_tree_filter_grows_and_is_rebuilt_after_deletes():
+    tree = BTree(6, 6, disk=Disk(), bloom_fp_rate=0.01)
+    for i in range(5000):
+        tree.insert(i, i)
+    assert tree.bloom.capacity >= 5000
+    for i in range(5000):
+        tree.delete(i)
+    assert tree.bloom.added < 5000
+    assert [tree.find(i) for i in range(0, 5000, 50)] == [None] * 100
+
+
+def test_filters_after_reopen_and_rollback(tmp_path):
+    path = str(tmp_path / "bloom.db")
+    with FileDisk(path, block_size=512, wal=True) as disk:
+        tree = BTree(5, 5, disk=disk, bloom_fp_rate=0.02)
+        for i in range(500):
+            tree.insert(i, i)
+    with FileDisk(path, wal=True) as disk:
+        tree = BTree.open(disk)
+        assert tree.bloom.fp_rate == 0.02 and tree.bloom.tree is None
+        assert tree.find(250) == 250 and tree.find(1000) is None
+        with pytest.raises(RuntimeError):
+            with tree.transaction():
+                for i in range(500, 700):
+                    tree.insert(i, i)
+                raise RuntimeError
+        check_tree(tree, {i: i for i in range(500)})
+        assert tree.find_many([10, 600]) == [10, None]
+        # Enough deletes to rebuild the tree filter without them, then rolled back
+        with pytest.raises(RuntimeError):
+            with tree.transaction():
+                for i in range(400):
+                    tree.delete(i)
+                assert tree.bloom.deleted < 400  # the tree filter was rebuilt on the way
+                raise RuntimeError
+        assert all(tree.find(i) == i for i in range(500))
+        assert tree.find_many([1, 2, 3]) == [1, 2, 3]
+
+
+def test_readers_with_a_writer():
+    tree = BTree(5, 5, disk=Disk(), concurrent=True, bloom_fp_rate=0.05)
+    tree.insert_many((i, i) for i in range(0, 4000, 2))
+    errors = []
+    stop = threading.Event()
+    rebuilds = []
+    rebuild_bloom = tree.rebuild_bloom
+
+    def counted_rebuild():
+        rebuilds.append(1)
+        rebuild_bloom()
+    tree.rebuild_bloom = counted_rebuild
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            key = rng.randrange(0, 4000, 2)
+            if tree.find(key) != key:
+                errors.append(key)
+            if tree.find_many([key]) != [key]:
+                errors.append(key)
+
+    readers = [threading.Thread(target=reader, args=(i,)) for i in range(3)]
+    for thread in readers:
+        thread.start()
+    rng = random.Random(9)
+    for _ in range(1500):
+        key = rng.randrange(1, 4000, 2)
+        if rng.random() < 0.4:
+            tree.delete(key)
+        else:
+            tree.insert(key, key)
+    # Rounds of many inserts and deletes of odd keys make the tree filter be rebuilt while readers run
+    for base in range(4001, 20001, 4000):
+        tree.insert_many((i, i) for i in range(base, base + 4000, 2))
+        for i in range(base, base + 4000, 2):
+            tree.delete(i)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert len(rebuilds) > 2
+    assert not errors
+
+
+def test_counters_in_op_records():
+    tree = BTree(4, 4, disk=Disk(), bloom_fp_rate=0.01)
+    for i in range(100):
+        tree.insert(i, i)
+    with tree.record_ops() as recorder:
+        tree.find(1000)
+    assert recorder.records[0].counters["bloom_tree_skips"] == 1
+    assert recorder.records[0].counters["reads"] == 0
@@ -8,7 +8,7 @@ from typing import Any
 # This is a rewriting of all of the specifications that the handout provides,
 # except it does not test the property that all leaf nodes reside at the same level.
 # Note that fulfilling all of these requirements does NOT guarantee a working BTree.
-def btree_properties_recurse(root_node_addr, node, M, L):
+def btree_properties_recurse(root_node_addr, node, M, L, disk=DISK):
 
     assert sorted(node.keys) == node.keys # Keys should remain sorted so that a binary search is possible
 
@@ -40,7 +40,7 @@ def btree_properties_recurse(root_node_addr, node, M, L):
         
     # Run the assertions on all children
     for child_addr in node.children_addrs:
-        btree_properties_recurse(root_node_addr, DISK.read(child_addr), M, L)
+        btree_properties_recurse(root_node_addr, disk.read(child_addr), M, L, disk)
 
 def test_btree_properties() -> None:
     M = 5
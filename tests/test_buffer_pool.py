@@ -0,0 +1,108 @@
+from py_btrees.disk import DISK
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode
+from py_btrees.buffer_pool import BufferPool, LRUPolicy, ClockPolicy, TwoQPolicy
+
+import pytest
+
+from tests.test_btrees import btree_properties_recurse
+
+
+def new_node() -> BTreeNode:
+    addr = DISK.new()
+    node = BTreeNode(addr, None, None, True)
+    DISK.write(addr, node)
+    return node
+
+
+def test_lru_evicts_least_recently_used():
+    policy = LRUPolicy(3)
+    for addr in [1, 2, 3]:
+        policy.admit(addr)
+    policy.touch(1)
+    assert policy.victim() == 2
+    assert policy.victim() == 3
+    assert policy.victim() == 1
+
+
+def test_clock_gives_referenced_pages_a_second_chance():
+    policy = ClockPolicy(3)
+    for addr in [1, 2, 3]:
+        policy.admit(addr)
+    policy.touch(1)
+    assert policy.victim() == 2
+    policy.admit(4)
+    assert policy.victim() == 3
+    assert policy.victim() == 1
+
+
+def test_2q_protects_pages_seen_twice():
+    policy = TwoQPolicy(4)
+    for addr in [1, 2, 3, 4]:
+        policy.admit(addr)
+    assert policy.victim() == 1
+    policy.admit(1)  # re-requested after eviction: goes to the main queue
+    assert policy.victim() == 2
+    assert policy.victim() == 3
+    assert 1 in policy.am
+
+
+@pytest.mark.parametrize("policy", ["lru", "clock", "2q"])
+def test_hits_misses_and_evictions(policy):
+    nodes = [new_node() for _ in range(4)]
+    pool = BufferPool(DISK, capacity=2, policy=policy)
+
+    pool.read(nodes[0].my_addr)
+    pool.read(nodes[0].my_addr)
+    assert (pool.stats.hits, pool.stats.misses) == (1, 1)
+
+    for node in nodes:
+        pool.read(node.my_addr)
+    assert len(pool.frames) == 2
+    assert pool.stats.evictions == 2
+
+
+def test_dirty_pages_are_written_on_eviction_and_flush():
+    a, b, c = new_node(), new_node(), new_node()
+    pool = BufferPool(DISK, capacity=2)
+
+    node = pool.read(a.my_addr)
+    node.keys.append(1)
+    node.data.append("1")
+    pool.write(a.my_addr, node)
+    assert DISK.read(a.my_addr).keys == []
+
+    pool.read(b.my_addr)
+    pool.read(c.my_addr)  # evicts a
+    assert DISK.read(a.my_addr).keys == [1]
+    assert pool.stats.writebacks == 1
+
+    node = pool.read(c.my_addr)
+    node.keys.append(2)
+    node.data.append("2")
+    pool.write(c.my_addr, node)
+    pool.flush()
+    assert DISK.read(c.my_addr).keys == [2]
+    assert not pool.dirty
+
+
+def test_rejects_bad_configuration():
+    with pytest.raises(ValueError):
+        BufferPool(DISK, capacity=0)
+    with pytest.raises(ValueError):
+        BufferPool(DISK, policy="fifo")
+
+
+@pytest.mark.parametrize("policy", ["lru", "clock", "2q"])
+def test_btree_through_buffer_pool(policy):
+    M, L = 4, 3
+    pool = BufferPool(DISK, capacity=8, policy=policy)
+    btree = BTree.from_sorted(((i, str(i)) for i in range(200)), M, L, disk=pool)
+
+    for _ in range(2):
+        for i in range(200):
+            assert btree.find(i) == str(i)
+    assert pool.stats.hits > pool.stats.misses
+
+    pool.flush()
+    btree_properties_recurse(btree.root_addr, DISK.read(btree.root_addr), M, L)
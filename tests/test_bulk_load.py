@@ -0,0 +1,58 @@
+from py_btrees.disk import DISK, Disk
+from py_btrees.btree import BTree
+
+import pytest
+
+from tests.test_btrees import btree_properties_recurse
+
+
+def leaf_depths(addr, depth=0, disk=DISK):
+    node = disk.read(addr)
+    if node.is_leaf:
+        return {depth}
+    depths = set()
+    for child_addr in node.children_addrs:
+        depths |= leaf_depths(child_addr, depth + 1, disk)
+    return depths
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (4, 2), (5, 3), (7, 10)])
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 7, 50, 333])
+@pytest.mark.parametrize("fill_factor", [1.0, 0.7, 0.1])
+def test_from_sorted_properties(M, L, n, fill_factor):
+    btree = BTree.from_sorted(((i, str(i)) for i in range(n)), M, L, fill_factor=fill_factor)
+
+    btree_properties_recurse(btree.root_addr, DISK.read(btree.root_addr), M, L)
+    assert len(leaf_depths(btree.root_addr)) == 1
+    for i in range(n):
+        assert btree.find(i) == str(i)
+    assert btree.find(n) is None
+    assert btree.find(-1) is None
+
+
+def test_from_sorted_writes_each_node_once(monkeypatch):
+    writes = []
+    allocated = []
+    original_write, original_new = Disk.write, Disk.new
+
+    def counting_write(self, addr, data):
+        writes.append(addr)
+        original_write(self, addr, data)
+
+    def counting_new(self):
+        allocated.append(original_new(self))
+        return allocated[-1]
+
+    monkeypatch.setattr(Disk, "write", counting_write)
+    monkeypatch.setattr(Disk, "new", counting_new)
+    BTree.from_sorted(((i, i) for i in range(1000)), 4, 5)
+
+    assert len(writes) == len(set(writes))
+    assert sorted(writes) == sorted(allocated)
+
+
+def test_from_sorted_rejects_unsorted_input():
+    with pytest.raises(ValueError):
+        BTree.from_sorted([(1, "1"), (3, "3"), (2, "2")], 3, 3)
+    with pytest.raises(ValueError):
+        BTree.from_sorted([(1, "1"), (1, "1")], 3, 3)
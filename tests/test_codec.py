@@ -0,0 +1,148 @@
+from py_btrees.disk import DISK, Disk
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode
+from py_btrees.codec import NodeCodec, PickleCodec, ValueRef, decode_value, encode_value
+
+import pytest
+
+
+def make_leaf(keys, data):
+    node = BTreeNode(7, 3, 1, True)
+    node.keys = list(keys)
+    node.data = list(data)
+    node.prev_addr = 6
+    node.next_addr = 8
+    return node
+
+
+def assert_same_node(a, b):
+    assert type(a) is type(b)
+    assert a.__getstate__() == b.__getstate__()
+
+
+@pytest.mark.parametrize("keys,data", [
+    ([], []),
+    ([1, 2, 3], ["a", "b", "c"]),
+    ([-(2 ** 63), 0, 2 ** 63 - 1], [b"x", b"", b"\x00" * 100]),
+    ([2 ** 64, 2 ** 70], [1, 2]),                       # ints that do not fit in 64 bits
+    (["", "é", "日本"], [1.5, None, {"nested": [1, 2]}]),
+    ([b"a", b"b"], [True, 2]),                          # mixed types fall back to pickle
+    (["a\0b", "c"], [b"same", b"size"]),                 # NUL in a string, fixed-width bytes
+])
+def test_leaf_round_trip(keys, data):
+    codec = NodeCodec()
+    node = make_leaf(keys, data)
+    assert_same_node(codec.decode(codec.encode(node)), node)
+
+
+def test_strings_with_lone_surrogates():
+    # What os.fsdecode gives for file names that are not valid UTF-8
+    keys, data = ["bad\udc80name", "bad\udc81name", "ok"], ["val\ud800", "x", "\udfff"]
+    for codec in (NodeCodec(), NodeCodec(prefix_compression=True)):
+        assert_same_node(codec.decode(codec.encode(make_leaf(keys, data))), make_leaf(keys, data))
+    assert decode_value(encode_value("val\ud800")) == "val\ud800"
+    tree = BTree(3, 3, disk=Disk())
+    for key, value in zip(keys, data):
+        tree.insert(key, value)
+    assert [tree.find(key) for key in keys] == data
+
+
+def test_internal_and_root_round_trip():
+    codec = NodeCodec()
+    node = BTreeNode(0, None, None, False)
+    node.keys = ["m"]
+    node.children_addrs = [4, 5]
+    node.counts = [3, 7]
+    decoded = codec.decode(codec.encode(node))
+    assert_same_node(decoded, node)
+    assert decoded.counts == [3, 7]
+    assert decoded.parent_addr is None and decoded.index_in_parent is None
+
+
+def test_internal_node_without_counts():
+    codec = NodeCodec()
+    node = BTreeNode(2, 0, 1, False)
+    node.keys = [10, 20]
+    node.children_addrs = [4, 5, 6]
+    decoded = codec.decode(codec.encode(node))
+    assert_same_node(decoded, node)
+    assert len(decoded.counts) == 0
+    node.counts = [1, 2]
+    with pytest.raises(ValueError):
+        codec.encode(node)
+
+
+def test_decode_from_memoryview():
+    codec = NodeCodec()
+    node = make_leaf(["k1", "k2"], [b"v1", b"v2"])
+    assert_same_node(codec.decode(memoryview(codec.encode(node))), node)
+
+
+def test_binary_format_is_smaller_than_pickle():
+    node = make_leaf(range(100), (str(i) for i in range(100)))
+    assert len(NodeCodec().encode(node)) < len(PickleCodec().encode(node))
+
+
+def test_codecs_agree_on_a_real_tree():
+    btree = BTree(4, 3)
+    for i in range(100):
+        btree.insert(i, str(i))
+    binary, pickled = NodeCodec(), PickleCodec()
+    pending = [btree.root_addr]
+    while pending:
+        node = DISK.read(pending.pop())
+        assert_same_node(binary.decode(binary.encode(node)), pickled.decode(pickled.encode(node)))
+        pending.extend(node.children_addrs)
+
+
+@pytest.mark.parametrize("keys", [
+    ["https://a.example/x", "https://a.example/y", "https://a.example/y/z"],
+    ["same", "same!"],                                  # one key is the whole prefix
+    [b"\x00\x01ab", b"\x00\x01ac", b"\x00\x01b"],
+    ["ab\0c", "ab\0d"],                                 # prefix with a NUL falls back to pickle
+    ["a", "b"],                                         # nothing shared
+])
+def test_prefix_compression_round_trip(keys):
+    codec = NodeCodec(prefix_compression=True)
+    node = make_leaf(keys, range(len(keys)))
+    block = codec.encode(node)
+    assert_same_node(codec.decode(block), node)
+    assert_same_node(NodeCodec().decode(block), node)
+
+
+def test_prefix_compression_saves_space():
+    node = make_leaf([f"https://www.example.com/catalog/item/{i:06d}" for i in range(50)], range(50))
+    assert len(NodeCodec(prefix_compression=True).encode(node)) < len(NodeCodec().encode(node)) // 3
+
+
+@pytest.mark.parametrize("keys", [
+    [10 ** 12 + i for i in range(100)],                 # dense: frame of reference
+    [i * 1000 for i in range(-50, 50)],                 # evenly spaced, wide range: gaps
+    [0, 1, 2 ** 40, 2 ** 62],                           # nothing to gain
+    [-(2 ** 63), 0, 2 ** 63 - 1],                       # span does not fit
+    [1, 2],
+    ["a", "b"],
+])
+def test_delta_keys_round_trip(keys):
+    codec = NodeCodec(delta_keys=True)
+    node = make_leaf(keys, range(len(keys)))
+    block = codec.encode(node)
+    assert_same_node(codec.decode(block), node)
+    assert_same_node(NodeCodec().decode(block), node)
+    assert_same_node(NodeCodec(int_arrays=False).decode(block), node)
+    assert len(block) <= len(NodeCodec().encode(node))
+
+
+def test_delta_keys_save_space():
+    node = make_leaf([2 ** 40 + 3 * i for i in range(200)], [b""] * 200)
+    assert len(NodeCodec(delta_keys=True).encode(node)) < len(NodeCodec().encode(node)) // 4
+
+
+def test_value_refs_round_trip():
+    codec = NodeCodec()
+    node = make_leaf([1, 2, 3, 4], [ValueRef(10), None, "small", ValueRef(2 ** 40)])
+    decoded = codec.decode(codec.encode(node))
+    assert_same_node(decoded, node)
+    assert decoded.data[0] == ValueRef(10) and decoded.data[1] is None
+    for value in [b"x" * 5000, "text", {"a": [1, 2]}, None]:
+        assert decode_value(encode_value(value)) == value
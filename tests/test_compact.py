@@ -0,0 +1,85 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.codec import NodeCodec
+from py_btrees.compact import IntArray, compact, take
+
+import pickle
+import pytest
+
+from tests.test_delete import check_tree
+
+
+def test_int_array_behaves_like_a_list():
+    values = IntArray("q", [1, 2, 3])
+    assert values == [1, 2, 3] and [1, 2, 3] == values
+    assert values != [1, 2] and values != ["1", "2", "3"]
+    assert sorted(values) == values
+    assert type(take(values, 1)) is IntArray and take(values, 1, 2) == [2]
+    assert type(take([1, 2], 1)) is list
+    assert repr(values) == "IntArray([1, 2, 3])"
+    with pytest.raises(TypeError):
+        hash(values)
+
+
+def test_compact_falls_back_to_lists():
+    assert type(compact([1, 2])) is IntArray
+    for values in (["a"], [1, 2 ** 64], [True, 2], [1.5]):
+        assert compact(values) is values
+
+
+def test_decoded_nodes_use_arrays_for_ints():
+    tree = BTree(4, 4, disk=Disk())
+    for i in range(50):
+        tree.insert(i, str(i))
+    root = tree.disk.read(tree.root_addr)
+    leaf = tree.disk.read(root.children_addrs[0])
+    assert type(root.keys) is IntArray and type(root.children_addrs) is IntArray
+    assert type(leaf.keys) is IntArray and type(leaf.data) is list
+
+    lists = NodeCodec(int_arrays=False).decode(NodeCodec().encode(root))
+    assert type(lists.keys) is list and lists.children_addrs == root.children_addrs
+
+
+def test_keys_that_do_not_fit_switch_to_lists():
+    # A small pool keeps some nodes across the inserts and reads the others back as arrays
+    tree = BTree(3, 3, disk=BufferPool(Disk(), capacity=8))
+    expected = {}
+    for i in range(100):
+        tree.insert(i, i)
+        expected[i] = i
+    for i in range(100):
+        key = 2 ** 64 + i if i % 2 else -i - 1
+        tree.insert(key, i)
+        expected[key] = i
+    for key in list(expected)[::3]:
+        tree.delete(key)
+        del expected[key]
+    check_tree(tree, expected)
+
+
+def test_empty_root_takes_any_keys():
+    tree = BTree(3, 3, disk=Disk())
+    for i in range(30):
+        tree.insert(i, i)
+    for i in range(30):
+        tree.delete(i)
+    tree.insert("a", 1)
+    assert list(tree.items()) == [("a", 1)]
+
+
+def test_nodes_have_no_dict():
+    node = BTreeNode(1, None, None, True)
+    assert not hasattr(node, "__dict__")
+    with pytest.raises(AttributeError):
+        node.extra = 1
+
+
+def test_old_pickled_nodes_still_load():
+    node = BTreeNode(3, 1, 0, True)
+    node.keys, node.data = [1, 2], ["a", "b"]
+    restored = BTreeNode.__new__(BTreeNode)
+    restored.__setstate__(dict(node.__getstate__()))  # the state of a node with a __dict__
+    assert restored.__getstate__() == node.__getstate__()
+    assert pickle.loads(pickle.dumps(node)).__getstate__() == node.__getstate__()
@@ -0,0 +1,170 @@
+from py_btrees.disk import DISK
+from py_btrees.btree import BTree
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.file_disk import FileDisk
+from py_btrees.latches import RWLatch
+
+import random
+import sys
+import threading
+import time
+import pytest
+
+from tests.test_btrees import btree_properties_recurse
+from tests.test_delete import check_tree
+
+STABLE = range(0, 4000, 2)  # present for the whole test; the writer only touches odd keys
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def hammer(btree, writers=1, readers=6, duration=1.0, deletes=True):
+    """Run readers against `writers` threads inserting (and deleting) odd keys. Returns the odd keys left."""
+    errors = []
+    stop = threading.Event()
+    odd = {}
+    odd_lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        try:
+            while not stop.is_set():
+                choice = rng.random()
+                if choice < 0.6:
+                    key = rng.choice(STABLE)
+                    assert btree.find(key) == key
+                elif choice < 0.8:
+                    keys = [rng.choice(STABLE) for _ in range(20)]
+                    assert btree.find_many(keys) == keys
+                else:
+                    lo = rng.choice(STABLE)
+                    hi = lo + 300
+                    reverse = rng.random() < 0.5
+                    got = [k for k, _ in btree.range(lo, hi, reverse=reverse)]
+                    assert got == sorted(got, reverse=reverse)
+                    assert len(got) == len(set(got))
+                    assert [k for k in got if k % 2 == 0] == [k for k in sorted(got, reverse=reverse)
+                                                                if k % 2 == 0]
+                    assert {k for k in got if k % 2 == 0} == set(range(lo, min(hi + 1, STABLE[-1] + 1), 2))
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        try:
+            while not stop.is_set():
+                key = rng.randrange(1, 4000, 2)
+                if deletes and rng.random() < 0.4:
+                    with odd_lock:
+                        btree.delete(key)
+                        odd.pop(key, None)
+                else:
+                    with odd_lock:
+                        btree.insert(key, key)
+                        odd[key] = key
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(100 + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    return odd
+
+
+def stable_tree(M, L, **kwargs):
+    return BTree.from_sorted(((k, k) for k in STABLE), M, L, fill_factor=0.7, concurrent=True, **kwargs)
+
+
+@pytest.mark.parametrize("M,L", [(3, 2), (4, 4), (7, 5)])
+def test_readers_with_one_writer(M, L):
+    btree = stable_tree(M, L)
+    odd = hammer(btree)
+    btree_properties_recurse(btree.root_addr, DISK.read(btree.root_addr), M, L)
+    expected = dict(odd)
+    expected.update((k, k) for k in STABLE)
+    check_tree(btree, expected)
+
+
+def test_several_writer_threads_take_turns():
+    btree = stable_tree(4, 3)
+    odd = hammer(btree, writers=3, readers=3, duration=0.7)
+    expected = dict(odd)
+    expected.update((k, k) for k in STABLE)
+    check_tree(btree, expected)
+
+
+def test_batched_writes_with_readers():
+    btree = stable_tree(5, 4)
+    errors = []
+
+    def batches():
+        try:
+            for start in range(1, 4000, 200):
+                btree.insert_many((k, k) for k in range(start, start + 200, 2))
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    writer = threading.Thread(target=batches)
+    writer.start()
+    hammer(btree, writers=0, readers=4, duration=0.3)
+    writer.join()
+    assert errors == []
+    check_tree(btree, {k: k for k in range(4000)})
+
+
+def test_buffer_pool_shared_between_threads():
+    pool = BufferPool(DISK, capacity=32)
+    btree = stable_tree(5, 5, disk=pool)
+    odd = hammer(btree, duration=0.7)
+    pool.flush()
+    expected = dict(odd)
+    expected.update((k, k) for k in STABLE)
+    check_tree(btree, expected)
+
+
+def test_file_disk_shared_between_threads(tmp_path):
+    with FileDisk(str(tmp_path / "threads.db"), block_size=256) as disk:
+        btree = stable_tree(6, 6, disk=disk)
+        odd = hammer(btree, duration=0.7)
+        expected = dict(odd)
+        expected.update((k, k) for k in STABLE)
+        assert dict(btree.items()) == expected
+
+
+def test_rw_latch():
+    latch = RWLatch()
+    latch.acquire_shared()
+    latch.acquire_shared()
+    acquired = threading.Event()
+
+    def writer():
+        latch.acquire_exclusive()
+        acquired.set()
+        latch.release_exclusive()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.05)
+    assert not acquired.is_set()
+    # A waiting writer keeps new readers out
+    blocked_reader = threading.Thread(target=lambda: (latch.acquire_shared(), latch.release_shared()))
+    blocked_reader.start()
+    time.sleep(0.05)
+    assert blocked_reader.is_alive()
+    latch.release_shared()
+    latch.release_shared()
+    thread.join(1)
+    blocked_reader.join(1)
+    assert acquired.is_set() and not blocked_reader.is_alive()
@@ -0,0 +1,172 @@
+from py_btrees.disk import DISK
+from py_btrees.btree import BTree
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.file_disk import FileDisk
+
+import random
+import pytest
+
+from tests.test_btrees import btree_properties_recurse
+from tests.test_bulk_load import leaf_depths
+from tests.test_range import leaf_chain
+
+
+def height(btree):
+    """The number of levels of the tree, counting the leaves."""
+    levels, node = 1, btree.disk.read(btree.root_addr)
+    while not node.is_leaf:
+        levels += 1
+        node = btree.disk.read(node.children_addrs[0])
+    return levels
+
+
+def subtree_size(node, disk, counted=True):
+    """
+    The number of keys below `node`, checking the subtree counts of every internal
+    node on the way: right if `counted`, absent otherwise.
+    """
+    if node.is_leaf:
+        return len(node.keys)
+    sizes = [subtree_size(disk.read(addr), disk, counted) for addr in node.children_addrs]
+    assert list(node.counts) == (sizes if counted else [])
+    return sum(sizes)
+
+
+def check_tree(btree, expected):
+    """Structural invariants, parent links, subtree counts, one leaf level, and the expected contents."""
+    disk = btree.disk
+    root = disk.read(btree.root_addr)
+    btree_properties_recurse(btree.root_addr, root, btree.M, btree.L, disk)
+    assert subtree_size(root, disk, btree.order_stats) == len(expected)
+    assert len(leaf_depths(btree.root_addr, disk=disk)) == 1
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        for idx, child_addr in enumerate(node.children_addrs):
+            child = disk.read(child_addr)
+            assert (child.parent_addr, child.index_in_parent) == (node.my_addr, idx)
+            pending.append(child)
+    assert [k for leaf in leaf_chain(btree) for k in leaf.keys] == sorted(expected)
+    assert list(btree.items()) == sorted(expected.items())
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (2, 3), (3, 3), (4, 2), (5, 3), (6, 6)])
+def test_random_deletes_keep_invariants(M, L):
+    rng = random.Random(M * 100 + L)
+    btree = BTree(M, L)
+    expected = {}
+    keys = list(range(300))
+    rng.shuffle(keys)
+    for key in keys:
+        btree.insert(key, str(key))
+        expected[key] = str(key)
+    rng.shuffle(keys)
+    for i, key in enumerate(keys):
+        btree.delete(key)
+        del expected[key]
+        assert btree.find(key) is None
+        if i % 25 == 0:
+            check_tree(btree, expected)
+    check_tree(btree, expected)
+    root = DISK.read(btree.root_addr)
+    assert root.is_leaf and root.keys == []
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 2), (4, 4)])
+def test_mixed_inserts_and_deletes(M, L):
+    rng = random.Random(7)
+    btree = BTree(M, L)
+    expected = {}
+    for step in range(2000):
+        key = rng.randrange(200)
+        if rng.random() < 0.5:
+            btree.insert(key, step)
+            expected[key] = step
+        else:
+            btree.delete(key)
+            expected.pop(key, None)
+        if step % 200 == 0:
+            check_tree(btree, expected)
+    check_tree(btree, expected)
+
+
+def test_sequential_deletes_from_both_ends():
+    btree = BTree(4, 3)
+    expected = {i: i for i in range(200)}
+    for i in range(200):
+        btree.insert(i, i)
+    for i in range(50):
+        btree.delete(i)
+        btree.delete(199 - i)
+        del expected[i], expected[199 - i]
+    check_tree(btree, expected)
+
+
+def test_delete_missing_key_does_nothing():
+    btree = BTree(3, 3)
+    for i in range(0, 20, 2):
+        btree.insert(i, i)
+    btree.delete(5)
+    btree.delete(100)
+    check_tree(btree, {i: i for i in range(0, 20, 2)})
+
+
+def test_freed_blocks_are_reused():
+    btree = BTree(3, 2)
+    for i in range(500):
+        btree.insert(i, i)
+    for i in range(500):
+        btree.delete(i)
+    blocks = len(DISK.memory)
+    assert len(DISK.free_list) > 0
+    for i in range(500):
+        btree.insert(i, i)
+    assert len(DISK.memory) == blocks
+    check_tree(btree, {i: i for i in range(500)})
+
+
+def test_delete_from_bulk_loaded_tree():
+    expected = {i: -i for i in range(1000)}
+    btree = BTree.from_sorted(sorted(expected.items()), 5, 4)
+    for i in range(0, 1000, 3):
+        btree.delete(i)
+        del expected[i]
+    check_tree(btree, expected)
+
+
+def test_delete_through_buffer_pool():
+    pool = BufferPool(DISK, capacity=8)
+    btree = BTree(4, 4, disk=pool)
+    for i in range(300):
+        btree.insert(i, i)
+    for i in range(0, 300, 2):
+        btree.delete(i)
+    pool.flush()
+    assert not set(pool.frames) & DISK.freed
+    check_tree(btree, {i: i for i in range(1, 300, 2)})
+
+
+def test_file_disk_reuses_freed_blocks(tmp_path):
+    with FileDisk(str(tmp_path / "delete.db"), block_size=256) as disk:
+        btree = BTree(4, 4, disk=disk)
+        for i in range(1000):
+            btree.insert(i, i)
+        for i in range(1000):
+            btree.delete(i)
+        blocks = disk.num_blocks
+        for i in range(1000):
+            btree.insert(i, i)
+        assert disk.num_blocks == blocks
+        assert [k for k, _ in btree.items()] == list(range(1000))
+        assert disk.stats.frees > 0
+
+
+def test_free_errors():
+    addr = DISK.new()
+    DISK.free(addr)
+    with pytest.raises(ValueError):
+        DISK.free(addr)
+    with pytest.raises(ValueError):
+        DISK.read(addr)
+    with pytest.raises(ValueError):
+        DISK.free(len(DISK.memory))
@@ -0,0 +1,149 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.dump import TransferStats
+from py_btrees.snapshot import VersionedDisk
+
+import os
+import pytest
+
+from tests.test_delete import check_tree
+
+
+def make_tree(n, **kwargs):
+    tree = BTree(4, 5, disk=Disk(), **kwargs)
+    for key in range(0, 2 * n, 2):
+        tree.insert(key, f"value-{key}")
+    return tree
+
+
+def test_round_trip(tmp_path):
+    tree = make_tree(500)
+    path = str(tmp_path / "tree.dump")
+    written = tree.dump(path, chunk_keys=64)
+    assert written.keys == 500
+    assert written.chunks == 8
+    assert written.bytes == os.path.getsize(path)
+
+    stats = TransferStats()
+    copy = BTree.load(path, disk=Disk(), stats=stats)
+    assert (copy.M, copy.L) == (4, 5)
+    check_tree(copy, dict(tree.items()))
+    assert stats.keys == 500 and stats.chunks == 8 and stats.bytes == written.bytes
+    assert stats.mb_per_s() > 0
+
+
+def test_load_builds_bottom_up(tmp_path):
+    tree = make_tree(2000)
+    path = str(tmp_path / "tree.dump")
+    tree.dump(path)
+    disk = Disk()
+    copy = BTree.load(path, disk=disk, M=16, L=16)
+    assert (copy.M, copy.L) == (16, 16)
+    # Every node is written once; nothing is read back while building
+    assert disk.stats.reads == 0
+    assert disk.stats.writes == sum(1 for block in disk.memory if block)
+    check_tree(copy, dict(tree.items()))
+
+
+def test_empty_tree(tmp_path):
+    path = str(tmp_path / "empty.dump")
+    assert BTree(3, 3, disk=Disk()).dump(path).keys == 0
+    copy = BTree.load(path, disk=Disk())
+    assert list(copy.items()) == []
+    copy.insert(1, "one")
+    assert copy.find(1) == "one"
+
+
+def test_options_and_overflow_values_survive(tmp_path):
+    tree = make_tree(50, search="interpolation", overflow_threshold=64, bloom_fp_rate=0.01)
+    tree.insert(7, b"x" * 1000)
+    path = str(tmp_path / "tree.dump")
+    tree.dump(path)
+    copy = BTree.load(path, disk=Disk(), allow_pickle=True)  # str and bytes values together are pickled
+    assert copy.search == "interpolation"
+    assert copy.overflow_threshold == 64
+    assert copy.bloom.fp_rate == 0.01
+    assert copy.find(7) == b"x" * 1000
+    assert copy.find(8) == "value-8"
+
+
+def test_mixed_keys_and_values(tmp_path):
+    tree = BTree(3, 3, disk=Disk())
+    pairs = [("a", 1), ("ab", None), ("abc", [1, 2]), ("b", b"bytes"), ("zz", {"k": 1.5})]
+    for key, value in pairs:
+        tree.insert(key, value)
+    path = str(tmp_path / "tree.dump")
+    tree.dump(path, chunk_keys=2)
+    assert list(BTree.load(path, disk=Disk(), allow_pickle=True).items()) == pairs
+
+
+UNPICKLED = []
+
+
+def record_unpickling(tag):
+    UNPICKLED.append(tag)
+    return Payload()
+
+
+class Payload:
+    """Runs record_unpickling() when unpickled, as a hostile dump could run anything."""
+
+    def __reduce__(self):
+        return record_unpickling, ("payload",)
+
+
+def test_pickled_values_need_allow_pickle(tmp_path):
+    tree = BTree(3, 3, disk=Disk())
+    tree.insert(1, Payload())
+    path = str(tmp_path / "tree.dump")
+    tree.dump(path)
+    UNPICKLED.clear()
+    with pytest.raises(ValueError, match="unpickle"):
+        BTree.load(path, disk=Disk())
+    assert UNPICKLED == []
+    assert isinstance(BTree.load(path, disk=Disk(), allow_pickle=True).find(1), Payload)
+    assert UNPICKLED
+    # Plain ints, strings and bytes never need it
+    make_tree(100).dump(path)
+    assert BTree.load(path, disk=Disk()).find(10) == "value-10"
+
+
+def test_dump_of_snapshot(tmp_path):
+    tree = BTree(4, 4, disk=VersionedDisk(Disk()))
+    for key in range(100):
+        tree.insert(key, key)
+    with tree.snapshot() as snap:
+        for key in range(0, 100, 2):
+            tree.delete(key)
+        path = str(tmp_path / "snap.dump")
+        snap.dump(path)
+    assert [key for key, _ in BTree.load(path, disk=Disk()).items()] == list(range(100))
+
+
+def test_corrupt_files_are_rejected(tmp_path):
+    path = str(tmp_path / "tree.dump")
+    make_tree(300).dump(path, chunk_keys=100)
+    with open(path, "rb") as file:
+        data = file.read()
+
+    def load(blob):
+        bad = str(tmp_path / "bad.dump")
+        with open(bad, "wb") as file:
+            file.write(blob)
+        return BTree.load(bad, disk=Disk())
+
+    with pytest.raises(ValueError, match="not a tree dump"):
+        load(b"X" + data[1:])
+    with pytest.raises(ValueError, match="truncated"):
+        load(data[:len(data) // 2])
+    with pytest.raises(ValueError, match="truncated"):
+        load(data[:-1])
+    flipped = bytearray(data)
+    flipped[len(data) // 2] ^= 0xFF
+    with pytest.raises(ValueError, match="checksum"):
+        load(bytes(flipped))
+
+
+def test_chunk_keys_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        make_tree(5).dump(str(tmp_path / "tree.dump"), chunk_keys=0)
@@ -0,0 +1,181 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.file_disk import FileDisk
+from py_btrees.fastpath import FastPathStats, ValueCache
+
+import random
+import threading
+import pytest
+
+from tests.test_delete import check_tree, height
+
+
+def test_sequential_finds_stay_in_the_leaf():
+    disk = Disk()
+    btree = BTree.from_sorted([(i, str(i)) for i in range(1000)], 4, 8, disk=disk)
+    disk.stats.reset()
+    for i in range(1000):
+        assert btree.find(i) == str(i)
+    leaves = 1000 // 8
+    assert btree.fast_stats.finger_misses == leaves
+    assert btree.fast_stats.finger_hits == 1000 - leaves
+    assert disk.stats.reads == leaves * height(btree) + (1000 - leaves)
+    # Keys between two leaves and beyond either end are still looked up in the right one
+    assert btree.find(-1) is None
+    assert btree.find(7.5) is None
+    assert btree.find(2000) is None
+    assert btree.find(8) == "8"
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (5, 4)])
+@pytest.mark.parametrize("cache_size,order_stats", [(None, False), (16, False), (None, True)])
+def test_random_writes_keep_lookups_right(M, L, cache_size, order_stats):
+    rng = random.Random(M * 10 + L)
+    btree = BTree(M, L, disk=Disk(), cache_size=cache_size, order_stats=order_stats)
+    expected = {}
+    for step in range(3000):
+        key = rng.randrange(300)
+        action = rng.random()
+        if action < 0.4:
+            btree.insert(key, step)
+            expected[key] = step
+        elif action < 0.55:
+            btree.delete(key)
+            expected.pop(key, None)
+        elif action < 0.6:
+            batch = [(rng.randrange(300), step) for _ in range(5)]
+            btree.insert_many(batch)
+            expected.update(batch)
+        else:
+            assert btree.find(key) == expected.get(key)
+            # A neighbour, likely in the same leaf
+            assert btree.find(key + 1) == expected.get(key + 1)
+    check_tree(btree, expected)
+    if order_stats:
+        assert btree.count() == len(expected)
+    assert btree.fast_stats.finger_hits > 0
+
+
+def test_overwrite_in_the_finger_leaf_writes_only_the_leaf():
+    disk = Disk()
+    btree = BTree.from_sorted([(i, str(i)) for i in range(500)], 4, 8, disk=disk, order_stats=True)
+    assert btree.find(123) == "123"
+    disk.stats.reset()
+    btree.insert(124, "new")
+    assert (disk.stats.reads, disk.stats.writes) == (1, 1)
+    # A new key changes the subtree counts on its path, so it still descends
+    btree.insert(123.5, "between")
+    assert disk.stats.reads > 2
+    expected = {i: str(i) for i in range(500)}
+    expected.update({124: "new", 123.5: "between"})
+    check_tree(btree, expected)
+    assert btree.rank(200) == 201
+
+
+def test_cache_answers_without_reading():
+    disk = Disk()
+    btree = BTree.from_sorted([(i, str(i)) for i in range(500)], 4, 4, disk=disk, cache_size=3)
+    for key in (1, 100, 200):
+        btree.find(key)
+    disk.stats.reset()
+    assert [btree.find(key) for key in (1, 100, 200)] == ["1", "100", "200"]
+    assert disk.stats.reads == 0
+    assert btree.fast_stats.cache_hits == 3
+    # Absent keys are not cached
+    assert btree.find(1000) is None
+    assert btree.find(1000) is None
+    assert btree.fast_stats.cache_hits == 3
+
+
+def test_cache_evicts_the_least_recently_used():
+    btree = BTree.from_sorted([(i, str(i)) for i in range(100)], 4, 4, disk=Disk(), cache_size=2)
+    btree.find(1)
+    btree.find(2)
+    btree.find(1)  # 2 is now the least recently used
+    btree.find(3)
+    assert list(btree.cache.entries) == [1, 3]
+    assert btree.fast_stats.cache_evictions == 1
+
+
+def test_writes_invalidate_the_cache():
+    btree = BTree.from_sorted([(i, str(i)) for i in range(100)], 4, 4, disk=Disk(), cache_size=10)
+    for key in (5, 6, 7):
+        btree.find(key)
+    btree.insert(5, "five")
+    btree.delete(6)
+    btree.insert_many([(7, "seven")])
+    assert [btree.find(key) for key in (5, 6, 7)] == ["five", None, "seven"]
+
+
+def test_stale_fills_are_dropped():
+    cache, stats = ValueCache(4), FastPathStats()
+    generation = cache.generation
+    cache.invalidate("a")  # a writer changed "a" after the reader missed it
+    cache.put("a", "old", generation, stats)
+    assert cache.get("a", stats) == (False, None)
+    cache.put("a", "new", cache.generation, stats)
+    assert cache.get("a", stats) == (True, "new")
+    with pytest.raises(ValueError):
+        ValueCache(0)
+
+
+def test_cache_size_is_saved():
+    disk = Disk()
+    BTree(4, 4, disk=disk, cache_size=64)
+    assert BTree.open(disk).cache.capacity == 64
+
+
+def test_rolled_back_transaction(tmp_path):
+    disk = FileDisk(str(tmp_path / "tree.db"), block_size=256, wal=True, checkpoint_bytes=1 << 30)
+    btree = BTree(4, 4, disk=disk, cache_size=100)
+    for i in range(40):
+        btree.insert(i, i)
+    assert btree.find(10) == 10
+    with pytest.raises(RuntimeError):
+        with btree.transaction():
+            btree.insert(10, "uncommitted")
+            assert btree.find(10) == "uncommitted"
+            for i in range(1000, 1200):
+                btree.insert(i, i)
+            assert btree.find(1100) == 1100
+            raise RuntimeError("boom")
+    assert btree.find(10) == 10
+    assert btree.find(1100) is None
+    check_tree(btree, {i: i for i in range(40)})
+    disk.close()
+
+
+@pytest.mark.parametrize("cache_size", [None, 32])
+def test_concurrent_readers_never_go_back(cache_size):
+    btree = BTree.from_sorted([(i, 0) for i in range(500)], 4, 4, disk=Disk(), concurrent=True,
+                              cache_size=cache_size)
+    errors = []
+    stop = threading.Event()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        seen = {}
+        try:
+            while not stop.is_set():
+                key = rng.randrange(0, 500, 10) + rng.randrange(3)
+                value = btree.find(key)
+                # Values only grow, so a stale finger or cache entry would show up as a smaller one
+                assert value is not None and value >= seen.get(key, 0)
+                seen[key] = value
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for version in range(1, 30):
+        for key in range(0, 500, 10):
+            btree.insert(key, version)
+            btree.insert(key + 1, version)
+        for key in range(0, 500, 20):
+            btree.insert(key + 5 + version / 100, 0)  # splits move the bounds of the leaves being read
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert btree.find(250) == 29
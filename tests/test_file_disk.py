@@ -0,0 +1,89 @@
+from py_btrees.btree import BTree
+from py_btrees.btree_node import BTreeNode
+from py_btrees.file_disk import FileDisk
+
+import os
+import pytest
+
+
+def test_tree_survives_reopen(tmp_path):
+    path = str(tmp_path / "tree.db")
+    with FileDisk(path, block_size=512) as disk:
+        btree = BTree(5, 4, disk=disk)
+        for i in range(300):
+            btree.insert(i * 7 % 300, str(i * 7 % 300))
+        root_addr = btree.root_addr
+
+    with FileDisk(path) as disk:
+        assert disk.block_size == 512
+        btree = BTree.open(disk)
+        assert (btree.root_addr, btree.M, btree.L) == (root_addr, 5, 4)
+        assert [k for k, _ in btree.items()] == list(range(300))
+        for i in range(300):
+            assert btree.find(i) == str(i)
+        btree.insert(1000, "1000")
+
+    with FileDisk(path) as disk:
+        assert BTree.open(disk).find(1000) == "1000"
+
+
+def test_bulk_loaded_tree_survives_reopen(tmp_path):
+    path = str(tmp_path / "bulk.db")
+    with FileDisk(path) as disk:
+        BTree.from_sorted(((i, i * i) for i in range(5000)), 32, 32, disk=disk)
+    with FileDisk(path) as disk:
+        btree = BTree.open(disk)
+        assert btree.find(4999) == 4999 * 4999
+        assert len(list(btree.range(100, 199))) == 100
+
+
+def test_large_nodes_span_overflow_blocks(tmp_path):
+    with FileDisk(str(tmp_path / "overflow.db"), block_size=128) as disk:
+        addr = disk.new()
+        node = BTreeNode(addr, None, None, True)
+        node.keys = list(range(50))
+        node.data = ["x" * 40] * 50
+        disk.write(addr, node)
+        assert disk.read(addr).data == node.data
+
+        # Shrinking the node releases its overflow blocks for reuse
+        blocks = disk.num_blocks
+        node.keys, node.data = [1], ["small"]
+        disk.write(addr, node)
+        assert disk.read(addr).keys == [1]
+        assert disk.free_head != -1
+        other = disk.new()
+        node.my_addr = other
+        node.keys, node.data = list(range(50)), ["y" * 40] * 50
+        disk.write(other, node)
+        assert disk.num_blocks == blocks + 1
+        assert disk.read(other).data == node.data
+
+
+def test_file_grows_with_the_tree(tmp_path):
+    path = str(tmp_path / "grow.db")
+    with FileDisk(path, block_size=256) as disk:
+        btree = BTree(4, 4, disk=disk)
+        for i in range(2000):
+            btree.insert(i, i)
+        assert os.path.getsize(path) >= disk.num_blocks * 256
+        assert btree.find(1234) == 1234
+
+
+def test_errors(tmp_path):
+    path = str(tmp_path / "errors.db")
+    with FileDisk(path) as disk:
+        addr = disk.new()
+        with pytest.raises(ValueError):
+            disk.read(addr)
+        with pytest.raises(ValueError):
+            disk.read(addr + 1)
+        with pytest.raises(ValueError):
+            disk.write(addr, "not a node")
+        with pytest.raises(ValueError):
+            BTree.open(disk)
+
+    with open(str(tmp_path / "garbage.db"), "wb") as f:
+        f.write(b"\0" * 4096)
+    with pytest.raises(ValueError):
+        FileDisk(str(tmp_path / "garbage.db"))
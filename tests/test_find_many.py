@@ -0,0 +1,48 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+
+import random
+import pytest
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (5, 4)])
+def test_find_many_matches_find(M, L):
+    rng = random.Random(M * 10 + L)
+    btree = BTree(M, L)
+    present = rng.sample(range(1000), 300)
+    for key in present:
+        btree.insert(key, str(key))
+
+    probes = [rng.randrange(-10, 1010) for _ in range(500)] + present[:20] * 2
+    rng.shuffle(probes)
+    assert btree.find_many(probes) == [btree.find(key) for key in probes]
+
+
+def test_find_many_edge_cases():
+    btree = BTree(3, 3)
+    assert btree.find_many([]) == []
+    assert btree.find_many([1, 2]) == [None, None]
+    btree.insert(1, "one")
+    assert btree.find_many(iter([1, 1, 0])) == ["one", "one", None]
+
+
+def test_find_many_reads_each_node_once(monkeypatch):
+    btree = BTree.from_sorted(((i, i) for i in range(5000)), 6, 8)
+    reads = []
+    original = Disk.read
+
+    def counting_read(self, addr):
+        reads.append(addr)
+        return original(self, addr)
+
+    monkeypatch.setattr(Disk, "read", counting_read)
+    probes = list(range(0, 5000, 3)) * 2
+    random.Random(0).shuffle(probes)
+    assert btree.find_many(probes) == probes
+
+    assert len(reads) == len(set(reads))
+    per_key_reads = len(reads)
+    reads.clear()
+    for key in probes[:100]:
+        btree.find(key)
+    assert per_key_reads < len(reads) * len(probes) / 100
@@ -0,0 +1,57 @@
+from py_btrees.disk import DISK, Disk
+from py_btrees.btree import BTree
+
+import random
+import pytest
+
+from tests.test_btrees import btree_properties_recurse
+from tests.test_range import leaf_chain
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (4, 2), (5, 7)])
+def test_insert_many_matches_single_inserts(M, L):
+    rng = random.Random(M * 100 + L)
+    btree = BTree(M, L)
+    expected = {}
+    for batch_size in [1, 5, 50, 300, 17, 1000]:
+        batch = [(rng.randrange(3000), rng.random()) for _ in range(batch_size)]
+        btree.insert_many(batch)
+        expected.update(batch)
+
+        btree_properties_recurse(btree.root_addr, DISK.read(btree.root_addr), M, L)
+        assert list(btree.items()) == sorted(expected.items())
+        assert [k for leaf in leaf_chain(btree) for k in leaf.keys] == sorted(expected)
+
+
+def test_insert_many_into_bulk_loaded_tree():
+    M, L = 4, 4
+    btree = BTree.from_sorted(((i, "bulk") for i in range(0, 1000, 2)), M, L)
+    btree.insert_many((i, "batch") for i in range(1, 1000, 2))
+    btree.insert_many([(10, "overwritten")])
+
+    btree_properties_recurse(btree.root_addr, DISK.read(btree.root_addr), M, L)
+    assert [k for k, _ in btree.items()] == list(range(1000))
+    assert btree.find(3) == "batch"
+    assert btree.find(4) == "bulk"
+    assert btree.find(10) == "overwritten"
+
+
+def test_insert_many_duplicates_keep_last_value():
+    btree = BTree(3, 3)
+    btree.insert_many([(1, "a"), (2, "b"), (1, "c")])
+    btree.insert_many([])
+    assert list(btree.items()) == [(1, "c"), (2, "b")]
+
+
+def test_insert_many_writes_each_node_once(monkeypatch):
+    btree = BTree.from_sorted(((i, i) for i in range(0, 4000, 4)), 5, 5)
+    writes = []
+    original = Disk.write
+
+    def counting_write(self, addr, data):
+        writes.append(addr)
+        original(self, addr, data)
+
+    monkeypatch.setattr(Disk, "write", counting_write)
+    btree.insert_many((i, i) for i in random.Random(3).sample(range(4000), 1500))
+    assert len(writes) == len(set(writes))
@@ -0,0 +1,118 @@
+from py_btrees.disk import DISK
+from py_btrees.btree import BTree
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.instrumentation import OpRecorder, storage_counters
+
+from tests.test_delete import height
+
+
+def test_find_reads_one_node_per_level():
+    btree = BTree(4, 4)
+    for i in range(200):
+        btree.insert(i, i)
+    with btree.record_ops() as recorder:
+        for i in range(0, 200, 7):
+            assert btree.find(i) == i
+    assert {r.op for r in recorder.records} == {"find"}
+    assert all(r.counters["reads"] == height(btree) for r in recorder.records)
+    assert all(r.counters["writes"] == 0 for r in recorder.records)
+    assert all(r.elapsed >= 0 for r in recorder.records)
+
+
+def test_insert_counts_writes_and_allocations():
+    btree = BTree(3, 2)
+    with btree.record_ops() as recorder:
+        for i in range(50):
+            btree.insert(i, i)
+    inserts = recorder.records
+    assert len(inserts) == 50
+    assert all(r.counters["writes"] >= 1 for r in inserts)
+    assert sum(r.counters["allocs"] for r in inserts) > 0
+    assert all(r.counters["bytes_written"] > 0 for r in inserts)
+
+
+def test_nested_calls_are_attributed_to_the_outer_operation():
+    btree = BTree(4, 4)
+    with btree.record_ops() as recorder:
+        btree.insert_many((i, i) for i in range(100))
+        btree.find_many([1, 2, 3])
+    assert [r.op for r in recorder.records] == ["insert_many", "find_many"]
+
+
+def test_range_is_recorded_when_the_scan_ends():
+    btree = BTree(4, 4)
+    btree.insert_many((i, i) for i in range(100))
+    with btree.record_ops() as recorder:
+        scan = btree.range(10, 60)
+        next(scan)
+        assert recorder.records == []
+        rest = list(scan)
+    assert len(rest) == 50
+    [record] = recorder.records
+    assert record.op == "range"
+    assert record.counters["reads"] >= 1
+
+    # Closing a partially consumed scan also produces a record
+    with btree.record_ops() as recorder:
+        scan = btree.range()
+        next(scan)
+        scan.close()
+    assert [r.op for r in recorder.records] == ["range"]
+
+
+def test_listeners_are_removed():
+    btree = BTree(4, 4)
+    seen = []
+    btree.add_listener(seen.append)
+    btree.insert(1, 1)
+    btree.remove_listener(seen.append)
+    btree.insert(2, 2)
+    assert [r.op for r in seen] == ["insert"]
+    with btree.record_ops():
+        pass
+    assert btree.listeners == []
+
+
+def test_buffer_pool_counters_reach_the_listeners():
+    pool = BufferPool(DISK, capacity=16)
+    btree = BTree(4, 4, disk=pool)
+    for i in range(100):
+        btree.insert(i, i)
+    counters = storage_counters(pool)
+    assert {"hits", "misses", "reads", "writes"} <= set(counters)
+    with btree.record_ops() as recorder:
+        btree.find(50)
+        btree.find(50)
+    first, second = recorder.records
+    assert first.counters["hits"] + first.counters["misses"] == height(btree)
+    # The second find goes straight to the leaf the first one ended in
+    assert second.counters["hits"] == 1
+    assert second.counters["reads"] == 0
+    assert second.counters["finger_hits"] == 1
+
+
+def test_summary_and_histogram():
+    recorder = OpRecorder()
+    btree = BTree(4, 4)
+    btree.add_listener(recorder)
+    for i in range(100):
+        btree.insert(i, i)
+    btree.fast_stats.reset()
+    for i in range(100):
+        btree.find(i)
+    summary = recorder.summary()
+    assert summary["insert"]["count"] == 100
+    assert summary["find"]["count"] == 100
+    reads = summary["find"]["reads"]
+    assert reads["p50"] <= reads["p90"] <= reads["p99"] <= reads["max"] == height(btree)
+    # Finds in the leaf of the previous one read only that leaf; the others descend from the root
+    misses = btree.fast_stats.finger_misses
+    assert recorder.histogram("find", "reads") == {1: 100 - misses, height(btree): misses}
+    assert summary["find"]["finger_hits"]["max"] == 1
+
+
+def test_disk_stats_reset():
+    DISK.stats.reset()
+    assert set(DISK.stats.as_dict().values()) == {0}
+    BTree(4, 4).insert(1, 1)
+    assert DISK.stats.writes > 0
@@ -0,0 +1,94 @@
+from py_btrees.disk import DISK, Disk
+from py_btrees.btree import BTree
+from py_btrees.btree_node import get_node
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.codec import PickleCodec
+from py_btrees.file_disk import FileDisk
+
+import pytest
+
+from tests.test_delete import check_tree
+
+
+def test_trees_on_separate_disks_share_nothing():
+    disk_a, disk_b = Disk(), Disk()
+    tree_a = BTree(3, 3, disk=disk_a)
+    tree_b = BTree(5, 4, disk=disk_b)
+    for i in range(200):
+        tree_a.insert(i, "a")
+        tree_b.insert(i, "b")
+    assert tree_a.root_addr < len(disk_a.memory) and tree_b.root_addr < len(disk_b.memory)
+    assert disk_a.stats.writes > 0 and disk_b.stats.writes > 0
+    assert disk_a.stats.writes != disk_b.stats.writes
+    check_tree(tree_a, {i: "a" for i in range(200)})
+    check_tree(tree_b, {i: "b" for i in range(200)})
+
+    for i in range(200):
+        tree_a.delete(i)
+    check_tree(tree_a, {})
+    check_tree(tree_b, {i: "b" for i in range(200)})
+    assert disk_b.free_list == []
+
+
+def test_trees_can_share_a_disk():
+    disk = Disk()
+    trees = [BTree(4, 4, disk=disk) for _ in range(3)]
+    for n, tree in enumerate(trees):
+        for i in range(100):
+            tree.insert(i, n)
+    for n, tree in enumerate(trees):
+        check_tree(tree, {i: n for i in range(100)})
+
+
+def test_default_disk_is_untouched():
+    blocks = len(DISK.memory)
+    tree = BTree(4, 4, disk=Disk(PickleCodec()))
+    for i in range(100):
+        tree.insert(i, i)
+    assert len(DISK.memory) == blocks
+
+
+def test_block_size_limit():
+    disk = Disk(block_size=256)
+    tree = BTree(4, 4, disk=disk)
+    for i in range(100):
+        tree.insert(i, i)
+    check_tree(tree, {i: i for i in range(100)})
+
+    tree = BTree(4, 4, disk=disk)
+    with pytest.raises(ValueError):
+        tree.insert(1, "x" * 300)
+
+
+def test_node_helpers_take_a_disk():
+    disk = Disk()
+    tree = BTree(3, 2, disk=disk)
+    for i in range(20):
+        tree.insert(i, i)
+    root = get_node(tree.root_addr, disk)
+    assert root.my_addr == tree.root_addr
+    children = root.get_children(disk)
+    assert [child.my_addr for child in children] == root.children_addrs
+    assert root.get_child(0, disk).get_parent(disk).my_addr == root.my_addr
+
+
+def test_pools_over_private_disks():
+    pools = [BufferPool(Disk(), capacity=4), BufferPool(Disk(), capacity=64)]
+    trees = [BTree(4, 4, disk=pool) for pool in pools]
+    for tree in trees:
+        for i in range(300):
+            tree.insert(i, -i)
+    for pool, tree in zip(pools, trees):
+        pool.flush()
+        assert list(tree.items()) == [(i, -i) for i in range(300)]
+    assert pools[0].stats.misses > pools[1].stats.misses
+
+
+def test_memory_and_file_trees_side_by_side(tmp_path):
+    memory_tree = BTree(4, 4, disk=Disk())
+    with FileDisk(str(tmp_path / "side.db"), block_size=512) as disk:
+        file_tree = BTree(6, 6, disk=disk)
+        for i in range(500):
+            memory_tree.insert(i, i)
+            file_tree.insert(i, str(i))
+        assert [k for k, _ in memory_tree.items()] == [k for k, _ in file_tree.items()]
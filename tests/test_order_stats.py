@@ -0,0 +1,184 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+
+import bisect
+import random
+import threading
+import pytest
+
+from tests.test_delete import check_tree
+
+
+def check_order_stats(btree, keys, rng, probes=200):
+    """Compare rank, select and count with a sorted list of the keys in the tree."""
+    assert btree.count() == len(keys)
+    for _ in range(probes):
+        key = rng.randrange(-5, 2 * len(keys) + 5)
+        assert btree.rank(key) == bisect.bisect_left(keys, key)
+        assert btree.rank(key, inclusive=True) == bisect.bisect_right(keys, key)
+        lo, hi = sorted(rng.randrange(-5, 2 * len(keys) + 5) for _ in range(2))
+        inclusive = (rng.random() < 0.5, rng.random() < 0.5)
+        assert btree.count(lo, hi, inclusive) == len(list(btree.range(lo, hi, inclusive)))
+    for k in range(len(keys)):
+        assert btree.select(k) == (keys[k], str(keys[k]))
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (4, 2), (5, 7), (16, 16)])
+def test_random_inserts(M, L):
+    rng = random.Random(M * 100 + L)
+    btree = BTree(M, L, disk=Disk(), order_stats=True)
+    keys = []
+    for _ in range(600):
+        key = rng.randrange(1500)
+        btree.insert(key, str(key))
+        if key not in keys:
+            bisect.insort(keys, key)
+    check_tree(btree, {key: str(key) for key in keys})
+    check_order_stats(btree, keys, rng)
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (5, 4)])
+def test_random_inserts_and_deletes(M, L):
+    rng = random.Random(M + L)
+    btree = BTree(M, L, disk=Disk(), order_stats=True)
+    present = set()
+    for step in range(2000):
+        key = rng.randrange(400)
+        if rng.random() < 0.6:
+            btree.insert(key, str(key))
+            present.add(key)
+        else:
+            btree.delete(key)
+            present.discard(key)
+        if step % 250 == 0:
+            check_order_stats(btree, sorted(present), rng, probes=20)
+    check_tree(btree, {key: str(key) for key in present})
+    check_order_stats(btree, sorted(present), rng)
+
+
+def test_insert_many_and_bulk_load():
+    rng = random.Random(7)
+    keys = sorted(rng.sample(range(5000), 1000))
+    btree = BTree.from_sorted([(key, str(key)) for key in keys], 6, 5, disk=Disk(), fill_factor=0.7, order_stats=True)
+    check_order_stats(btree, keys, rng)
+    for _ in range(5):
+        batch = [rng.randrange(5000) for _ in range(300)]
+        btree.insert_many((key, str(key)) for key in batch)
+        keys = sorted(set(keys) | set(batch))
+        check_order_stats(btree, keys, rng, probes=50)
+    check_tree(btree, {key: str(key) for key in keys})
+
+
+def test_empty_tree():
+    btree = BTree(3, 3, disk=Disk(), order_stats=True)
+    assert btree.count() == 0
+    assert btree.count(1, 10) == 0
+    assert btree.rank(5) == 0
+    with pytest.raises(IndexError):
+        btree.select(0)
+
+
+def test_select_bounds_and_negative_index():
+    btree = BTree.from_sorted([(i, str(i)) for i in range(100)], 4, 4, disk=Disk(), order_stats=True)
+    assert btree.select(-1) == (99, "99")
+    assert btree.select(-100) == (0, "0")
+    for k in (100, -101):
+        with pytest.raises(IndexError):
+            btree.select(k)
+
+
+def test_count_bounds():
+    btree = BTree.from_sorted([(i, str(i)) for i in range(0, 100, 10)], 3, 3, disk=Disk(), order_stats=True)
+    assert btree.count(10, 50) == 5
+    assert btree.count(10, 50, (False, True)) == 4
+    assert btree.count(10, 50, (True, False)) == 4
+    assert btree.count(10, 50, (False, False)) == 3
+    assert btree.count(lo=35) == 6
+    assert btree.count(hi=35) == 4
+    assert btree.count(50, 10) == 0
+
+
+def test_descents_read_height_blocks():
+    disk = Disk()
+    btree = BTree.from_sorted([(i, str(i)) for i in range(20000)], 8, 8, disk=disk, order_stats=True)
+    height, node = 1, disk.read(btree.root_addr)
+    while not node.is_leaf:
+        height += 1
+        node = disk.read(node.children_addrs[0])
+    disk.stats.reset()
+    assert btree.count(1234, 17000) == 17000 - 1234 + 1
+    assert disk.stats.reads == 2 * height
+    disk.stats.reset()
+    assert btree.select(15000) == (15000, "15000")
+    assert disk.stats.reads == height
+
+
+def test_parallel_build():
+    rng = random.Random(3)
+    keys = list(range(0, 6000, 2))
+    btree = BTree.from_sorted([(key, str(key)) for key in keys], 5, 4, disk=Disk(), workers=2, order_stats=True)
+    check_tree(btree, {key: str(key) for key in keys})
+    check_order_stats(btree, keys, rng, probes=50)
+
+
+def test_without_order_stats_writes_only_the_leaf():
+    disk = Disk()
+    btree = BTree.from_sorted([(i, str(i)) for i in range(0, 1000, 2)], 8, 8, disk=disk, fill_factor=0.75)
+    disk.stats.reset()
+    btree.insert(501, "new")
+    btree.delete(600)
+    assert disk.stats.writes == 2
+    check_tree(btree, {i: str(i) for i in range(0, 1000, 2) if i != 600} | {501: "new"})
+    for query in (lambda: btree.rank(5), lambda: btree.select(0), lambda: btree.count()):
+        with pytest.raises(ValueError):
+            query()
+
+
+def test_open_turns_order_stats_on_and_off():
+    disk = Disk()
+    items = {i: str(i) for i in range(500)}
+    btree = BTree.from_sorted(sorted(items.items()), 4, 4, disk=disk)
+    check_tree(btree, items)
+
+    reopened = BTree.open(disk, order_stats=True)
+    check_tree(reopened, items)
+    assert reopened.select(321) == (321, "321")
+    assert disk.load_meta()["order_stats"]
+    reopened.insert(1000, "1000")
+    items[1000] = "1000"
+    assert BTree.open(disk).count() == 501
+
+    reopened = BTree.open(disk, order_stats=False)
+    check_tree(reopened, items)
+    assert not disk.load_meta()["order_stats"]
+    with pytest.raises(ValueError):
+        reopened.rank(10)
+
+
+def test_counts_consistent_for_concurrent_readers():
+    btree = BTree.from_sorted([(i, i) for i in range(2000)], 4, 4, disk=Disk(), concurrent=True, order_stats=True)
+    errors = []
+    stop = threading.Event()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        try:
+            while not stop.is_set():
+                # The writer only appends larger keys, so the first 2000 keep their ranks
+                k = rng.randrange(2000)
+                assert btree.select(k) == (k, k)
+                assert btree.rank(k) == k
+                assert btree.count(0, 1999) == 2000
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for key in range(2000, 4000):
+        btree.insert(key, key)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert btree.count() == 4000
@@ -0,0 +1,118 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.codec import ValueRef
+from py_btrees.file_disk import FileDisk
+from py_btrees.aio import AsyncBTree, AsyncDisk
+
+import asyncio
+import random
+
+from tests.test_delete import check_tree
+
+
+def payload(i, size=300):
+    return (f"{i}:" * size)[:size].encode()
+
+
+def stored(tree):
+    """Every entry of every leaf, as kept in the leaf."""
+    leaf = tree.find_edge_leaf()
+    entries = []
+    while True:
+        entries.extend(leaf.data)
+        if leaf.next_addr is None:
+            return entries
+        leaf = tree.disk.read(leaf.next_addr)
+
+
+def test_large_values_leave_the_leaves():
+    tree = BTree(4, 4, disk=Disk(), overflow_threshold=100)
+    expected = {}
+    for i in range(200):
+        expected[i] = payload(i) if i % 3 == 0 else i
+        tree.insert(i, expected[i])
+    check_tree(tree, expected)
+    refs = [value for value in stored(tree) if type(value) is ValueRef]
+    assert len(refs) == len(range(0, 200, 3))
+    assert tree.find_many(range(200)) == [expected[i] for i in range(200)]
+    assert list(tree.range(10, 20, reverse=True)) == [(i, expected[i]) for i in range(20, 9, -1)]
+
+
+def test_a_lookup_reads_only_its_own_value():
+    disk = Disk()
+    tree = BTree.from_sorted(((i, payload(i)) for i in range(500)), 8, 8, disk=disk, overflow_threshold=64)
+    height, node = 1, disk.read(tree.root_addr)
+    while not node.is_leaf:
+        height, node = height + 1, disk.read(node.children_addrs[0])
+    assert max(len(block) for block in disk.memory if block) < 400
+    before = disk.stats.reads
+    assert tree.find(250) == payload(250)
+    assert disk.stats.reads - before == height + 1
+    before = disk.stats.bytes_read
+    tree.find(251)
+    leaf_and_path = disk.stats.bytes_read - before - len(payload(251))
+    assert leaf_and_path < 8 * 64 * height
+
+
+def test_replaced_and_deleted_values_free_their_blocks():
+    disk = Disk()
+    tree = BTree(5, 5, disk=disk, overflow_threshold=50)
+    for i in range(100):
+        tree.insert(i, payload(i))
+    frees = disk.stats.frees
+    tree.insert(7, "small")
+    tree.insert(8, payload(-8))
+    tree.insert_many([(9, payload(-9)), (10, 10)])
+    assert disk.stats.frees - frees == 4
+    for i in range(0, 100, 2):
+        tree.delete(i)
+    expected = {i: payload(i) for i in range(1, 100, 2)}
+    expected[7], expected[9] = "small", payload(-9)
+    check_tree(tree, expected)
+    nodes, pending = 0, [tree.root_addr]
+    while pending:
+        node = disk.read(pending.pop())
+        nodes += 1
+        pending.extend(node.children_addrs)
+    live = sum(1 for value in stored(tree) if type(value) is ValueRef)
+    assert live == len(expected) - 1
+    assert sum(1 for block in disk.memory if block) == live + nodes
+
+
+def test_file_disk_values_larger_than_a_block(tmp_path):
+    path = str(tmp_path / "values.db")
+    rng = random.Random(4)
+    expected = {}
+    with FileDisk(path, block_size=256, wal=True) as disk:
+        tree = BTree(4, 4, disk=BufferPool(disk, capacity=16), overflow_threshold=128)
+        for i in range(300):
+            expected[i] = payload(i, rng.choice([10, 500, 3000]))
+            tree.insert(i, expected[i])
+        tree.disk.flush()
+    with FileDisk(path, wal=True) as disk:
+        tree = BTree.open(disk)
+        assert tree.overflow_threshold == 128
+        check_tree(tree, expected)
+
+
+def test_async_reads_fetch_values():
+    disk = Disk()
+    expected = {i: payload(i) if i % 2 else i for i in range(300)}
+    BTree.from_sorted(sorted(expected.items()), 6, 6, disk=disk, overflow_threshold=32, workers=2)
+
+    async def main():
+        adisk = AsyncDisk(disk)
+        tree = await AsyncBTree.open(adisk)
+        found = [await tree.find(i) for i in range(0, 300, 7)]
+        pairs = [pair async for pair in tree.range(100, 150)]
+        await adisk.close()
+        return found, pairs
+
+    loop = asyncio.new_event_loop()
+    try:
+        found, pairs = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    assert found == [expected[i] for i in range(0, 300, 7)]
+    assert pairs == [(i, expected[i]) for i in range(100, 151)]
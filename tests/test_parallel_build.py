@@ -0,0 +1,72 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.file_disk import FileDisk
+from py_btrees.parallel_build import build_parallel
+
+import pytest
+
+from tests.test_delete import check_tree
+
+
+def node_count(tree):
+    pending, count = [tree.root_addr], 0
+    while pending:
+        count += 1
+        pending.extend(tree.disk.read(pending.pop()).children_addrs)
+    return count
+
+
+@pytest.mark.parametrize("M,L,fill_factor", [(3, 2, 1.0), (5, 4, 1.0), (8, 8, 0.7), (4, 3, 0.5)])
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_build_matches_sequential(M, L, fill_factor, workers):
+    items = [(i * 3, str(i)) for i in range(5000)]
+    tree = BTree.from_sorted(items, M, L, fill_factor, disk=Disk(), workers=workers)
+    check_tree(tree, dict(items))
+    sequential = BTree.from_sorted(items, M, L, fill_factor, disk=Disk())
+    # Each seam can leave one less than full node per level
+    assert node_count(tree) <= node_count(sequential) * 1.01 + workers
+
+
+def test_only_seam_leaves_are_written_twice():
+    disk = Disk()
+    items = [(f"key-{i:06d}", i) for i in range(20000)]
+    assert build_parallel(items, 6, 6, 1.0, disk, True, workers=1, partitions=4) is not None
+    nodes = len(disk.memory) - len(disk.free_list)
+    assert disk.stats.writes == nodes + 2 * (4 - 1)
+
+
+def test_file_disk_target(tmp_path):
+    path = str(tmp_path / "parallel.db")
+    items = [(i, i * i) for i in range(20000)]
+    with FileDisk(path, block_size=512, wal=True) as disk:
+        tree = BTree.from_sorted(items, 16, 16, disk=disk, workers=3)
+        for i in range(0, 20000, 7):
+            tree.delete(i)
+    with FileDisk(path, wal=True) as disk:
+        check_tree(BTree.open(disk), {k: v for k, v in items if k % 7})
+
+
+def test_small_input_is_built_sequentially():
+    disk = Disk()
+    items = [(i, i) for i in range(10)]
+    assert build_parallel(items, 4, 4, 1.0, disk, True, workers=4) is None
+    tree = BTree.from_sorted(items, 4, 4, disk=disk, workers=4)
+    check_tree(tree, dict(items))
+
+
+def test_unsorted_seam_is_rejected():
+    items = [(i, i) for i in range(1000)]
+    items[500], items[499] = items[499], items[500]
+    with pytest.raises(ValueError):
+        BTree.from_sorted(items, 4, 4, disk=Disk(), workers=2)
+
+
+def test_reserved_blocks_left_over_are_reused():
+    disk = Disk()
+    tree = BTree.from_sorted(((i, i) for i in range(3000)), 4, 3, 0.5, disk=disk, workers=2)
+    blocks = len(disk.memory)
+    spare = len(disk.free_list)
+    for i in range(3000, 3000 + spare):
+        tree.insert(i, i)
+    assert len(disk.memory) <= blocks + spare
+    check_tree(tree, {i: i for i in range(3000 + spare)})
@@ -0,0 +1,101 @@
+from py_btrees.disk import DISK, Disk
+from py_btrees.btree import BTree
+
+import random
+import pytest
+
+from tests.test_btrees import btree_properties_recurse
+
+
+def leaf_chain(btree):
+    leaf = btree.find_edge_leaf(last=False)
+    chain = [leaf]
+    while leaf.next_addr is not None:
+        nxt = btree.disk.read(leaf.next_addr)
+        assert nxt.prev_addr == leaf.my_addr
+        chain.append(nxt)
+        leaf = nxt
+    assert leaf.my_addr == btree.find_edge_leaf(last=True).my_addr
+    return chain
+
+
+def random_tree(M, L, n, seed=0):
+    keys = list(range(0, 2 * n, 2))
+    random.Random(seed).shuffle(keys)
+    btree = BTree(M, L)
+    for key in keys:
+        btree.insert(key, str(key))
+    return btree, sorted(keys)
+
+
+@pytest.mark.parametrize("M,L", [(2, 1), (3, 3), (4, 2), (5, 3), (6, 6)])
+def test_insert_keeps_leaf_links(M, L):
+    btree, keys = random_tree(M, L, 300)
+
+    btree_properties_recurse(btree.root_addr, DISK.read(btree.root_addr), M, L)
+    assert [k for leaf in leaf_chain(btree) for k in leaf.keys] == keys
+    for key in keys:
+        assert btree.find(key) == str(key)
+
+
+def test_insert_overwrites_existing_keys():
+    btree = BTree(3, 3)
+    for i in range(20):
+        btree.insert(i, "old")
+    btree.insert(7, "new")
+    assert btree.find(7) == "new"
+    assert len(list(btree.items())) == 20
+
+
+def test_items_forward_and_reverse():
+    btree, keys = random_tree(4, 3, 200)
+    assert [k for k, _ in btree.items()] == keys
+    assert [k for k, _ in btree.items(reverse=True)] == keys[::-1]
+    assert all(v == str(k) for k, v in btree.items())
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("inclusive", [(True, True), (True, False), (False, True), (False, False)])
+def test_range_matches_sorted_list(reverse, inclusive):
+    btree, keys = random_tree(5, 3, 150, seed=1)
+    rng = random.Random(2)
+    for _ in range(100):
+        lo, hi = sorted(rng.randrange(-5, 305) for _ in range(2))
+        expected = [k for k in keys
+                    if (lo < k or (inclusive[0] and k == lo)) and (k < hi or (inclusive[1] and k == hi))]
+        if reverse:
+            expected.reverse()
+        assert [k for k, _ in btree.range(lo, hi, inclusive, reverse)] == expected
+
+    assert [k for k, _ in btree.range(lo=100, reverse=reverse)] == \
+        sorted((k for k in keys if k >= 100), reverse=reverse)
+    assert [k for k, _ in btree.range(hi=100, reverse=reverse)] == \
+        sorted((k for k in keys if k <= 100), reverse=reverse)
+
+
+def test_range_on_empty_tree():
+    btree = BTree(3, 3)
+    assert list(btree.items()) == []
+    assert list(btree.range(1, 5, reverse=True)) == []
+
+
+def test_bulk_loaded_tree_has_leaf_links():
+    btree = BTree.from_sorted(((i, i) for i in range(500)), 4, 7, fill_factor=0.8)
+    assert [k for leaf in leaf_chain(btree) for k in leaf.keys] == list(range(500))
+    assert [k for k, _ in btree.range(100, 199)] == list(range(100, 200))
+
+
+def test_scan_reads_each_leaf_once(monkeypatch):
+    btree = BTree.from_sorted(((i, i) for i in range(10000)), 8, 10)
+    reads = []
+    original = Disk.read
+
+    def counting_read(self, addr):
+        reads.append(addr)
+        return original(self, addr)
+
+    monkeypatch.setattr(Disk, "read", counting_read)
+    assert len(list(btree.range(1000, 5999))) == 5000
+
+    assert len(reads) == len(set(reads))
+    assert len(reads) <= 5000 // 10 + 2 + 4  # leaves in range plus one descent
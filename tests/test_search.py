@@ -0,0 +1,111 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.btree_node import interpolation_search
+
+import bisect
+import random
+import pytest
+
+from tests.test_delete import check_tree
+
+
+class Counted(int):
+    """An int that counts how often it is compared."""
+    comparisons = 0
+
+    def __lt__(self, other):
+        Counted.comparisons += 1
+        return int(self) < int(other)
+
+    def __le__(self, other):
+        Counted.comparisons += 1
+        return int(self) <= int(other)
+
+    def __gt__(self, other):
+        Counted.comparisons += 1
+        return int(self) > int(other)
+
+
+@pytest.mark.parametrize("make_key", [
+    lambda rng: rng.randrange(10 ** 6),
+    lambda rng: int(rng.expovariate(1e-3) ** 3),   # heavily skewed
+    lambda rng: rng.uniform(-1, 1),
+    lambda rng: rng.randrange(50),                 # many probes equal to a key
+])
+def test_interpolation_matches_bisect(make_key):
+    rng = random.Random(7)
+    for n in [0, 1, 2, 3, 10, 100, 1000]:
+        keys = sorted({make_key(rng) for _ in range(n)})
+        for probe in [make_key(rng) for _ in range(50)] + keys[:5] + keys[-5:]:
+            assert interpolation_search(keys, probe) == bisect.bisect_left(keys, probe)
+
+
+def test_infinite_and_huge_keys_are_bisected():
+    inf = float("inf")
+    keys_lists = [[-inf, -1.0, 0.0, 2.5, inf], [-1e308, 0.0, 1e308], [1.5, 10 ** 400], [-inf, inf], [0, 1e308]]
+    probes = [-inf, -1e308, -1.0, 0, 0.5, 1e308, 10 ** 400, inf]
+    for keys in keys_lists:
+        for probe in probes:
+            assert interpolation_search(keys, probe) == bisect.bisect_left(keys, probe)
+
+
+def test_tree_with_infinite_keys():
+    inf = float("inf")
+    btree = BTree(3, 3, disk=Disk(), search="interpolation")
+    keys = [-inf, inf, -1e308, 1e308, 0.0] + [float(i) for i in range(-20, 20)]
+    for key in keys:
+        btree.insert(key, str(key))
+    assert btree.find(-inf) == str(-inf) and btree.find(inf) == str(inf)
+    assert btree.find(1e307) is None
+    check_tree(btree, {key: str(key) for key in keys})
+
+
+def test_non_numeric_keys_are_bisected():
+    keys = ["apple", "banana", "cherry"]
+    assert [interpolation_search(keys, k) for k in ["a", "banana", "c", "z"]] == [0, 1, 2, 3]
+
+
+def test_interpolation_uses_few_comparisons_on_even_keys():
+    keys = [Counted(i * 10) for i in range(65536)]
+    rng = random.Random(3)
+    probes = [Counted(rng.randrange(655360)) for _ in range(1000)]
+    Counted.comparisons = 0
+    for probe in probes:
+        interpolation_search(keys, probe)
+    assert Counted.comparisons / len(probes) < 8  # bisect needs 16 or 17
+
+
+def test_skewed_keys_stay_logarithmic():
+    keys = [Counted(2 ** i) for i in range(60)] + [Counted(2 ** 60 + i) for i in range(4000)]
+    Counted.comparisons = 0
+    for probe in range(0, 2 ** 60, 2 ** 50):
+        interpolation_search(keys, Counted(probe))
+    assert Counted.comparisons / 1024 < 4 * 12
+
+
+@pytest.mark.parametrize("search", ["bisect", "interpolation"])
+def test_tree_with_search_mode(search):
+    rng = random.Random(11)
+    tree = BTree(6, 5, disk=Disk(), search=search)
+    expected = {}
+    for _ in range(2000):
+        key = rng.randrange(5000)
+        if rng.random() < 0.3:
+            tree.delete(key)
+            expected.pop(key, None)
+        else:
+            tree.insert(key, -key)
+            expected[key] = -key
+    check_tree(tree, expected)
+    assert tree.find_many(range(5000)) == [expected.get(k) for k in range(5000)]
+    assert tree.find_idx_to_insert(2500, tree.get_root_node())[1].my_addr == tree.find_leaf(2500).my_addr
+
+
+def test_search_mode_is_kept_and_checked():
+    disk = Disk()
+    tree = BTree.from_sorted(((i, i) for i in range(1000)), 8, 8, disk=disk, search="interpolation")
+    reopened = BTree.open(disk)
+    assert reopened.search == "interpolation"
+    assert [reopened.find(i) for i in range(0, 1000, 7)] == list(range(0, 1000, 7))
+    with pytest.raises(ValueError):
+        BTree(4, 4, disk=Disk(), search="linear")
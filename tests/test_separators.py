@@ -0,0 +1,85 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.btree_node import shortest_separator
+from py_btrees.codec import NodeCodec
+
+import random
+import pytest
+
+from tests.test_delete import check_tree
+
+
+@pytest.mark.parametrize("left,right,expected", [
+    ("apple", "apricot", "apr"),
+    ("https://a.com/x/1", "https://b.com/", "https://b"),
+    ("abc", "abcd", "abc"),          # left is a prefix of right: nothing shorter fits
+    ("abcd", "abd", "abcd"),         # the cut-off right key would be right itself
+    ("ab", "b", "ab"),               # not shorter than left
+    (b"key-0001", b"key-0200", b"key-02"),
+    (b"key-0001", b"key-02", b"key-0001"),
+    (10, 20, 10),
+    ("a", b"b", "a"),
+])
+def test_shortest_separator(left, right, expected):
+    assert shortest_separator(left, right) == expected
+
+
+def urls(n, seed=0):
+    rng = random.Random(seed)
+    hosts = [f"https://www.site{i:02d}.example.com" for i in range(20)]
+    words = ["red", "blue", "garden", "chair", "lamp", "steel", "oak", "mini", "pro", "set"]
+    return sorted({f"{rng.choice(hosts)}/products/category-{rng.randrange(50):02d}/"
+                 f"{'-'.join(rng.sample(words, 3))}-{rng.randrange(10 ** 6)}" for _ in range(n)})
+
+
+def internal_keys(tree):
+    pending, keys = [tree.root_addr], []
+    while pending:
+        node = tree.disk.read(pending.pop())
+        keys.extend(node.keys if not node.is_leaf else [])
+        pending.extend(node.children_addrs)
+    return keys
+
+
+@pytest.mark.parametrize("truncate", [False, True])
+def test_inserts_and_deletes_with_url_keys(truncate):
+    keys = urls(2000)
+    rng = random.Random(1)
+    rng.shuffle(keys)
+    tree = BTree(5, 4, disk=Disk(), truncate_separators=truncate)
+    for key in keys:
+        tree.insert(key, len(key))
+    expected = {key: len(key) for key in keys}
+    check_tree(tree, expected)
+    for key in keys[:1200]:
+        tree.delete(key)
+        del expected[key]
+    check_tree(tree, expected)
+    tree.insert_many((key, 0) for key in keys[:600])
+    expected.update((key, 0) for key in keys[:600])
+    check_tree(tree, expected)
+    assert all(tree.find(key) == value for key, value in expected.items())
+
+
+def test_truncated_separators_are_shorter():
+    keys = sorted(urls(3000))
+    sizes = {}
+    for truncate in (False, True):
+        inserted = BTree(6, 6, disk=Disk(), truncate_separators=truncate)
+        for key in keys:
+            inserted.insert(key, None)
+        loaded = BTree.from_sorted(((key, None) for key in keys), 6, 6, disk=Disk(), truncate_separators=truncate)
+        check_tree(loaded, dict.fromkeys(keys))
+        sizes[truncate] = [sum(map(len, internal_keys(tree))) / len(internal_keys(tree))
+                           for tree in (inserted, loaded)]
+    assert all(short < full * 0.8 for short, full in zip(sizes[True], sizes[False]))
+
+
+def test_option_is_kept_when_reopened():
+    disk = Disk(NodeCodec(prefix_compression=True))
+    tree = BTree(4, 4, disk=disk, truncate_separators=False)
+    for key in urls(200):
+        tree.insert(key, 1)
+    reopened = BTree.open(disk)
+    assert not reopened.truncate_separators
+    assert dict(reopened.items()) == dict(tree.items())
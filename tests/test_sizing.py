@@ -0,0 +1,117 @@
+from py_btrees.disk import BLOCK_SIZE, Disk
+from py_btrees.btree import BTree
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.file_disk import FileDisk
+from py_btrees.codec import PickleCodec
+from py_btrees.sizing import block_budget, fit_node_sizes, node_codec
+
+import os
+import random
+import pytest
+
+from tests.test_delete import check_tree, height
+
+
+def pairs(rng, n, value_len=12):
+    return [(rng.randrange(10 ** 9), "v" * rng.randrange(value_len // 2, value_len + 1)) for _ in range(n)]
+
+
+def test_block_budget(tmp_path):
+    assert block_budget(Disk()) == BLOCK_SIZE
+    assert block_budget(BufferPool(Disk(block_size=512), capacity=4)) == 512
+    with FileDisk(os.path.join(str(tmp_path), "tree.db"), block_size=1024) as disk:
+        assert block_budget(disk) == disk.payload_size < 1024
+
+
+@pytest.mark.parametrize("block_size", [256, 1024, 4096])
+def test_nodes_fit_the_block(block_size):
+    rng = random.Random(block_size)
+    disk = Disk(block_size=block_size)  # writing a node that does not fit raises
+    tree = BTree.for_block_size(pairs(rng, 500), disk=disk)
+    expected = dict(pairs(rng, 5000))
+    for key, value in expected.items():
+        tree.insert(key, value)
+    check_tree(tree, expected)
+    # Full leaves come close to filling the block
+    sizes = sorted(len(disk.codec.encode(leaf)) for leaf in map(disk.read, range(len(disk.memory)))
+                   if leaf is not None and leaf.is_leaf and len(leaf.keys) == tree.L)
+    assert not sizes or sizes[-1] > 0.75 * block_size
+
+
+def test_codec_behind_a_buffer_pool():
+    rng = random.Random(5)
+    sample = pairs(rng, 500)
+    disk = Disk(codec=PickleCodec(), block_size=1024)
+    pool = BufferPool(disk, capacity=8)
+    assert node_codec(pool) is disk.codec
+    tree = BTree.for_block_size(sample, disk=pool)
+    assert (tree.M, tree.L) == fit_node_sizes(sample, 1024, PickleCodec())
+    expected = dict(pairs(rng, 20000))
+    for key, value in expected.items():
+        tree.insert(key, value)  # evicted nodes are written to the disk, which checks their size
+    pool.flush()
+    check_tree(tree, expected)
+    assert tree.advise(seed=0).oversized == 0
+
+
+def test_larger_values_give_smaller_leaves():
+    rng = random.Random(1)
+    M_small, L_small = fit_node_sizes(pairs(rng, 300, 10))
+    M_large, L_large = fit_node_sizes(pairs(rng, 300, 100))
+    assert L_large < L_small
+    assert M_large == M_small  # internal nodes hold no values
+
+
+def test_values_too_large_for_a_block(tmp_path):
+    rng = random.Random(2)
+    sample = [(key, b"x" * 5000) for key, _ in pairs(rng, 50)]
+    with pytest.raises(ValueError, match="overflow_threshold"):
+        fit_node_sizes(sample, 4096)
+    M, L = fit_node_sizes(sample, 4096, overflow_threshold=256)
+    assert L > 100
+    # The values themselves take several chained blocks of a FileDisk
+    with FileDisk(os.path.join(str(tmp_path), "tree.db"), block_size=4096) as disk:
+        tree = BTree.for_block_size(sample, disk=disk, overflow_threshold=256)
+        assert (tree.M, tree.L) == fit_node_sizes(sample, disk.payload_size, overflow_threshold=256)
+        for key, value in sample:
+            tree.insert(key, value)
+        assert tree.find(sample[0][0]) == sample[0][1]
+
+
+def test_options_are_passed_on():
+    tree = BTree.for_block_size([(i, i) for i in range(100)], block_size=512, disk=Disk(), search="interpolation")
+    assert tree.search == "interpolation"
+    assert tree.M > 3 and tree.L > 3
+
+
+def test_advise_reports_the_tree():
+    rng = random.Random(3)
+    items = sorted(dict(pairs(rng, 3000)).items())
+    tree = BTree.from_sorted(items, 8, 8, disk=Disk(), fill_factor=0.75)
+    report = tree.advise(block_size=1024, seed=0)
+    assert (report.M, report.L, report.block_size) == (8, 8, 1024)
+    assert report.height == height(tree)
+    assert report.leaves > 0 and report.internals > 0
+    assert report.leaf_fill == pytest.approx(0.75, abs=0.05)
+    assert report.oversized == 0
+    assert 0 < report.block_use()[0] < 0.5
+    # A block of 1024 bytes holds far more than 8 of these keys
+    assert report.recommended_L > 8 and report.recommended_M > 8
+    resized = BTree.from_sorted(items, report.recommended_M, report.recommended_L, disk=Disk(block_size=1024))
+    assert resized.advise(block_size=1024, seed=0).height < report.height
+
+
+def test_advise_finds_oversized_nodes():
+    rng = random.Random(4)
+    tree = BTree.from_sorted(sorted(dict(pairs(rng, 2000, 40)).items()), 200, 200, disk=Disk())
+    report = tree.advise(block_size=512, seed=0)
+    assert report.oversized > 0
+    assert report.recommended_L < 200
+    assert report.as_dict()["recommended_L"] == report.recommended_L
+
+
+def test_advise_empty_tree():
+    report = BTree(4, 4, disk=Disk()).advise()
+    assert report.height == 1
+    assert report.leaves == 1
+    assert report.recommended_M is None and report.recommended_L is None
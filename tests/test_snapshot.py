@@ -0,0 +1,147 @@
+from py_btrees.disk import Disk
+from py_btrees.btree import BTree
+from py_btrees.buffer_pool import BufferPool
+from py_btrees.codec import ValueRef
+from py_btrees.snapshot import VersionedDisk
+
+import gc
+import random
+import threading
+import pytest
+
+from tests.test_delete import check_tree
+
+
+def live_blocks(disk):
+    return sum(1 for block in disk.memory if block)
+
+
+def tree_blocks(tree):
+    """Blocks used by the nodes of `tree` and the values kept out of its leaves."""
+    count, pending = 0, [tree.root_addr]
+    while pending:
+        node = tree.disk.read(pending.pop())
+        count += 1 + sum(1 for value in node.data if type(value) is ValueRef)
+        pending.extend(node.children_addrs)
+    return count
+
+
+def test_snapshot_keeps_its_view():
+    base = Disk()
+    tree = BTree(4, 4, disk=VersionedDisk(base))
+    expected = {i: i for i in range(300)}
+    for key, value in expected.items():
+        tree.insert(key, value)
+    snap = tree.snapshot()
+    before = dict(expected)
+
+    rng = random.Random(1)
+    for _ in range(1000):
+        key = rng.randrange(600)
+        if rng.random() < 0.4:
+            tree.delete(key)
+            expected.pop(key, None)
+        else:
+            tree.insert(key, -key)
+            expected[key] = -key
+    check_tree(tree, expected)
+    check_tree(snap, before)
+    assert snap.find_many([5, 299, 300]) == [5, 299, None]
+    assert list(snap.range(10, 15, reverse=True)) == [(i, i) for i in range(15, 9, -1)]
+
+    snap.release()
+    assert live_blocks(base) == tree_blocks(tree)
+    assert tree.disk.stats.reclaimed == tree.disk.stats.copies + tree.disk.stats.retained
+
+
+def test_snapshots_share_old_versions():
+    base = Disk()
+    tree = BTree(5, 5, disk=VersionedDisk(base))
+    states = []
+    snaps = []
+    for round in range(4):
+        for i in range(100):
+            tree.insert(i * 7 % 500 + round, round)
+        snaps.append(tree.snapshot())
+        states.append(dict(tree.items()))
+    for i in range(0, 500, 3):
+        tree.delete(i)
+    for snap, state in zip(snaps, states):
+        check_tree(snap, state)
+
+    for i in (2, 0, 3):
+        snaps[i].release()
+        check_tree(snaps[1], states[1])
+    copies = tree.disk.stats.copies
+    tree.insert(1000, 1)  # only the remaining snapshot needs the old versions
+    assert tree.disk.stats.copies - copies <= 3
+    snaps[1].release()
+    assert live_blocks(base) == tree_blocks(tree)
+
+
+def test_garbage_collected_snapshot_frees_its_versions():
+    base = Disk()
+    tree = BTree(4, 4, disk=VersionedDisk(base), overflow_threshold=20)
+    for i in range(200):
+        tree.insert(i, "x" * (i % 50))
+    snap = tree.snapshot()
+    for i in range(0, 200, 2):
+        tree.delete(i)
+    assert snap.find(48) == "x" * 48
+    del snap
+    gc.collect()
+    assert live_blocks(base) == tree_blocks(tree)
+
+
+def test_snapshot_is_read_only():
+    tree = BTree(4, 4, disk=VersionedDisk(Disk()))
+    tree.insert(1, 1)
+    with tree.snapshot() as snap:
+        for change in (lambda: snap.insert(2, 2), lambda: snap.delete(1), lambda: snap.insert_many([(3, 3)])):
+            with pytest.raises(ValueError):
+                change()
+    assert dict(tree.items()) == {1: 1}
+    with pytest.raises(ValueError):
+        BTree(4, 4, disk=Disk()).snapshot()
+
+
+def test_snapshot_through_a_buffer_pool():
+    base = Disk()
+    tree = BTree(4, 3, disk=BufferPool(VersionedDisk(base), capacity=8))
+    for i in range(200):
+        tree.insert(i, i)
+    snap = tree.snapshot()
+    for i in range(200):
+        tree.insert(i, -i)
+    tree.disk.flush()
+    check_tree(snap, {i: i for i in range(200)})
+    check_tree(tree, {i: -i for i in range(200)})
+
+
+def test_scan_a_snapshot_while_writing():
+    tree = BTree(6, 6, disk=VersionedDisk(Disk()), concurrent=True)
+    tree.insert_many((i, 0) for i in range(0, 3000, 3))
+    snap = tree.snapshot()
+    errors = []
+
+    def scan():
+        try:
+            for _ in range(5):
+                assert list(snap.items()) == [(i, 0) for i in range(0, 3000, 3)]
+        except AssertionError as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=scan) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    rng = random.Random(2)
+    for _ in range(2000):
+        key = rng.randrange(3000)
+        if rng.random() < 0.5:
+            tree.delete(key)
+        else:
+            tree.insert(key, 1)
+    for reader in readers:
+        reader.join()
+    assert not errors
+    snap.release()
@@ -0,0 +1,219 @@
+from py_btrees.btree import BTree
+from py_btrees.file_disk import FileDisk
+
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import pytest
+
+M, L = 4, 4
+COUNTER = -1  # key holding the number of operations the writer has applied
+
+
+def operations(seed, count=100000):
+    rng = random.Random(seed)
+    return [("insert" if rng.random() < 0.7 else "delete", rng.randrange(2000)) for _ in range(count)]
+
+
+def expected_after(seed, steps):
+    state = {}
+    for step, (op, key) in enumerate(operations(seed)[:steps], 1):
+        if op == "insert":
+            state[key] = step
+        else:
+            state.pop(key, None)
+    return state
+
+
+def check_structure(btree):
+    """Occupancy, parent links, sibling links and a single leaf level, read through btree.disk."""
+    disk = btree.disk
+    leaves = []
+    level = [disk.read(btree.root_addr)]
+    assert level[0].parent_addr is None
+    while level:
+        next_level = []
+        for node in level:
+            if node.my_addr != btree.root_addr:
+                size = len(node.keys) if node.is_leaf else len(node.children_addrs)
+                assert size >= ((L if node.is_leaf else M) + 1) // 2
+            if node.is_leaf:
+                assert len(node.keys) <= L
+                leaves.append(node)
+                continue
+            assert len(node.children_addrs) <= M
+            for idx, child_addr in enumerate(node.children_addrs):
+                child = disk.read(child_addr)
+                assert (child.parent_addr, child.index_in_parent) == (node.my_addr, idx)
+                next_level.append(child)
+        assert not (leaves and next_level), "leaves at more than one level"
+        level = next_level
+    for left, right in zip(leaves, leaves[1:]):
+        assert (left.next_addr, right.prev_addr) == (right.my_addr, left.my_addr)
+    keys = [k for leaf in leaves for k in leaf.keys]
+    assert keys == sorted(set(keys))
+
+
+def writer(path, seed, group):
+    """Apply operations(seed) to the tree at `path` until killed, reporting each durable step."""
+    seed, group = int(seed), int(group)
+    disk = FileDisk(path, block_size=256, wal=True, group_commit=group, checkpoint_bytes=32 * 1024)
+    if "root_addr" in disk.load_meta():
+        tree = BTree.open(disk)
+    else:
+        tree = BTree(M, L, disk=disk)
+    start = tree.find(COUNTER) or 0
+    for step, (op, key) in enumerate(operations(seed)[start:], start + 1):
+        with tree.transaction():
+            if op == "insert":
+                tree.insert(key, step)
+            else:
+                tree.delete(key)
+            tree.insert(COUNTER, step)
+        if step % group == 0:
+            disk.sync()
+            print(step, flush=True)
+
+
+def recover(path):
+    with FileDisk(path, wal=True) as disk:
+        if "root_addr" not in disk.load_meta():
+            return 0, {}
+        tree = BTree.open(disk)
+        check_structure(tree)
+        state = dict(tree.items())
+        steps = state.pop(COUNTER, 0)
+        return steps, state
+
+
+@pytest.mark.parametrize("group", [1, 16])
+def test_survives_being_killed(tmp_path, group):
+    path = str(tmp_path / "torture.db")
+    rng = random.Random(group)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    steps = 0
+    for _ in range(4):
+        proc = subprocess.Popen([sys.executable, "-m", "tests.test_wal", path, "3", str(group)],
+                                cwd=root, stdout=subprocess.PIPE, universal_newlines=True)
+        time.sleep(rng.uniform(0.3, 0.8))
+        proc.send_signal(signal.SIGKILL)
+        output, _ = proc.communicate()
+        durable = max([int(line) for line in output.split()] or [steps])
+
+        recovered, state = recover(path)
+        assert recovered >= durable
+        assert state == expected_after(3, recovered)
+        steps = recovered
+    assert steps > 0
+
+
+def committed_tree(tmp_path, group_commit=1):
+    disk = FileDisk(str(tmp_path / "tree.db"), block_size=256, wal=True, group_commit=group_commit,
+                    checkpoint_bytes=1 << 30)
+    return disk, BTree(M, L, disk=disk)
+
+
+def crash_copy(tmp_path, disk):
+    """What the files would hold if the process died now: copies of the data file and the log."""
+    path = str(tmp_path / "crashed.db")
+    shutil.copyfile(disk.path, path)
+    shutil.copyfile(disk.path + "-wal", path + "-wal")
+    return path
+
+
+def test_committed_operations_are_replayed(tmp_path):
+    disk, tree = committed_tree(tmp_path)
+    for i in range(300):
+        tree.insert(i, str(i))
+    for i in range(0, 300, 3):
+        tree.delete(i)
+    assert os.path.getsize(disk.path + "-wal") > 0
+
+    path = crash_copy(tmp_path, disk)
+    with FileDisk(path, wal=True) as recovered:
+        tree2 = BTree.open(recovered)
+        check_structure(tree2)
+        assert list(tree2.items()) == list(tree.items())
+    assert os.path.getsize(path + "-wal") == 0
+    disk.close()
+
+
+def test_uncommitted_changes_are_lost(tmp_path):
+    disk, tree = committed_tree(tmp_path)
+    for i in range(50):
+        tree.insert(i, i)
+    # Simulate a crash in the middle of a transaction: nothing of it may survive
+    tree.txn_depth += 1
+    for i in range(50, 200):
+        tree.insert(i, i)
+    path = crash_copy(tmp_path, disk)
+    with FileDisk(path, wal=True) as recovered:
+        assert [k for k, _ in BTree.open(recovered).items()] == list(range(50))
+    tree.txn_depth -= 1
+    disk.close()
+
+
+def test_failed_transaction_rolls_back(tmp_path):
+    disk, tree = committed_tree(tmp_path)
+    for i in range(40):
+        tree.insert(i, i)
+    root_addr = tree.root_addr
+    with pytest.raises(RuntimeError):
+        with tree.transaction():
+            for i in range(40, 400):
+                tree.insert(i, i)
+            tree.delete(3)
+            raise RuntimeError("boom")
+    assert tree.root_addr == root_addr
+    assert [k for k, _ in tree.items()] == list(range(40))
+    check_structure(tree)
+    tree.insert(1000, 1000)
+    disk.close()
+
+    with FileDisk(disk.path, wal=True) as reopened:
+        assert [k for k, _ in BTree.open(reopened).items()] == list(range(40)) + [1000]
+
+
+def test_torn_log_tail_is_ignored(tmp_path):
+    disk, tree = committed_tree(tmp_path)
+    for i in range(100):
+        tree.insert(i, i)
+    path = crash_copy(tmp_path, disk)
+    with open(path + "-wal", "ab") as log:
+        log.write(b"\x07" * 50)
+    with FileDisk(path, wal=True) as recovered:
+        assert [k for k, _ in BTree.open(recovered).items()] == list(range(100))
+    disk.close()
+
+
+def test_group_commit_batches_fsyncs(tmp_path):
+    disk, tree = committed_tree(tmp_path, group_commit=10)
+    commits = disk.log.commits
+    for i in range(100):
+        tree.insert(i, i)
+    assert disk.log.commits - commits == 100
+    assert disk.log.syncs <= 11
+    disk.close()
+
+
+def test_checkpoint_empties_the_log(tmp_path):
+    path = str(tmp_path / "ckpt.db")
+    with FileDisk(path, block_size=256, wal=True, checkpoint_bytes=8 * 1024) as disk:
+        tree = BTree(M, L, disk=disk)
+        for i in range(1000):
+            tree.insert(i, i)
+            assert disk.log.size < 8 * 1024 + 64 * 256
+        assert len(disk.unflushed) < disk.num_blocks
+    assert os.path.getsize(path + "-wal") == 0
+    with FileDisk(path, wal=True) as disk:
+        tree = BTree.open(disk)
+        check_structure(tree)
+        assert [k for k, _ in tree.items()] == list(range(1000))
+
+
+if __name__ == "__main__":
+    writer(*sys.argv[1:])